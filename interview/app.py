@@ -2,9 +2,51 @@
 K-12 AI 학습도구 POC - 인터뷰 활동
 Streamlit 메인 애플리케이션
 """
+import os
+
 import streamlit as st
 import json
+from streamlit.errors import StreamlitAPIException
+from cache import create_cache_from_env
+from evidence import EvidenceDigest
+from faq_cache import FAQCache
+from lesson_package import LessonPackageStore
 from llm_service import LLMService
+from memory import ConversationMemory
+from metrics import MetricsRecorder
+from prefetch import FollowupPrefetcher
+from retrieval import SourceIndexStore, format_passages
+from routing import create_routing_from_env
+from scheduler import create_scheduler_from_env
+from session_store import create_session_store_from_env
+
+
+# 인터뷰 프롬프트에 넣을 대화 히스토리의 최대 토큰 수
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "1200"))
+
+# 인터뷰 화면에 한 번에 표시할 대화 턴 수 ("이전 대화 더 보기"로 한 페이지씩 추가)
+CHAT_PAGE_SIZE = int(os.getenv("CHAT_PAGE_SIZE", "20"))
+
+# 페르소나 응답마다 미리 답을 만들어 둘 추가 질문 수 (0이면 사용 안 함)와 세션당 최대 미리 생성 횟수
+PREFETCH_FOLLOWUPS = int(os.getenv("PREFETCH_FOLLOWUPS", "0"))
+PREFETCH_BUDGET = int(os.getenv("PREFETCH_BUDGET", "20"))
+
+# FAQ 캐시: 같은 수업에서 비슷한 질문(유사도 FAQ_SIMILARITY 이상)의 이전 응답을 재사용
+# 대화 맥락이 쌓이기 전(대화 턴 수가 FAQ_MAX_HISTORY_TURNS 미만)에만 사용, 0이면 사용 안 함
+FAQ_SIMILARITY = float(os.getenv("FAQ_SIMILARITY", "0.75"))
+FAQ_MAX_HISTORY_TURNS = int(os.getenv("FAQ_MAX_HISTORY_TURNS", "4"))
+
+# 인터뷰 질문마다 선생님이 올린 자료에서 찾아 프롬프트에 넣을 구절 수 (0이면 사용 안 함)
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "3"))
+
+# 채점 때 학습 목표마다 함께 보낼 인터뷰 근거 요약의 최대 토큰 수
+EVIDENCE_TOKEN_BUDGET = int(os.getenv("EVIDENCE_TOKEN_BUDGET", "300"))
+
+# 세션 저장소에 보관하는 세션 상태 키 (새로고침/재시작 후 복원)
+PERSISTED_STATE_KEYS = (
+    'personae', 'objectives', 'topic_info', 'selected_persona_name',
+    'student_answers', 'grading_result', 'lesson_id'
+)
 
 
 # 페이지 설정
@@ -15,9 +57,95 @@ st.set_page_config(
 )
 
 
+@st.cache_resource
+def get_response_cache():
+    """모든 세션이 공유하는 생성 응답 캐시"""
+    return create_cache_from_env()
+
+
+@st.cache_resource
+def get_metrics():
+    """
+    모든 세션이 공유하는 호출 메트릭 집계기
+
+    METRICS_JSONL_PATH가 있으면 호출마다 JSONL로 기록하고,
+    METRICS_PORT가 있으면 로컬 Prometheus 엔드포인트(/metrics)를 연다.
+    """
+    metrics = MetricsRecorder(jsonl_path=os.getenv("METRICS_JSONL_PATH"))
+    if os.getenv("METRICS_PORT"):
+        metrics.start_http_server(int(os.getenv("METRICS_PORT")))
+    return metrics
+
+
+@st.cache_resource
+def get_session_store():
+    """모든 세션이 공유하는 세션 저장소 (SESSION_STORE_PATH)"""
+    return create_session_store_from_env()
+
+
+@st.cache_resource
+def get_faq_cache():
+    """모든 세션이 공유하는 수업·페르소나별 FAQ 캐시"""
+    return FAQCache(threshold=FAQ_SIMILARITY, metrics=get_metrics())
+
+
+@st.cache_resource
+def get_lesson_store():
+    """수업 패키지 저장소 (LESSON_PACKAGE_DIR)"""
+    return LessonPackageStore()
+
+
+@st.cache_resource
+def get_source_index():
+    """선생님이 올린 자료의 검색 색인 저장소 (SOURCE_INDEX_DIR)"""
+    return SourceIndexStore()
+
+
+@st.cache_data(show_spinner=False)
+def load_lesson_package(lesson_id):
+    """수업 패키지 읽기 (같은 수업에 들어오는 학생들은 한 번 읽은 결과를 공유)"""
+    return get_lesson_store().load(lesson_id)
+
+
+@st.cache_resource
+def get_llm_service():
+    """
+    모든 세션이 공유하는 LLM 서비스
+
+    비동기 클라이언트의 커넥션 풀을 프로세스 전체가 함께 쓰도록
+    세션마다 만들지 않고 한 번만 생성한다. (OPENAI_MAX_CONNECTIONS로 연결 수 조정)
+    요청 한도(LLM_RPM, LLM_TPM, IMAGE_RPM)도 모든 세션이 하나의 스케줄러로 나눠 쓴다.
+    호출 종류별 모델(LLM_MODEL_*, LLM_ESCALATE_*)에 쓰이는 모델마다 요청 한도를 따로 둔다.
+    """
+    routing = create_routing_from_env(metrics=get_metrics())
+    return LLMService(
+        cache=get_response_cache(),
+        metrics=get_metrics(),
+        max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "100")),
+        scheduler=create_scheduler_from_env(text_model=routing.default.model, extra_models=routing.models()),
+        routing=routing
+    )
+
+
 # 세션 상태 초기화
 def init_session_state():
-    """세션 상태 초기화"""
+    """
+    세션 상태 초기화
+
+    URL의 sid 쿼리 파라미터로 저장된 세션을 찾아 상태를 복원하고,
+    없으면 새 세션을 만들어 URL에 기록한다. (새로고침해도 같은 세션으로 이어짐)
+    """
+    if 'session_id' not in st.session_state:
+        store = get_session_store()
+        session_id = st.query_params.get("sid")
+        if not session_id or not store.exists(session_id):
+            session_id = store.create_session()
+            st.query_params["sid"] = session_id
+        st.session_state.session_id = session_id
+        for key, value in store.load_state(session_id).items():
+            if key in PERSISTED_STATE_KEYS:
+                st.session_state[key] = value
+
     if 'llm_service' not in st.session_state:
         st.session_state.llm_service = None
 
@@ -30,8 +158,11 @@ def init_session_state():
     if 'selected_persona_name' not in st.session_state:
         st.session_state.selected_persona_name = None
 
-    if 'persona_chats' not in st.session_state:
-        st.session_state.persona_chats = {}  # {persona_name: [chat_history]}
+    if 'chat_pages' not in st.session_state:
+        st.session_state.chat_pages = {}  # 페르소나별 표시 중인 대화 페이지 수 {persona_name: pages}
+
+    if 'persona_memories' not in st.session_state:
+        st.session_state.persona_memories = {}  # {persona_name: ConversationMemory}
 
     if 'student_answers' not in st.session_state:
         st.session_state.student_answers = {}  # 학습 목표별 답안 {objective_title: answer}
@@ -45,19 +176,171 @@ def init_session_state():
     if 'topic_info' not in st.session_state:
         st.session_state.topic_info = {}
 
+    if 'lesson_id' not in st.session_state:
+        st.session_state.lesson_id = None  # 배포되었거나 불러온 수업 패키지 ID
+
 
 init_session_state()
 
 
+def persist_state(key, value):
+    """세션 상태를 바꾸고 세션 저장소에도 저장"""
+    st.session_state[key] = value
+    get_session_store().save_state(st.session_state.session_id, key, value)
+
+
+def join_lesson(lesson_id):
+    """
+    수업 패키지를 불러와 현재 세션에 적용 (LLM 호출 없음)
+
+    Returns:
+        bool: 수업을 찾았는지 여부
+    """
+    package = load_lesson_package(lesson_id)
+    if package is None:
+        return False
+    persist_state('lesson_id', lesson_id)
+    persist_state('topic_info', package['topic_info'])
+    persist_state('personae', package['personae'])
+    persist_state('objectives', package['objectives'])
+    persist_state('selected_persona_name', None)
+    return True
+
+
+def lesson_system_prompt(persona_name):
+    """수업 패키지에 미리 만들어 둔 페르소나의 인터뷰 system 메시지 (없으면 None)"""
+    if not st.session_state.lesson_id:
+        return None
+    package = load_lesson_package(st.session_state.lesson_id)
+    return package['system_prompts'].get(persona_name) if package else None
+
+
+def source_collection_id():
+    """자료 색인 ID (수업 패키지로 참여했으면 수업 ID, 아니면 현재 세션 ID)"""
+    return st.session_state.lesson_id or st.session_state.session_id
+
+
+def retrieve_passages(persona, question):
+    """
+    질문과 관련된 자료 구절 검색 (페르소나 rag_hints 키워드를 보조 검색어로 사용)
+
+    Returns:
+        str: 인터뷰 프롬프트에 넣을 구절 텍스트 (자료가 없으면 빈 문자열)
+    """
+    if RAG_TOP_K <= 0:
+        return ""
+    keywords = (persona.get('rag_hints') or {}).get('keywords', [])
+    return format_passages(get_source_index().search(
+        source_collection_id(), question, k=RAG_TOP_K, boost_terms=keywords
+    ))
+
+
+# URL의 lesson 파라미터로 들어온 학생은 수업 패키지를 바로 불러온다
+if st.query_params.get("lesson") and st.query_params["lesson"] != st.session_state.lesson_id:
+    if not join_lesson(st.query_params["lesson"]):
+        st.error("❌ 수업을 찾을 수 없습니다. 수업 코드를 확인해주세요.")
+
+
+def get_prefetcher():
+    """세션별 추가 질문 미리 생성기 (없으면 생성)"""
+    if 'followup_prefetcher' not in st.session_state:
+        st.session_state.followup_prefetcher = FollowupPrefetcher(
+            st.session_state.llm_service,
+            max_followups=PREFETCH_FOLLOWUPS,
+            budget=PREFETCH_BUDGET
+        )
+    return st.session_state.followup_prefetcher
+
+
+def get_persona_memory(persona_name):
+    """페르소나별 대화 메모리 (없으면 생성하고 저장된 대화로 복원)"""
+    memories = st.session_state.persona_memories
+    if persona_name not in memories:
+        memory = ConversationMemory(
+            summarize=st.session_state.llm_service.summarize_conversation,
+            token_budget=CHAT_HISTORY_TOKEN_BUDGET
+        )
+        # 토큰 예산을 채우기에 충분한 최근 턴만 복원
+        memory.restore(get_session_store().load_turns(
+            st.session_state.session_id, persona_name, limit=CHAT_PAGE_SIZE
+        ))
+        memories[persona_name] = memory
+    return memories[persona_name]
+
+
+def get_evidence_digest():
+    """
+    세션별 인터뷰 근거 요약 (없거나 학습 목표가 바뀌었으면 저장된 대화로 다시 구성)
+
+    대화 턴이 추가될 때마다 갱신되므로 답안을 제출하면 바로 채점에 쓸 수 있다.
+    """
+    digest = st.session_state.get('evidence_digest')
+    if digest is None or digest.objectives != st.session_state.objectives:
+        digest = EvidenceDigest(st.session_state.objectives, token_budget=EVIDENCE_TOKEN_BUDGET)
+        digest.restore(get_session_store().load_turns(st.session_state.session_id))
+        st.session_state.evidence_digest = digest
+    return digest
+
+
+def queue_position_callback(placeholder):
+    """요청 한도로 대기하는 동안 대기 순서를 placeholder에 표시하는 on_queue 콜백"""
+    def show(position):
+        if position:
+            placeholder.info(f"⏳ 요청이 몰려 잠시 대기 중입니다. (대기 순서: {position}번째)")
+        else:
+            placeholder.empty()
+    return show
+
+
 # LLM 서비스 초기화
 if st.session_state.llm_service is None:
     try:
-        st.session_state.llm_service = LLMService()
+        st.session_state.llm_service = get_llm_service()
     except Exception as e:
         st.error(f"❌ LLM 서비스 초기화 실패: {str(e)}")
         st.info("환경변수에 OPENAI_API_KEY가 설정되어 있는지 확인해주세요.")
 
 
+# 사이드바 디버그 패널: 호출 종류별 시간/토큰/비용
+with st.sidebar:
+    if st.checkbox("🔧 디버그 패널", value=False):
+        metrics_summary = get_metrics().summary()
+        if metrics_summary:
+            st.caption("호출 종류별 메트릭 (프로세스 전체)")
+            st.dataframe(
+                [
+                    {
+                        '종류': call_type,
+                        '호출': row['calls'],
+                        '오류': row['errors'],
+                        '재시도': row['retries'],
+                        '평균(초)': round(row['wall_time_avg'], 2),
+                        'p95(초)': round(row['wall_time_p95'], 2) if row['wall_time_p95'] is not None else None,
+                        'TTFT(초)': round(row['ttft_avg'], 2) if row['ttft_avg'] is not None else None,
+                        '입력 토큰': row['prompt_tokens'],
+                        '캐시 토큰': row['cached_tokens'],
+                        '출력 토큰': row['completion_tokens'],
+                        '비용($)': round(row['cost_usd'], 4),
+                    }
+                    for call_type, row in metrics_summary.items()
+                ],
+                hide_index=True
+            )
+        else:
+            st.caption("아직 기록된 호출이 없습니다.")
+
+        for name, value in get_metrics().counters().items():
+            st.caption(f"{name}: {value}")
+        st.caption(f"응답 캐시: {get_response_cache().stats()}")
+        st.caption(f"FAQ 캐시: {get_faq_cache().stats()}")
+        if st.session_state.llm_service is not None:
+            st.caption(f"요청 대기열: {st.session_state.llm_service.scheduler.stats()}")
+            st.caption(f"중복 요청 합치기: {st.session_state.llm_service.single_flight.stats()}")
+            st.caption(f"상위 모델 재호출: {st.session_state.llm_service.routing.stats()}")
+        if 'followup_prefetcher' in st.session_state:
+            st.caption(f"추가 질문 미리 생성: {st.session_state.followup_prefetcher.stats()}")
+
+
 # 메인 제목
 st.title("🎓 AI 인터뷰 학습도구")
 st.markdown("---")
@@ -86,38 +369,37 @@ with tab1:
             st.subheader("추가 정보 (선택)")
             scope = st.text_area("수업 맥락/범위", placeholder="예: 일제강점기 중 문화통치 중심")
             persona_count = st.number_input("생성할 페르소나 수", min_value=1, max_value=3, value=2)
+            bypass_cache = st.checkbox(
+                "캐시 무시하고 새로 생성",
+                help="같은 주제/과목/학년으로 생성한 결과가 있어도 새로 생성합니다."
+            )
 
         if st.button("🚀 페르소나 및 학습목표 생성", type="primary", use_container_width=True):
             if not topic or not subject or not grade_level:
                 st.error("주제, 과목, 학년/연령은 필수 입력 항목입니다.")
             else:
-                with st.spinner("페르소나 생성 중..."):
+                with st.spinner("페르소나 및 학습목표 생성 중..."):
                     try:
                         # 주제 정보 저장
-                        st.session_state.topic_info = {
+                        persist_state('topic_info', {
                             'topic': topic,
                             'subject': subject,
                             'grade_level': grade_level,
                             'scope': scope
-                        }
+                        })
 
-                        # 페르소나 생성
-                        persona_result = st.session_state.llm_service.generate_persona(
+                        # 페르소나(이미지 포함)와 학습 목표를 동시에 생성
+                        persona_result, objectives_result = st.session_state.llm_service.generate_lesson(
                             topic=topic,
                             subject=subject,
                             grade_level=grade_level,
                             scope=scope,
-                            n=persona_count
+                            n=persona_count,
+                            bypass_cache=bypass_cache
                         )
-                        st.session_state.personae = persona_result
-
-                        # 학습 목표 생성
-                        objectives_result = st.session_state.llm_service.generate_objectives(
-                            topic=topic,
-                            subject=subject,
-                            grade_level=grade_level
-                        )
-                        st.session_state.objectives = objectives_result
+                        persist_state('personae', persona_result)
+                        persist_state('objectives', objectives_result)
+                        persist_state('lesson_id', None)
 
                         st.success("✅ 페르소나 및 학습목표가 생성되었습니다!")
 
@@ -139,10 +421,10 @@ with tab1:
                             st.info(f"📝 {persona['description']}")
 
                         # 페르소나 이미지 표시
-                        if persona.get('image_url'):
+                        if persona.get('thumbnail_path'):
                             col1, col2 = st.columns([1, 2])
                             with col1:
-                                st.image(persona['image_url'], use_container_width=True)
+                                st.image(persona['thumbnail_path'], use_container_width=True)
                             with col2:
                                 st.write(f"**시대/지역:** {persona['time_place']}")
                                 st.write(f"**말투/톤:** {persona['speaking_style']}")
@@ -177,307 +459,466 @@ with tab1:
                     for evidence in obj['required_evidence']:
                         st.write(f"  - {evidence}")
 
-# 탭 2: 학생 모드 (통합)
-with tab2:
-    st.header("🎓 학생 모드 - 인터뷰 & 답안 작성")
+        # 인터뷰 참고 자료: 질문마다 관련 구절만 찾아 프롬프트에 넣는다
+        if st.session_state.personae and RAG_TOP_K > 0:
+            st.markdown("---")
+            st.subheader("인터뷰 참고 자료 (선택)")
+            uploaded_sources = st.file_uploader(
+                "수업 자료 (텍스트 파일)",
+                type=["txt", "md"],
+                accept_multiple_files=True,
+                help="페르소나가 답할 때 근거로 삼을 자료입니다. 질문과 관련된 구절만 인터뷰에 사용됩니다."
+            )
+            if uploaded_sources and st.button("📚 자료 추가", use_container_width=True):
+                try:
+                    for uploaded in uploaded_sources:
+                        get_source_index().add_source(
+                            st.session_state.session_id,
+                            uploaded.name,
+                            uploaded.getvalue().decode("utf-8", errors="replace")
+                        )
+                    # 자료가 바뀌었으므로 배포된 수업 코드는 다시 배포해야 한다
+                    persist_state('lesson_id', None)
+                    st.success(f"✅ 자료 {len(uploaded_sources)}개를 추가했습니다.")
+                except Exception as e:
+                    st.error(f"❌ 자료 추가 실패: {str(e)}")
 
-    if st.session_state.llm_service is None:
-        st.warning("⚠️ LLM 서비스가 초기화되지 않았습니다. 환경변수를 확인해주세요.")
-    elif not st.session_state.personae or not st.session_state.objectives:
-        st.warning("⚠️ 먼저 '선생님 모드' 탭에서 페르소나와 학습목표를 생성해주세요.")
-    else:
-        # 학습 목표 및 답안 작성 섹션
-        st.subheader("📋 학습 목표 및 답안 작성")
-        st.info("💡 인터뷰를 통해 정보를 수집한 후, 각 학습 목표에 대한 답안을 작성하세요.")
+            for source, chunk_count in get_source_index().sources(source_collection_id()).items():
+                st.caption(f"📄 {source} (구절 {chunk_count}개)")
 
-        # 학습 목표별 답안 입력 칸
-        objectives_list = st.session_state.objectives.get('objectives', [])
-        for idx, obj in enumerate(objectives_list):
-            with st.expander(f"📝 {idx+1}. {obj['title']} ({obj['level']})", expanded=True):
-                st.markdown(f"**학습 목표:** {obj['objective']}")
-                st.caption(f"💬 가이드 질문: {obj['guide_question']}")
-
-                # 답안 입력 칸
-                answer_key = obj['title']
-                if answer_key not in st.session_state.student_answers:
-                    st.session_state.student_answers[answer_key] = ""
-
-                st.session_state.student_answers[answer_key] = st.text_area(
-                    f"답안 작성 (목표 {idx+1})",
-                    value=st.session_state.student_answers[answer_key],
-                    height=150,
-                    placeholder="인터뷰에서 얻은 정보를 바탕으로 답안을 작성하세요...",
-                    key=f"answer_{idx}",
-                    label_visibility="collapsed"
-                )
+        # 수업 패키지 배포: 학생들은 수업 코드로 같은 페르소나/학습 목표를 생성 없이 불러온다
+        if st.session_state.personae and st.session_state.objectives:
+            st.markdown("---")
+            st.subheader("학생용 수업 배포")
+            if st.button("📦 수업 패키지 배포", use_container_width=True):
+                try:
+                    lesson_id = get_lesson_store().publish(
+                        st.session_state.personae,
+                        st.session_state.objectives,
+                        topic_info=st.session_state.topic_info
+                    )
+                    get_source_index().copy_collection(st.session_state.session_id, lesson_id)
+                    persist_state('lesson_id', lesson_id)
+                except Exception as e:
+                    st.error(f"❌ 배포 실패: {str(e)}")
+
+            if st.session_state.lesson_id:
+                st.success(f"✅ 수업 코드: **{st.session_state.lesson_id}**")
+                st.caption(f"학생 접속 주소: 앱 주소 뒤에 `?lesson={st.session_state.lesson_id}`를 붙여 공유하세요.")
+
+
+def rerun_fragment():
+    """
+    현재 fragment만 다시 실행
 
-        st.markdown("---")
+    fragment 안의 위젯으로 시작된 실행이 아니면(전체 실행 중이면) 전체를 다시 실행한다.
+    """
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
+
+
+def save_answer(answer_key, widget_key):
+    """답안 입력 칸이 바뀌면 세션 저장소에 저장 (위젯 on_change 콜백)"""
+    persist_state('student_answers', {**st.session_state.student_answers, answer_key: st.session_state[widget_key]})
+
+
+# 학생 모드 화면은 영역별 fragment로 나눠, 한 영역의 위젯을 조작하면 그 영역만 다시 실행한다.
+# (인터뷰 한 턴이 선생님 탭, 페르소나 카드 이미지, 답안 칸을 다시 그리지 않도록)
+
+
+@st.fragment
+def answer_editor_section(objectives_list):
+    """학습 목표별 답안 입력 영역"""
+    for idx, obj in enumerate(objectives_list):
+        with st.expander(f"📝 {idx+1}. {obj['title']} ({obj['level']})", expanded=True):
+            st.markdown(f"**학습 목표:** {obj['objective']}")
+            st.caption(f"💬 가이드 질문: {obj['guide_question']}")
+
+            # 답안 입력 칸 (바뀔 때마다 저장)
+            st.text_area(
+                f"답안 작성 (목표 {idx+1})",
+                value=st.session_state.student_answers.get(obj['title'], ""),
+                height=150,
+                placeholder="인터뷰에서 얻은 정보를 바탕으로 답안을 작성하세요...",
+                key=f"answer_{idx}",
+                label_visibility="collapsed",
+                on_change=save_answer,
+                args=(obj['title'], f"answer_{idx}")
+            )
 
-        # 페르소나 선택 및 인터뷰 섹션
-        st.subheader("💬 페르소나 인터뷰")
 
-        # 페르소나 카드 선택 UI
-        st.markdown("#### 페르소나 선택")
-        personae_list = st.session_state.personae.get('personae', [])
+@st.fragment
+def persona_picker_section(personae_list):
+    """페르소나 카드 선택 영역"""
+    if personae_list:
+        # 페르소나 카드를 3개씩 1줄에 배치
+        for row_start in range(0, len(personae_list), 3):
+            cols = st.columns(3)
+            row_personae = personae_list[row_start:row_start + 3]
+
+            for col_idx, persona in enumerate(row_personae):
+                with cols[col_idx]:
+                    # 페르소나 이름으로 초기화
+                    persona_name = persona['display_name']
+
+                    # 선택 여부에 따라 카드 스타일 변경
+                    is_selected = st.session_state.selected_persona_name == persona_name
+
+                    # 카드 컨테이너 (가로 직사각형 레이아웃)
+                    with st.container(border=True):
+                        # 이미지와 텍스트를 가로로 배치 (황금비율)
+                        img_col, text_col = st.columns([1, 1.618])
+
+                        with img_col:
+                            # 페르소나 이미지 (작게)
+                            if persona.get('thumbnail_path'):
+                                st.image(persona['thumbnail_path'], use_container_width=True)
+
+                        with text_col:
+                            # 페르소나 이름
+                            st.markdown(f"**{persona_name}**")
+
+                            # 페르소나 설명 (짧게)
+                            if persona.get('description'):
+                                desc = persona['description']
+                                st.caption(desc[:60] + "..." if len(desc) > 60 else desc)
+
+                            # 선택 버튼
+                            button_type = "primary" if is_selected else "secondary"
+                            if st.button(
+                                "✓" if is_selected else "선택",
+                                key=f"select_{persona_name}",
+                                type=button_type,
+                                use_container_width=True
+                            ):
+                                # 인터뷰 대화 영역도 바뀌어야 하므로 전체를 다시 실행 (페르소나를 바꿀 때만)
+                                persist_state('selected_persona_name', persona_name)
+                                st.rerun()
 
-        if personae_list:
-            # 페르소나 카드를 3개씩 1줄에 배치
-            for row_start in range(0, len(personae_list), 3):
-                cols = st.columns(3)
-                row_personae = personae_list[row_start:row_start + 3]
-
-                for col_idx, persona in enumerate(row_personae):
-                    with cols[col_idx]:
-                        # 페르소나 이름으로 초기화
-                        persona_name = persona['display_name']
-                        if persona_name not in st.session_state.persona_chats:
-                            st.session_state.persona_chats[persona_name] = []
-
-                        # 선택 여부에 따라 카드 스타일 변경
-                        is_selected = st.session_state.selected_persona_name == persona_name
-
-                        # 카드 컨테이너 (가로 직사각형 레이아웃)
-                        with st.container(border=True):
-                            # 이미지와 텍스트를 가로로 배치 (황금비율)
-                            img_col, text_col = st.columns([1, 1.618])
-
-                            with img_col:
-                                # 페르소나 이미지 (작게)
-                                if persona.get('image_url'):
-                                    st.image(persona['image_url'], use_container_width=True)
-
-                            with text_col:
-                                # 페르소나 이름
-                                st.markdown(f"**{persona_name}**")
-
-                                # 페르소나 설명 (짧게)
-                                if persona.get('description'):
-                                    desc = persona['description']
-                                    st.caption(desc[:60] + "..." if len(desc) > 60 else desc)
-
-                                # 선택 버튼
-                                button_type = "primary" if is_selected else "secondary"
-                                if st.button(
-                                    "✓" if is_selected else "선택",
-                                    key=f"select_{persona_name}",
-                                    type=button_type,
-                                    use_container_width=True
-                                ):
-                                    st.session_state.selected_persona_name = persona_name
-                                    st.rerun()
+        st.markdown("---")
 
-            st.markdown("---")
 
-        # 인터뷰 대화 섹션 (선택된 페르소나가 있을 때만 표시)
-        if st.session_state.selected_persona_name:
-            st.markdown("#### 인터뷰 대화")
+@st.fragment
+def interview_section(personae_list):
+    """선택한 페르소나와의 인터뷰 대화 영역 (최근 대화만 표시하고 이전 대화는 페이지 단위로 불러옴)"""
+    if st.session_state.selected_persona_name:
+        st.markdown("#### 인터뷰 대화")
+
+        # 선택된 페르소나 정보 가져오기
+        selected_persona = next(
+            (p for p in personae_list if p['display_name'] == st.session_state.selected_persona_name),
+            None
+        )
+
+        if selected_persona:
+            # 현재 페르소나의 대화 기록 중 최근 페이지만 가져오기
+            session_id = st.session_state.session_id
+            persona_name = st.session_state.selected_persona_name
+            page_count = st.session_state.chat_pages.get(persona_name, 1)
+            total_turns = get_session_store().count_turns(session_id, persona_name)
+            current_chat_history = get_session_store().load_turns(
+                session_id, persona_name, limit=CHAT_PAGE_SIZE * page_count
+            )
 
-            # 선택된 페르소나 정보 가져오기
-            selected_persona = next(
-                (p for p in personae_list if p['display_name'] == st.session_state.selected_persona_name),
-                None
+            # 이전 대화가 더 있으면 한 페이지씩 더 불러오기
+            if total_turns > len(current_chat_history):
+                if st.button(f"⬆️ 이전 대화 더 보기 ({total_turns - len(current_chat_history)}개)"):
+                    st.session_state.chat_pages[persona_name] = page_count + 1
+                    rerun_fragment()
+
+            # 대화 기록 표시
+            chat_container = st.container()
+            with chat_container:
+                for chat_idx, chat in enumerate(current_chat_history):
+                    if chat['role'] == 'student':
+                        st.chat_message("user").write(chat['content'])
+                    else:
+                        # 페르소나 응답 표시 (페르소나 이미지를 아바타로)
+                        avatar_path = chat.get('avatar_path', None)
+                        with st.chat_message("assistant", avatar=avatar_path):
+                            # 본문 응답
+                            st.write(chat['content'])
+
+                            # 추가 질문 제안 (있는 경우, 마지막 응답의 제안은 눌러서 바로 질문)
+                            if chat.get('suggested_followups'):
+                                is_latest = chat_idx == len(current_chat_history) - 1
+                                with st.expander("💡 추가로 고려해볼 질문", expanded=is_latest):
+                                    for followup_idx, followup in enumerate(chat['suggested_followups']):
+                                        if not is_latest:
+                                            st.info(followup)
+                                        elif st.button(followup, key=f"followup_{followup_idx}"):
+                                            st.session_state.pending_question = followup
+                                            rerun_fragment()
+
+            # 질문 입력 (추가 질문 제안을 누른 경우 그 질문으로 진행)
+            student_question = (
+                st.chat_input("질문을 입력하세요")
+                or st.session_state.pop('pending_question', None)
             )
 
-            if selected_persona:
-                # 현재 페르소나의 대화 기록 가져오기
-                current_chat_history = st.session_state.persona_chats.get(
-                    st.session_state.selected_persona_name, []
-                )
+            if student_question:
+                # 대화 메모리와 근거 요약은 질문을 저장하기 전에 복원해야 이번 질문이 두 번 들어가지 않는다
+                persona_memory = get_persona_memory(persona_name)
+                evidence_digest = get_evidence_digest()
 
-                # 대화 기록 표시
-                chat_container = st.container()
+                # 학생 질문 추가
+                get_session_store().append_turn(session_id, persona_name, {
+                    'role': 'student',
+                    'content': student_question
+                })
+                evidence_digest.add_turn(persona_name, 'student', student_question)
+
+                # 인터뷰 응답 생성 (utterance를 토큰 단위로 바로 표시)
                 with chat_container:
-                    for chat in current_chat_history:
-                        if chat['role'] == 'student':
-                            st.chat_message("user").write(chat['content'])
+                    st.chat_message("user").write(student_question)
+                    try:
+                        # 대화 히스토리: 토큰 예산 안에서 요약 + 최근 턴
+                        chat_history_text = persona_memory.render()
+
+                        # 미리 생성해 둔 답이나 같은 수업의 비슷한 질문에 대한 답이 있으면 바로 표시,
+                        # 없으면 스트리밍 생성
+                        response = get_prefetcher().take(persona_name, student_question)
+                        use_faq = (
+                            st.session_state.lesson_id
+                            and len(persona_memory.turns) < FAQ_MAX_HISTORY_TURNS
+                        )
+                        if response is None and use_faq:
+                            response = get_faq_cache().lookup(
+                                st.session_state.lesson_id, persona_name, student_question
+                            )
+                        if response is not None:
+                            with st.chat_message("assistant", avatar=selected_persona.get('avatar_path')):
+                                st.write(response['utterance'])
                         else:
-                            # 페르소나 응답 표시 (페르소나 이미지를 아바타로)
-                            avatar_url = chat.get('avatar_url', None)
-                            with st.chat_message("assistant", avatar=avatar_url):
-                                # 본문 응답
-                                st.write(chat['content'])
-
-                                # 추가 질문 제안 (있는 경우)
-                                if chat.get('suggested_followups'):
-                                    with st.expander("💡 추가로 고려해볼 질문", expanded=False):
-                                        for followup in chat['suggested_followups']:
-                                            st.info(followup)
-
-                # 질문 입력
-                student_question = st.chat_input("질문을 입력하세요")
-
-                if student_question:
-                    # 학생 질문 추가
-                    st.session_state.persona_chats[st.session_state.selected_persona_name].append({
-                        'role': 'student',
-                        'content': student_question
-                    })
-
-                    # 인터뷰 응답 생성
-                    with st.spinner("응답 생성 중..."):
-                        try:
-                            # 대화 히스토리 포맷팅
-                            chat_history_text = "\n".join([
-                                f"{'학생' if c['role'] == 'student' else '페르소나'}: {c['content']}"
-                                for c in current_chat_history[-5:]  # 최근 5턴
-                            ])
-
-                            response = st.session_state.llm_service.generate_interview_response(
+                            response_stream = st.session_state.llm_service.generate_interview_response_stream(
                                 persona_card=selected_persona,
                                 student_question=student_question,
                                 learning_objectives=st.session_state.objectives,
                                 chat_history=chat_history_text,
-                                reading_level=selected_persona.get('reading_level', '중등')
+                                reading_level=selected_persona.get('reading_level', '중등'),
+                                on_queue=queue_position_callback(st.empty()),
+                                system_prompt=lesson_system_prompt(persona_name),
+                                passages=retrieve_passages(selected_persona, student_question),
+                                session_id=session_id
                             )
+                            with st.chat_message("assistant", avatar=selected_persona.get('avatar_path')):
+                                st.write_stream(response_stream)
+                            response = response_stream.result
+                            if use_faq:
+                                get_faq_cache().store(
+                                    st.session_state.lesson_id, persona_name, student_question, response
+                                )
+
+                        # 응답을 구조화하여 저장
+                        chat_entry = {
+                            'role': 'persona',
+                            'content': response['utterance']
+                        }
 
-                            # 응답을 구조화하여 저장
-                            chat_entry = {
-                                'role': 'persona',
-                                'content': response['utterance']
-                            }
+                        # 페르소나 아바타 이미지 경로 추가
+                        if selected_persona.get('avatar_path'):
+                            chat_entry['avatar_path'] = selected_persona['avatar_path']
+
+                        # 추가 질문 제안이 있으면 추가
+                        if response.get('suggested_followups'):
+                            chat_entry['suggested_followups'] = response['suggested_followups']
+
+                        get_session_store().append_turn(session_id, persona_name, chat_entry)
+                        evidence_digest.add_turn(persona_name, 'persona', response['utterance'])
+                        persona_memory.add_turn('student', student_question)
+                        persona_memory.add_turn('persona', response['utterance'])
+
+                        # 다음 턴에 나올 가능성이 큰 추가 질문의 답을 백그라운드에서 미리 생성
+                        get_prefetcher().start(
+                            persona_name,
+                            response.get('suggested_followups', []),
+                            retrieve=lambda question: retrieve_passages(selected_persona, question),
+                            persona_card=selected_persona,
+                            learning_objectives=st.session_state.objectives,
+                            chat_history=persona_memory.render(),
+                            reading_level=selected_persona.get('reading_level', '중등'),
+                            system_prompt=lesson_system_prompt(persona_name),
+                            session_id=session_id
+                        )
 
-                            # 페르소나 이미지 URL 추가
-                            if selected_persona.get('image_url'):
-                                chat_entry['avatar_url'] = selected_persona['image_url']
+                        rerun_fragment()
 
-                            # 추가 질문 제안이 있으면 추가
-                            if response.get('suggested_followups'):
-                                chat_entry['suggested_followups'] = response['suggested_followups']
+                    except Exception as e:
+                        st.error(f"❌ 응답 생성 실패: {str(e)}")
 
-                            st.session_state.persona_chats[st.session_state.selected_persona_name].append(chat_entry)
+            # 인터뷰 초기화 버튼
+            st.markdown("---")
+            col_reset1, col_reset2 = st.columns([3, 1])
+            with col_reset2:
+                if st.button("🔄 현재 인터뷰 초기화", type="secondary", use_container_width=True):
+                    get_session_store().clear_turns(session_id, persona_name)
+                    get_evidence_digest().clear(persona_name)
+                    get_persona_memory(persona_name).clear()
+                    get_prefetcher().cancel()
+                    st.session_state.chat_pages.pop(persona_name, None)
+                    rerun_fragment()
+    else:
+        st.info("👆 페르소나를 선택하여 인터뷰를 시작하세요.")
+
+
+# 채점 결과 모달
+@st.dialog("📊 채점 결과", width="large")
+def show_grading_modal():
+    """채점 결과 대화상자"""
+    result = st.session_state.grading_result
+
+    if result.get('regraded_objectives') is not None:
+        regraded_count = len(result['regraded_objectives'])
+        total_count = len(st.session_state.objectives.get('objectives', []))
+        if regraded_count == 0:
+            st.caption("답안이 바뀌지 않아 이전 채점 결과를 그대로 사용했습니다.")
+        elif regraded_count < total_count:
+            st.caption(f"답안이 바뀐 학습 목표 {regraded_count}개만 새로 채점하고, 나머지는 이전 채점 결과를 사용했습니다.")
+
+    # 전체 점수
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("평균 점수", f"{result['weighted_total']['raw']:.2f} / 3.0")
+    with col2:
+        st.metric("가중 점수", f"{result['weighted_total']['weighted']:.2f}")
+    with col3:
+        band = result['weighted_total']['band']
+        color = {
+            '미달': '🔴',
+            '기본': '🟡',
+            '충족': '🟢',
+            '우수': '🌟'
+        }.get(band, '')
+        st.metric("평가 등급", f"{color} {band}")
+
+    st.markdown("---")
+
+    # 기준별 점수
+    st.subheader("📈 평가 기준별 점수")
+    for score in result.get('scores', []):
+        with st.expander(f"{score['criterion']}: {score['level']}/3", expanded=False):
+            st.write(f"**근거:** {score['reason']}")
+            st.info(f"💡 **개선 방법:** {score['fix']}")
+
+    # 학습 목표 달성도
+    st.subheader("🎯 학습 목표 달성도")
+    for alignment in result.get('objective_alignment', []):
+        status = "✅" if alignment['met'] else "❌"
+        with st.expander(f"{status} {alignment['objective_title']}", expanded=False):
+            if alignment['met']:
+                st.success("목표 달성!")
+                if alignment.get('evidence_spans'):
+                    st.write("**근거:**")
+                    for evidence in alignment['evidence_spans']:
+                        st.write(f"  - {evidence}")
+            else:
+                st.warning(f"**부족한 점:** {alignment['gap']}")
+
+    # 다음 단계
+    if result.get('next_steps'):
+        st.subheader("🚀 다음 단계")
+        for step in result['next_steps']:
+            st.write(f"- {step}")
+
+    # 플래그
+    if result.get('flags'):
+        st.subheader("⚠️ 주의사항")
+        for flag in result['flags']:
+            st.warning(flag)
+
+    # 닫기 버튼
+    if st.button("닫기", type="primary", use_container_width=True):
+        st.session_state.show_grading_modal = False
+        st.rerun()
+
+
+@st.fragment
+def grading_section(objectives_list):
+    """답안 제출 및 채점 결과 영역"""
+    submit_col1, submit_col2 = st.columns([3, 1])
+    with submit_col2:
+        if st.button("📤 답안 제출 및 채점", type="primary", use_container_width=True):
+            # 답안이 모두 작성되었는지 확인
+            all_answered = all(
+                st.session_state.student_answers.get(obj['title'], '').strip()
+                for obj in objectives_list
+            )
 
-                            st.rerun()
+            if not all_answered:
+                st.error("❌ 모든 학습 목표에 대한 답안을 작성해주세요.")
+            else:
+                # 채점 진행 (요청이 몰리면 대기 순서 표시)
+                queue_notice = st.empty()
+                with st.spinner("채점 중..."):
+                    try:
+                        # 학습 목표별 인터뷰 근거 요약 (대화하는 동안 미리 갱신해 둔 것)
+                        interview_summary = {
+                            title: summary or "관련 인터뷰 기록 없음"
+                            for title, summary in get_evidence_digest().summaries().items()
+                        }
 
-                        except Exception as e:
-                            st.error(f"❌ 응답 생성 실패: {str(e)}")
+                        # 학습 목표별 채점 (다시 제출하면 답안이나 인터뷰 근거가 바뀐 목표만 새로 채점)
+                        grading_result = st.session_state.llm_service.grade_answers_by_objective(
+                            objectives=st.session_state.objectives,
+                            answers=st.session_state.student_answers,
+                            interview_summary=interview_summary,
+                            on_queue=queue_position_callback(queue_notice),
+                            session_id=st.session_state.session_id,
+                            lesson_id=st.session_state.lesson_id
+                        )
 
-                # 인터뷰 초기화 버튼
-                st.markdown("---")
-                col_reset1, col_reset2 = st.columns([3, 1])
-                with col_reset2:
-                    if st.button("🔄 현재 인터뷰 초기화", type="secondary", use_container_width=True):
-                        st.session_state.persona_chats[st.session_state.selected_persona_name] = []
-                        st.rerun()
-        else:
-            st.info("👆 페르소나를 선택하여 인터뷰를 시작하세요.")
+                        persist_state('grading_result', grading_result)
+                        st.session_state.show_grading_modal = True
+                        rerun_fragment()
 
-        st.markdown("---")
+                    except Exception as e:
+                        st.error(f"❌ 채점 실패: {str(e)}")
 
-        # 제출 버튼
-        submit_col1, submit_col2 = st.columns([3, 1])
-        with submit_col2:
-            if st.button("📤 답안 제출 및 채점", type="primary", use_container_width=True):
-                # 답안이 모두 작성되었는지 확인
-                all_answered = all(
-                    st.session_state.student_answers.get(obj['title'], '').strip()
-                    for obj in objectives_list
-                )
-
-                if not all_answered:
-                    st.error("❌ 모든 학습 목표에 대한 답안을 작성해주세요.")
-                else:
-                    # 채점 진행
-                    with st.spinner("채점 중..."):
-                        try:
-                            # 모든 답안을 하나의 텍스트로 합치기
-                            combined_answer = "\n\n".join([
-                                f"[{obj['title']}]\n{st.session_state.student_answers.get(obj['title'], '')}"
-                                for obj in objectives_list
-                            ])
-
-                            # 인터뷰 로그 요약 생성 (모든 페르소나와의 대화 합치기)
-                            all_chats = []
-                            for persona_name, chats in st.session_state.persona_chats.items():
-                                for chat in chats:
-                                    all_chats.append({
-                                        'persona': persona_name,
-                                        'role': chat['role'],
-                                        'content': chat['content']
-                                    })
-
-                            interview_summary = "\n".join([
-                                f"[{c['persona']}] {'학생' if c['role'] == 'student' else '페르소나'}: {c['content'][:100]}..."
-                                for c in all_chats[-10:]  # 최근 10턴
-                            ]) if all_chats else "인터뷰 기록 없음"
-
-                            # 채점
-                            grading_result = st.session_state.llm_service.grade_answer(
-                                objectives=st.session_state.objectives,
-                                student_answer=combined_answer,
-                                interview_summary=interview_summary
-                            )
+    # 모달 표시
+    if st.session_state.show_grading_modal and st.session_state.grading_result:
+        show_grading_modal()
 
-                            st.session_state.grading_result = grading_result
-                            st.session_state.show_grading_modal = True
-                            st.rerun()
-
-                        except Exception as e:
-                            st.error(f"❌ 채점 실패: {str(e)}")
-
-        # 채점 결과 모달
-        @st.dialog("📊 채점 결과", width="large")
-        def show_grading_modal():
-            result = st.session_state.grading_result
-
-            # 전체 점수
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                st.metric("평균 점수", f"{result['weighted_total']['raw']:.2f} / 3.0")
-            with col2:
-                st.metric("가중 점수", f"{result['weighted_total']['weighted']:.2f}")
-            with col3:
-                band = result['weighted_total']['band']
-                color = {
-                    '미달': '🔴',
-                    '기본': '🟡',
-                    '충족': '🟢',
-                    '우수': '🌟'
-                }.get(band, '')
-                st.metric("평가 등급", f"{color} {band}")
 
-            st.markdown("---")
+# 탭 2: 학생 모드 (통합)
+with tab2:
+    st.header("🎓 학생 모드 - 인터뷰 & 답안 작성")
 
-            # 기준별 점수
-            st.subheader("📈 평가 기준별 점수")
-            for score in result.get('scores', []):
-                with st.expander(f"{score['criterion']}: {score['level']}/3", expanded=False):
-                    st.write(f"**근거:** {score['reason']}")
-                    st.info(f"💡 **개선 방법:** {score['fix']}")
-
-            # 학습 목표 달성도
-            st.subheader("🎯 학습 목표 달성도")
-            for alignment in result.get('objective_alignment', []):
-                status = "✅" if alignment['met'] else "❌"
-                with st.expander(f"{status} {alignment['objective_title']}", expanded=False):
-                    if alignment['met']:
-                        st.success("목표 달성!")
-                        if alignment.get('evidence_spans'):
-                            st.write("**근거:**")
-                            for evidence in alignment['evidence_spans']:
-                                st.write(f"  - {evidence}")
-                    else:
-                        st.warning(f"**부족한 점:** {alignment['gap']}")
-
-            # 다음 단계
-            if result.get('next_steps'):
-                st.subheader("🚀 다음 단계")
-                for step in result['next_steps']:
-                    st.write(f"- {step}")
-
-            # 플래그
-            if result.get('flags'):
-                st.subheader("⚠️ 주의사항")
-                for flag in result['flags']:
-                    st.warning(flag)
-
-            # 닫기 버튼
-            if st.button("닫기", type="primary", use_container_width=True):
-                st.session_state.show_grading_modal = False
+    if st.session_state.llm_service is None:
+        st.warning("⚠️ LLM 서비스가 초기화되지 않았습니다. 환경변수를 확인해주세요.")
+    elif not st.session_state.personae or not st.session_state.objectives:
+        st.warning("⚠️ 선생님이 알려준 수업 코드를 입력하거나, '선생님 모드' 탭에서 페르소나와 학습목표를 생성해주세요.")
+        lesson_code = st.text_input("수업 코드", placeholder="예: 3f9a1c2b7d4e")
+        if st.button("수업 참여") and lesson_code:
+            if join_lesson(lesson_code.strip()):
                 st.rerun()
+            else:
+                st.error("❌ 수업을 찾을 수 없습니다. 수업 코드를 확인해주세요.")
+    else:
+        # 학습 목표 및 답안 작성 섹션
+        st.subheader("📋 학습 목표 및 답안 작성")
+        st.info("💡 인터뷰를 통해 정보를 수집한 후, 각 학습 목표에 대한 답안을 작성하세요.")
+
+        objectives_list = st.session_state.objectives.get('objectives', [])
+        answer_editor_section(objectives_list)
+
+        st.markdown("---")
+
+        # 페르소나 선택 및 인터뷰 섹션
+        st.subheader("💬 페르소나 인터뷰")
+
+        # 페르소나 카드 선택 UI
+        st.markdown("#### 페르소나 선택")
+        personae_list = st.session_state.personae.get('personae', [])
+        persona_picker_section(personae_list)
+
+        # 인터뷰 대화 섹션 (선택된 페르소나가 있을 때만 표시)
+        interview_section(personae_list)
+
+        st.markdown("---")
+        grading_section(objectives_list)
 
-        # 모달 표시
-        if st.session_state.show_grading_modal and st.session_state.grading_result:
-            show_grading_modal()
 
 
 # 푸터
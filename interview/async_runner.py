@@ -0,0 +1,138 @@
+"""
+비동기 실행 모듈 - 프로세스 공용 이벤트 루프에서 비동기 LLM 호출을 실행
+"""
+import asyncio
+import concurrent.futures
+import queue
+import threading
+import time
+
+_runner = None
+_runner_lock = threading.Lock()
+
+_STREAM_END = object()
+
+
+class AsyncRunner:
+    """
+    백그라운드 스레드의 이벤트 루프 하나로 모든 비동기 호출을 처리하는 실행기
+
+    Streamlit 스크립트 스레드는 결과를 기다리기만 하고, 실제 HTTP 입출력은
+    이 루프가 공유 커넥션 풀로 처리한다. 세션 수만큼 스레드와 커넥션을 만들지 않아도 된다.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self.loop.run_forever,
+            name="llm-event-loop",
+            daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, coro):
+        """
+        코루틴을 이벤트 루프에 예약
+
+        Args:
+            coro: 실행할 코루틴
+
+        Returns:
+            concurrent.futures.Future: 결과를 담을 Future
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None, on_wait=None, poll_interval=0.25):
+        """
+        코루틴을 실행하고 결과를 기다림 (동기 호출용)
+
+        Args:
+            coro: 실행할 코루틴
+            timeout: 최대 대기 시간(초)
+            on_wait: 기다리는 동안 호출 스레드에서 주기적으로 호출할 함수 (예: 대기열 위치 표시)
+            poll_interval: on_wait 호출 간격(초)
+
+        Returns:
+            코루틴의 반환값
+        """
+        if self._in_loop_thread():
+            raise RuntimeError("이벤트 루프 스레드 안에서는 run()을 호출할 수 없습니다. await를 사용하세요.")
+        future = self.submit(coro)
+        try:
+            if on_wait is None:
+                return future.result(timeout)
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while True:
+                on_wait()
+                try:
+                    result = future.result(poll_interval)
+                except concurrent.futures.TimeoutError:
+                    if deadline is not None and time.monotonic() >= deadline:
+                        raise
+                else:
+                    on_wait()
+                    return result
+        except BaseException:
+            future.cancel()
+            raise
+
+    def iterate(self, async_iterable, on_wait=None, poll_interval=0.25):
+        """
+        비동기 이터레이터를 동기 제너레이터로 변환 (스트리밍 응답용)
+
+        소비하는 쪽이 중간에 멈추면(제너레이터 close) 루프의 작업도 취소된다.
+
+        Args:
+            async_iterable: 비동기 이터레이터 (async generator 등)
+            on_wait: 다음 항목을 기다리는 동안 호출 스레드에서 주기적으로 호출할 함수
+            poll_interval: on_wait 호출 간격(초)
+
+        Yields:
+            비동기 이터레이터가 반환하는 항목
+        """
+        items = queue.Queue()
+
+        async def pump():
+            try:
+                async for item in async_iterable:
+                    items.put((item, None))
+            except BaseException as e:
+                items.put((_STREAM_END, e))
+                raise
+            items.put((_STREAM_END, None))
+
+        future = self.submit(pump())
+        try:
+            while True:
+                if on_wait is None:
+                    item, error = items.get()
+                else:
+                    on_wait()
+                    try:
+                        item, error = items.get(timeout=poll_interval)
+                    except queue.Empty:
+                        continue
+                if item is _STREAM_END:
+                    if error is not None and not isinstance(error, asyncio.CancelledError):
+                        raise error
+                    return
+                yield item
+        finally:
+            future.cancel()
+
+    def _in_loop_thread(self):
+        return threading.current_thread() is self._thread
+
+
+def get_runner():
+    """
+    프로세스 공용 AsyncRunner 반환 (처음 호출 시 생성)
+
+    Returns:
+        AsyncRunner: 공용 실행기
+    """
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = AsyncRunner()
+        return _runner
@@ -0,0 +1,388 @@
+"""
+일괄 채점 모듈 - 반 전체 답안을 Batch API 한 번으로 채점하고 결과를 학생별로 연결
+
+사용 예:
+    python batch_grading.py submissions.jsonl results.jsonl --objectives objectives.json
+
+submissions.jsonl 한 줄 형식:
+    {"student_id": "s01", "student_answer": "...", "interview_summary": "...",
+     "objectives": {...}, "weights": "...", "originality_rules": "..."}
+    (objectives는 --objectives 파일로 한 번에 지정할 수 있고, 줄마다 지정하면 그 값이 우선)
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import sys
+import time
+import uuid
+
+from compaction import PromptCompactor
+from prompts import GRADING_OUTPUT_SCHEMA, format_grading_messages
+from routing import create_routing_from_env
+from structured_output import parse_structured, response_format as json_response_format
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+# 더 이상 바뀌지 않는 배치 상태
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+class OpenAIBatchBackend:
+    """
+    OpenAI Batch API 백엔드
+
+    요청을 JSONL 파일로 업로드해 배치를 만들고, 완료되면 결과 파일을 받아온다.
+    (24시간 안에 처리되며 일반 호출보다 저렴하다)
+    """
+
+    def __init__(self, client=None, completion_window="24h"):
+        """
+        Args:
+            client: OpenAI 클라이언트, None이면 OPENAI_API_KEY로 생성
+            completion_window: 배치 처리 기한
+        """
+        if client is None:
+            from openai import OpenAI
+
+            api_key = os.getenv("OPENAI_API_KEY")
+            if not api_key:
+                raise ValueError("OPENAI_API_KEY가 설정되지 않았습니다.")
+            client = OpenAI(api_key=api_key)
+        self.client = client
+        self.completion_window = completion_window
+
+    def submit(self, requests):
+        """
+        요청 목록을 배치로 제출
+
+        Args:
+            requests: Batch API 요청 dict 리스트 (custom_id, method, url, body)
+
+        Returns:
+            str: 배치 ID
+        """
+        payload = "".join(json.dumps(request, ensure_ascii=False) + "\n" for request in requests)
+        batch_file = self.client.files.create(
+            file=("grading_batch.jsonl", io.BytesIO(payload.encode("utf-8"))),
+            purpose="batch"
+        )
+        batch = self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=self.completion_window
+        )
+        return batch.id
+
+    def status(self, batch_id):
+        """배치 상태 (validating, in_progress, finalizing, completed, failed 등)"""
+        return self.client.batches.retrieve(batch_id).status
+
+    def results(self, batch_id):
+        """
+        완료된 배치의 결과
+
+        Returns:
+            dict: {custom_id: {"text": 응답 텍스트, "usage": dict, "error": 오류 메시지}}
+        """
+        batch = self.client.batches.retrieve(batch_id)
+        results = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in self.client.files.content(file_id).text.splitlines():
+                if line.strip():
+                    record = json.loads(line)
+                    results[record["custom_id"]] = _parse_batch_record(record)
+        return results
+
+
+def _parse_batch_record(record):
+    """Batch API 결과 한 줄을 {"text", "usage", "error"}로 변환"""
+    response = record.get("response") or {}
+    body = response.get("body") or {}
+    error = record.get("error")
+    if error:
+        return {"text": None, "usage": None, "error": error.get("message") or str(error)}
+    if response.get("status_code") != 200:
+        message = (body.get("error") or {}).get("message") or f"HTTP {response.get('status_code')}"
+        return {"text": None, "usage": None, "error": message}
+    return {
+        "text": body["choices"][0]["message"]["content"],
+        "usage": body.get("usage"),
+        "error": None
+    }
+
+
+class LocalBatchBackend:
+    """
+    Batch API 대신 LLMService로 요청을 바로 처리하는 대체 백엔드 (테스트/소규모 반용)
+
+    요청은 공용 이벤트 루프에서 동시에 실행되며, 스케줄러에서 채점 우선순위로 처리되므로
+    진행 중인 인터뷰 응답을 밀어내지 않는다. 요청 body의 model/temperature를 그대로 사용하므로
+    Batch API로 제출했을 때와 같은 설정으로 채점한다.
+    """
+
+    def __init__(self, service):
+        """
+        Args:
+            service: LLMService 인스턴스
+        """
+        self.service = service
+        self._jobs = {}
+
+    def submit(self, requests):
+        """요청 목록을 백그라운드에서 실행하고 배치 ID 반환"""
+        batch_id = f"local-{uuid.uuid4().hex}"
+        self._jobs[batch_id] = self.service._runner.submit(self._run(requests))
+        return batch_id
+
+    def status(self, batch_id):
+        """배치 상태 (in_progress 또는 completed)"""
+        return "completed" if self._job(batch_id).done() else "in_progress"
+
+    def results(self, batch_id):
+        """배치 결과 ({custom_id: {"text", "usage", "error"}})"""
+        return self._job(batch_id).result()
+
+    def _job(self, batch_id):
+        """이 프로세스에서 제출한 로컬 배치 (로컬 배치는 메모리에만 있어 이어받을 수 없음)"""
+        job = self._jobs.get(batch_id)
+        if job is None:
+            raise ValueError(f"이 프로세스에서 제출한 로컬 배치가 아닙니다: {batch_id}")
+        return job
+
+    async def _run(self, requests):
+        async def run_one(request):
+            body = request["body"]
+            try:
+                text = await self.service.acall_llm(
+                    body["messages"],
+                    max_tokens=body["max_tokens"],
+                    response_format=body.get("response_format"),
+                    call_type="grading",
+                    model=body.get("model"),
+                    temperature=body.get("temperature")
+                )
+                return {"text": text, "usage": None, "error": None}
+            except Exception as e:
+                return {"text": None, "usage": None, "error": str(e)}
+
+        outputs = await asyncio.gather(*(run_one(request) for request in requests))
+        return {request["custom_id"]: output for request, output in zip(requests, outputs)}
+
+
+class BatchGrader:
+    """
+    반 전체 답안 일괄 채점기
+
+    학생별 채점 메시지를 Batch API 요청으로 모아 제출하고, 완료될 때까지 상태를 확인한 뒤
+    결과를 student_id로 학생에게 다시 연결한다.
+    """
+
+    def __init__(self, backend, model="gpt-4.1-nano", temperature=0.7, max_tokens=4000):
+        """
+        Args:
+            backend: 배치 백엔드 (OpenAIBatchBackend 또는 LocalBatchBackend)
+            model: 채점 모델명
+            temperature: 채점 temperature
+            max_tokens: 답안당 최대 출력 토큰 수
+        """
+        self.backend = backend
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.compactor = PromptCompactor()
+
+    def build_requests(self, submissions, objectives=None):
+        """
+        제출 답안을 Batch API 요청으로 변환
+
+        Args:
+            submissions: 학생 답안 dict 리스트 (student_id, student_answer 필수)
+            objectives: 모든 학생에게 공통인 학습 목표 (dict), 답안별 objectives가 있으면 그 값 사용
+
+        Returns:
+            list: Batch API 요청 dict 리스트
+        """
+        requests = []
+        seen = set()
+        for submission in submissions:
+            student_id = str(submission["student_id"])
+            if student_id in seen:
+                raise ValueError(f"student_id가 중복되었습니다: {student_id}")
+            seen.add(student_id)
+
+            submission_objectives = submission.get("objectives") or objectives
+            if not submission_objectives:
+                raise ValueError(f"학습 목표가 없습니다: {student_id}")
+
+            messages = format_grading_messages(
+                objectives_json=self.compactor.compact_objectives(submission_objectives),
+                student_answer=submission["student_answer"],
+                interview_summary=submission.get("interview_summary", ""),
+                weights=submission.get("weights", ""),
+                originality_rules=submission.get("originality_rules", "")
+            )
+            requests.append({
+                "custom_id": student_id,
+                "method": "POST",
+                "url": BATCH_ENDPOINT,
+                "body": {
+                    "model": self.model,
+                    "messages": messages,
+                    "max_tokens": self.max_tokens,
+                    "temperature": self.temperature,
+                    "response_format": json_response_format("grading_result", GRADING_OUTPUT_SCHEMA)
+                }
+            })
+        return requests
+
+    def submit(self, submissions, objectives=None):
+        """
+        답안을 배치로 제출
+
+        Returns:
+            str: 배치 ID (나중에 wait/collect로 이어서 처리)
+        """
+        return self.backend.submit(self.build_requests(submissions, objectives))
+
+    def wait(self, batch_id, poll_interval=30.0, on_status=None):
+        """
+        배치가 끝날 때까지 상태 확인
+
+        Args:
+            batch_id: 배치 ID
+            poll_interval: 상태 확인 간격(초)
+            on_status: 상태를 확인할 때마다 호출할 함수 (status 문자열을 받음)
+
+        Returns:
+            str: 최종 상태
+        """
+        while True:
+            status = self.backend.status(batch_id)
+            if on_status is not None:
+                on_status(status)
+            if status in TERMINAL_STATUSES:
+                return status
+            time.sleep(poll_interval)
+
+    def collect(self, batch_id, submissions):
+        """
+        배치 결과를 학생별로 연결
+
+        Args:
+            batch_id: 완료된 배치 ID
+            submissions: 제출한 학생 답안 dict 리스트 (결과 순서 기준)
+
+        Returns:
+            list: [{"student_id", "grading_result", "usage", "error"}] (제출 순서)
+        """
+        results = self.backend.results(batch_id)
+        graded = []
+        for submission in submissions:
+            student_id = str(submission["student_id"])
+            result = results.get(student_id) or {"text": None, "usage": None, "error": "결과 없음"}
+            grading_result = None
+            error = result["error"]
+            if error is None:
+                try:
+                    grading_result = parse_structured(result["text"], GRADING_OUTPUT_SCHEMA)
+                except Exception as e:
+                    error = f"채점 결과 파싱 실패: {str(e)}"
+            graded.append({
+                "student_id": student_id,
+                "grading_result": grading_result,
+                "usage": result["usage"],
+                "error": error
+            })
+        return graded
+
+    def grade(self, submissions, objectives=None, poll_interval=30.0, on_status=None):
+        """
+        제출부터 결과 연결까지 한 번에 실행
+
+        Returns:
+            list: collect()와 같은 형식의 학생별 채점 결과
+        """
+        batch_id = self.submit(submissions, objectives)
+        status = self.wait(batch_id, poll_interval, on_status)
+        if status != "completed":
+            raise RuntimeError(f"배치 채점이 완료되지 않았습니다: {batch_id} ({status})")
+        return self.collect(batch_id, submissions)
+
+
+def read_jsonl(path):
+    """JSONL 파일 읽기 (빈 줄 무시)"""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def write_jsonl(path, rows):
+    """JSONL 파일 쓰기"""
+    with open(path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+def main(argv=None):
+    """일괄 채점 CLI"""
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="반 전체 답안 일괄 채점 (Batch API)")
+    parser.add_argument("submissions", help="학생 답안 JSONL 파일")
+    parser.add_argument("output", help="채점 결과를 쓸 JSONL 파일")
+    parser.add_argument("--objectives", help="공통 학습 목표 JSON 파일 (generate_objectives 결과)")
+    parser.add_argument("--batch-id", help="이미 제출한 배치 ID (결과만 이어서 받기)")
+    parser.add_argument("--poll-interval", type=float, default=None,
+                        help="상태 확인 간격(초, 기본값 30, --local이면 1)")
+    parser.add_argument("--local", action="store_true",
+                        help="Batch API 대신 일반 API로 바로 채점 (테스트/소규모용)")
+    args = parser.parse_args(argv)
+    if args.local and args.batch_id:
+        parser.error("--batch-id는 --local과 함께 쓸 수 없습니다")
+
+    submissions = read_jsonl(args.submissions)
+    objectives = None
+    if args.objectives:
+        with open(args.objectives, encoding="utf-8") as f:
+            objectives = json.load(f)
+
+    # 채점 모델/temperature는 앱과 같은 라우팅 설정(LLM_MODEL_GRADING, LLM_TEMPERATURE_GRADING)을 따른다
+    routing = create_routing_from_env()
+    if args.local:
+        from llm_service import LLMService
+        from scheduler import create_scheduler_from_env
+
+        # 앱의 get_llm_service와 같은 구성 (LLM_RPM/LLM_TPM과 라우팅 모델별 요청 한도 적용)
+        backend = LocalBatchBackend(LLMService(
+            scheduler=create_scheduler_from_env(text_model=routing.default.model, extra_models=routing.models()),
+            routing=routing
+        ))
+    else:
+        backend = OpenAIBatchBackend()
+    route = routing.route("grading")
+    grader = BatchGrader(backend, model=route.model, temperature=route.temperature)
+
+    batch_id = args.batch_id or grader.submit(submissions, objectives)
+    print(f"배치 ID: {batch_id}", file=sys.stderr)
+    status = grader.wait(
+        batch_id,
+        poll_interval=args.poll_interval if args.poll_interval is not None else (1.0 if args.local else 30.0),
+        on_status=lambda s: print(f"상태: {s}", file=sys.stderr)
+    )
+    if status != "completed":
+        print(f"배치 채점이 완료되지 않았습니다 ({status})", file=sys.stderr)
+        return 1
+
+    graded = grader.collect(batch_id, submissions)
+    write_jsonl(args.output, graded)
+    failed = sum(1 for row in graded if row["error"])
+    print(f"채점 완료: {len(graded) - failed}명 성공, {failed}명 실패 → {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
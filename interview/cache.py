@@ -0,0 +1,258 @@
+"""
+응답 캐시 모듈 - 동일한 생성 요청의 LLM 응답 재사용
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_cache_key(model, prompt, max_tokens, temperature):
+    """
+    캐시 키 생성 (모델명, 포맷팅된 프롬프트, max_tokens, temperature 기준)
+
+    Args:
+        model: 모델명
+        prompt: 포맷팅이 끝난 프롬프트
+        max_tokens: 최대 토큰 수
+        temperature: 샘플링 온도
+
+    Returns:
+        str: SHA-256 해시 키
+    """
+    payload = json.dumps(
+        [model, prompt, max_tokens, temperature],
+        ensure_ascii=False,
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    응답 캐시 기본 클래스
+
+    하위 클래스는 _get, _set, _clear, __len__을 구현한다.
+    히트/미스 집계와 TTL 처리는 이 클래스에서 공통으로 담당한다.
+    """
+
+    def __init__(self, max_entries=256, ttl=None):
+        """
+        Args:
+            max_entries: 최대 저장 항목 수 (초과 시 가장 오래 사용하지 않은 항목부터 제거)
+            ttl: 항목 유효 시간(초), None이면 만료 없음
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def get(self, key):
+        """
+        캐시 조회
+
+        Args:
+            key: 캐시 키
+
+        Returns:
+            str: 저장된 값 (없거나 만료되었으면 None)
+        """
+        value = self._get(key)
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def contains(self, key):
+        """
+        캐시에 키가 있는지 확인 (히트/미스 집계에 포함하지 않음)
+
+        Args:
+            key: 캐시 키
+
+        Returns:
+            bool: 저장된 값이 있고 만료되지 않았으면 True
+        """
+        return self._get(key) is not None
+
+    def set(self, key, value):
+        """
+        캐시 저장
+
+        Args:
+            key: 캐시 키
+            value: 저장할 문자열 값
+        """
+        self._set(key, value)
+
+    def clear(self):
+        """캐시 전체 삭제"""
+        self._clear()
+
+    def stats(self):
+        """
+        캐시 통계
+
+        Returns:
+            dict: hits, misses, hit_rate, size
+        """
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'size': len(self)
+        }
+
+    def _is_expired(self, created_at):
+        return self.ttl is not None and time.time() - created_at > self.ttl
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def _set(self, key, value):
+        raise NotImplementedError
+
+    def _clear(self):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+
+class MemoryCache(ResponseCache):
+    """프로세스 메모리 기반 LRU 캐시"""
+
+    def __init__(self, max_entries=256, ttl=None):
+        super().__init__(max_entries=max_entries, ttl=ttl)
+        self._entries = OrderedDict()  # {key: (created_at, value)}
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            created_at, value = entry
+            if self._is_expired(created_at):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache(ResponseCache):
+    """SQLite 파일 기반 캐시 (앱 재시작 후에도 유지)"""
+
+    def __init__(self, path, max_entries=1000, ttl=None):
+        """
+        Args:
+            path: SQLite 파일 경로
+            max_entries: 최대 저장 항목 수
+            ttl: 항목 유효 시간(초), None이면 만료 없음
+        """
+        super().__init__(max_entries=max_entries, ttl=ttl)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS response_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )"""
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_response_cache_accessed "
+                "ON response_cache (accessed_at)"
+            )
+
+    def _get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM response_cache WHERE key = ?",
+                (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            with self._conn:
+                if self._is_expired(created_at):
+                    self._conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                    return None
+                self._conn.execute(
+                    "UPDATE response_cache SET accessed_at = ? WHERE key = ?",
+                    (time.time(), key)
+                )
+            return value
+
+    def _set(self, key, value):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            if self.ttl is not None:
+                self._conn.execute(
+                    "DELETE FROM response_cache WHERE created_at < ?",
+                    (now - self.ttl,)
+                )
+            # 용량 초과분은 가장 오래 사용하지 않은 항목부터 제거
+            self._conn.execute(
+                """DELETE FROM response_cache WHERE key IN (
+                    SELECT key FROM response_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )""",
+                (self.max_entries,)
+            )
+
+    def _clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM response_cache")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+
+
+def create_cache_from_env():
+    """
+    환경변수 설정에 따라 응답 캐시 생성
+
+    LLM_CACHE_PATH가 있으면 SQLite 캐시, 없으면 메모리 캐시를 사용한다.
+    LLM_CACHE_TTL(초), LLM_CACHE_MAX_ENTRIES로 만료 시간과 최대 항목 수를 조정할 수 있다.
+
+    Returns:
+        ResponseCache: 응답 캐시
+    """
+    ttl = os.getenv("LLM_CACHE_TTL")
+    ttl = float(ttl) if ttl else 24 * 60 * 60
+    max_entries = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "256"))
+
+    path = os.getenv("LLM_CACHE_PATH")
+    if path:
+        return SQLiteCache(path, max_entries=max_entries, ttl=ttl)
+    return MemoryCache(max_entries=max_entries, ttl=ttl)
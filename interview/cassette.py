@@ -0,0 +1,252 @@
+"""
+카세트 모듈 - LLM/이미지 API 응답을 기록해 두었다가 네트워크 없이 그대로 재생 (벤치마크 재현용)
+"""
+import asyncio
+import base64
+import json
+import os
+import threading
+from collections import defaultdict
+from types import SimpleNamespace
+
+from cache import make_cache_key
+
+MODES = ("record", "replay")
+
+
+class CassetteMissError(LookupError):
+    """재생 모드에서 카세트에 기록되지 않은 요청을 받은 경우"""
+
+
+class Cassette:
+    """
+    요청 지문 → 응답 기록/재생 카세트
+
+    파일 형식: 한 줄에 요청 하나를 담는 JSONL
+        {"key": 요청 지문, "kind": "chat"|"image", "content": 응답 텍스트 또는 이미지 base64, "usage": {...}}
+
+    재생 모드에서는 파일을 한 번 훑어 지문별 줄 위치(byte offset)만 색인해 두고,
+    요청이 오면 해당 줄만 읽으므로 이미지가 섞인 큰 카세트도 빠르게 찾는다.
+    같은 요청이 여러 번 기록되어 있으면(temperature > 0) 기록된 순서대로 돌아가며 재생한다.
+    스트리밍/일반 호출은 같은 지문을 쓰므로 한쪽으로 기록한 응답을 다른 쪽으로 재생할 수 있다.
+    """
+
+    def __init__(self, path, mode="replay", latency=0.0, tokens_per_sec=0.0):
+        """
+        Args:
+            path: 카세트 파일 경로
+            mode: "record" (실제 호출 결과를 파일 끝에 추가) 또는 "replay" (파일에서 재생, 네트워크 없음)
+            latency: 재생할 때 응답 전에 기다릴 시간(초, 첫 토큰 지연)
+            tokens_per_sec: 재생할 때 출력 토큰 생성 속도 (0이면 생성 시간 없음)
+        """
+        if mode not in MODES:
+            raise ValueError(f"카세트 모드는 {MODES} 중 하나여야 합니다: {mode}")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.tokens_per_sec = tokens_per_sec
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        self._offsets = defaultdict(list)  # {key: [byte offset]}
+        self._cursors = defaultdict(int)  # {key: 다음에 재생할 순번}
+        self._lock = threading.Lock()
+        self._file = None
+
+        if mode == "replay":
+            self._build_index()
+            self._file = open(path, "rb")
+        else:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(path, "ab")
+
+    @property
+    def replaying(self):
+        return self.mode == "replay"
+
+    @staticmethod
+    def fingerprint(kind, request):
+        """
+        요청 지문 (응답에 영향을 주는 요청 파라미터의 해시)
+
+        Args:
+            kind: "chat" 또는 "image"
+            request: API 요청 파라미터 dict (stream 관련 옵션은 제외)
+
+        Returns:
+            str: SHA-256 해시
+        """
+        request = {
+            name: value for name, value in request.items()
+            if name not in ("stream", "stream_options")
+        }
+        return make_cache_key(kind, request, None, None)
+
+    def _build_index(self):
+        """카세트 파일을 훑어 지문별 줄 위치 색인"""
+        with open(self.path, "rb") as f:
+            offset = 0
+            for line in f:
+                if line.strip():
+                    self._offsets[json.loads(line)["key"]].append(offset)
+                offset += len(line)
+
+    def _read(self, key):
+        """지문에 해당하는 다음 기록 (없으면 CassetteMissError)"""
+        with self._lock:
+            offsets = self._offsets.get(key)
+            if not offsets:
+                self.misses += 1
+                raise CassetteMissError(f"카세트에 기록되지 않은 요청입니다: {key[:12]}")
+            cursor = self._cursors[key]
+            self._cursors[key] = cursor + 1
+            self._file.seek(offsets[cursor % len(offsets)])
+            line = self._file.readline()
+            self.hits += 1
+        return json.loads(line)
+
+    def _write(self, key, kind, content, usage=None):
+        entry = {"key": key, "kind": kind, "content": content}
+        if usage:
+            entry["usage"] = usage
+        line = (json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            self.recorded += 1
+
+    @staticmethod
+    def _usage(entry):
+        """기록된 사용량을 OpenAI usage 객체처럼 변환 (metrics 기록용)"""
+        usage = entry.get("usage") or {}
+        return SimpleNamespace(
+            prompt_tokens=usage.get("prompt_tokens", 0),
+            completion_tokens=usage.get("completion_tokens", 0),
+            prompt_tokens_details=SimpleNamespace(cached_tokens=usage.get("cached_tokens", 0))
+        )
+
+    def _generation_time(self, entry):
+        if self.tokens_per_sec <= 0:
+            return 0.0
+        return (entry.get("usage") or {}).get("completion_tokens", 0) / self.tokens_per_sec
+
+    async def replay_chat(self, request):
+        """
+        채팅 응답 재생
+
+        Args:
+            request: API 요청 파라미터 dict
+
+        Returns:
+            tuple: (응답 텍스트, usage 객체)
+        """
+        entry = self._read(self.fingerprint("chat", request))
+        delay = self.latency + self._generation_time(entry)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return entry["content"], self._usage(entry)
+
+    async def replay_chat_stream(self, request, piece_chars=8):
+        """
+        채팅 응답 스트리밍 재생 (첫 조각 전 latency, 이후 tokens_per_sec에 맞춰 나눠 전달)
+
+        Args:
+            request: API 요청 파라미터 dict
+            piece_chars: 한 조각의 글자 수
+
+        Yields:
+            tuple: (응답 텍스트 조각, None) ... 마지막에 (None, usage 객체)
+        """
+        entry = self._read(self.fingerprint("chat", request))
+        content = entry["content"]
+        pieces = [content[i:i + piece_chars] for i in range(0, len(content), piece_chars)]
+        delay = self._generation_time(entry) / len(pieces) if pieces else 0.0
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        for piece in pieces:
+            yield piece, None
+            if delay > 0:
+                await asyncio.sleep(delay)
+        yield None, self._usage(entry)
+
+    def record_chat(self, request, content, usage=None):
+        """
+        채팅 응답 기록
+
+        Args:
+            request: API 요청 파라미터 dict
+            content: 응답 텍스트
+            usage: 응답 usage 객체 (선택)
+        """
+        usage_dict = None
+        if usage is not None:
+            details = getattr(usage, 'prompt_tokens_details', None)
+            usage_dict = {
+                "prompt_tokens": getattr(usage, 'prompt_tokens', 0) or 0,
+                "completion_tokens": getattr(usage, 'completion_tokens', 0) or 0,
+                "cached_tokens": (getattr(details, 'cached_tokens', None) or 0) if details else 0
+            }
+        self._write(self.fingerprint("chat", request), "chat", content, usage_dict)
+
+    async def replay_image(self, request):
+        """
+        이미지 응답 재생
+
+        Returns:
+            bytes: 이미지 데이터
+        """
+        entry = self._read(self.fingerprint("image", request))
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        return base64.b64decode(entry["content"])
+
+    def record_image(self, request, b64_json):
+        """이미지 응답 기록 (API가 돌려준 base64 그대로)"""
+        self._write(self.fingerprint("image", request), "image", b64_json)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def stats(self):
+        """
+        카세트 통계
+
+        Returns:
+            dict: mode, entries(재생 가능한 기록 수), hits, misses, recorded
+        """
+        with self._lock:
+            return {
+                'mode': self.mode,
+                'entries': sum(len(offsets) for offsets in self._offsets.values()),
+                'hits': self.hits,
+                'misses': self.misses,
+                'recorded': self.recorded
+            }
+
+
+def create_cassette_from_env():
+    """
+    환경변수 설정에 따라 카세트 생성
+
+    - LLM_CASSETTE_PATH: 카세트 파일 경로 (없으면 카세트 사용 안 함)
+    - LLM_CASSETTE_MODE: record 또는 replay (기본값 replay)
+    - LLM_CASSETTE_LATENCY: 재생할 때 첫 토큰 지연(초)
+    - LLM_CASSETTE_TOKENS_PER_SEC: 재생할 때 출력 토큰 생성 속도 (0이면 즉시)
+
+    Returns:
+        Cassette: 카세트 (설정이 없으면 None)
+    """
+    path = os.getenv("LLM_CASSETTE_PATH")
+    if not path:
+        return None
+    return Cassette(
+        path,
+        mode=os.getenv("LLM_CASSETTE_MODE", "replay"),
+        latency=float(os.getenv("LLM_CASSETTE_LATENCY", "0")),
+        tokens_per_sec=float(os.getenv("LLM_CASSETTE_TOKENS_PER_SEC", "0"))
+    )
@@ -0,0 +1,165 @@
+"""
+요청 합치기 모듈 - 같은 요청이 이미 진행 중이면 새로 호출하지 않고 진행 중인 호출의 결과를 함께 받음
+"""
+import asyncio
+
+
+class _Flight:
+    """진행 중인 호출 하나 (결과를 기다리는 호출자 수와 함께 관리)"""
+
+    __slots__ = ('task', 'waiters', 'expire_handle', 'chunks', 'updated')
+
+    def __init__(self):
+        self.task = None
+        self.waiters = 0
+        self.expire_handle = None
+        self.chunks = []  # 스트리밍 호출에서 지금까지 받은 조각
+        self.updated = asyncio.Event()  # 새 조각이 오거나 호출이 끝나면 set
+
+    def notify(self):
+        """조각을 기다리는 호출자를 깨우고 다음 알림용 이벤트로 교체"""
+        self.updated.set()
+        self.updated = asyncio.Event()
+
+
+class SingleFlight:
+    """
+    진행 중인 요청 합치기 (single-flight)
+
+    같은 키의 요청이 진행 중이면 새 호출을 시작하지 않고 그 호출의 결과를 함께 기다린다.
+    스트리밍 호출(stream)은 받은 조각을 버퍼에 모아 두고, 늦게 합류한 호출자에게도 처음 조각부터 전달한다.
+    Streamlit은 버튼을 두 번 누르면 첫 실행을 중단하고 다시 실행하므로, 기다리던 호출자가 모두 떠나도
+    grace초 동안은 호출을 취소하지 않고 결과도 남겨 두어 곧바로 다시 들어온 같은 요청이 이어받게 한다.
+    이벤트 루프 스레드 안에서만 사용한다(잠금 없음).
+    """
+
+    def __init__(self, grace=5.0, metrics=None):
+        """
+        Args:
+            grace: 호출자가 모두 떠난 뒤 호출/결과를 유지할 시간(초), 0이면 바로 취소
+            metrics: 합쳐진 호출 수를 기록할 메트릭 집계기 (MetricsRecorder, 선택)
+        """
+        self.grace = grace
+        self.metrics = metrics
+        self.calls = 0
+        self.coalesced = 0
+        self._flights = {}  # {key: _Flight}
+
+    async def do(self, key, factory, grace=None):
+        """
+        같은 키의 진행 중인 호출에 합류하거나 새 호출 시작
+
+        Args:
+            key: 요청 키 (프롬프트 해시 등)
+            factory: 새 호출 코루틴을 만드는 함수
+            grace: 이 요청에 쓸 유지 시간(초), None이면 기본값
+
+        Returns:
+            호출 결과
+        """
+        flight = self._join(key, lambda flight: factory(), grace)
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            self._leave(key, flight, grace)
+
+    async def stream(self, key, factory, grace=None):
+        """
+        같은 키의 진행 중인 스트리밍 호출에 합류하거나 새 호출 시작
+
+        Args:
+            key: 요청 키 (do()와 겹치지 않도록 스트리밍 여부를 포함할 것)
+            factory: 새 호출의 비동기 이터레이터(async generator)를 만드는 함수
+            grace: 이 요청에 쓸 유지 시간(초), None이면 기본값
+
+        Yields:
+            호출이 반환하는 조각 (합류한 시점과 관계없이 첫 조각부터)
+        """
+        async def pump(flight):
+            try:
+                async for chunk in factory():
+                    flight.chunks.append(chunk)
+                    flight.notify()
+            finally:
+                flight.notify()
+
+        flight = self._join(key, pump, grace)
+        try:
+            index = 0
+            while True:
+                while index < len(flight.chunks):
+                    yield flight.chunks[index]
+                    index += 1
+                if flight.task.done():
+                    break
+                await flight.updated.wait()
+            # 호출이 실패했으면 같은 오류를 전달
+            flight.task.result()
+        finally:
+            self._leave(key, flight, grace)
+
+    def _join(self, key, start, grace):
+        """진행 중인 호출에 합류 (없으면 start(flight)로 새 호출을 시작)"""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight()
+            flight.task = asyncio.get_running_loop().create_task(start(flight))
+            flight.task.add_done_callback(
+                lambda task: self._on_done(key, flight, self.grace if grace is None else grace)
+            )
+            self._flights[key] = flight
+            self.calls += 1
+        else:
+            self.coalesced += 1
+            if self.metrics is not None:
+                self.metrics.increment('coalesced_calls')
+            # 진행 중인 호출이면 취소 예약을 거둔다 (이미 끝난 결과의 정리 예약은 그대로 둠)
+            if flight.expire_handle is not None and not flight.task.done():
+                flight.expire_handle.cancel()
+                flight.expire_handle = None
+        flight.waiters += 1
+        return flight
+
+    def _leave(self, key, flight, grace):
+        """호출자가 떠남 (기다리는 호출자가 없으면 유지 시간 뒤 호출 취소)"""
+        flight.waiters -= 1
+        if flight.waiters == 0 and not flight.task.done():
+            delay = self.grace if grace is None else grace
+            if delay > 0:
+                flight.expire_handle = asyncio.get_running_loop().call_later(delay, self._expire, key, flight)
+            else:
+                self._expire(key, flight)
+
+    def _on_done(self, key, flight, grace):
+        """호출이 끝나면 목록에서 제거 (아무도 기다리지 않은 성공 결과는 grace초 동안 남겨 둠)"""
+        failed = flight.task.cancelled() or flight.task.exception() is not None
+        if failed or flight.waiters > 0 or grace <= 0:
+            self._forget(key, flight)
+            return
+        if flight.expire_handle is not None:
+            flight.expire_handle.cancel()
+        flight.expire_handle = asyncio.get_running_loop().call_later(grace, self._forget, key, flight)
+
+    def _expire(self, key, flight):
+        """유지 시간이 지나도록 다시 기다리는 호출자가 없으면 호출 취소"""
+        flight.expire_handle = None
+        if flight.waiters == 0:
+            flight.task.cancel()
+            self._forget(key, flight)
+
+    def _forget(self, key, flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self):
+        """
+        요청 합치기 통계
+
+        Returns:
+            dict: calls(실제 호출 수), coalesced(합쳐서 아낀 호출 수), in_flight
+        """
+        return {
+            'calls': self.calls,
+            'coalesced': self.coalesced,
+            'in_flight': sum(1 for flight in list(self._flights.values()) if not flight.task.done())
+        }
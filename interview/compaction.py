@@ -0,0 +1,154 @@
+"""
+프롬프트 압축 모듈 - 프롬프트 종류별로 필요한 필드만 골라 간결한 JSON으로 직렬화
+"""
+import json
+import threading
+from collections import OrderedDict
+
+from cache import make_cache_key
+from tokens import count_tokens
+
+# 프롬프트 종류별로 남길 필드 (중첩 dict는 하위 필드 튜플로 지정)
+COMPACT_FIELDS = {
+    # 인터뷰 응답기: 말투·역할·금지사항만 필요, 편향 위험/2차 자료 목록은 불필요
+    'interview_persona': {
+        'display_name': None,
+        'role': None,
+        'time_place': None,
+        'speaking_style': None,
+        'interview_dos': None,
+        'interview_donts': None,
+        'rag_hints': ('keywords', 'primary_sources'),
+        'reading_level': None,
+        'safety_notes': None,
+    },
+    # 채점기: 목표 문장과 성공기준/증거만 필요, 안내 질문/Bloom/루브릭 링크는 불필요
+    'grading_objective': {
+        'title': None,
+        'level': None,
+        'objective': None,
+        'success_criteria': None,
+        'required_evidence': None,
+    },
+}
+
+
+def select_fields(data, fields):
+    """
+    dict에서 지정한 필드만 선택 (비어 있는 값은 제외)
+
+    Args:
+        data: 원본 dict
+        fields: {필드명: None 또는 하위 필드 튜플}
+
+    Returns:
+        dict: 선택된 필드만 담은 dict
+    """
+    selected = {}
+    for key, sub_fields in fields.items():
+        value = data.get(key)
+        if value in (None, "", [], {}):
+            continue
+        if sub_fields and isinstance(value, dict):
+            value = {sub_key: value[sub_key] for sub_key in sub_fields if value.get(sub_key)}
+            if not value:
+                continue
+        selected[key] = value
+    return selected
+
+
+def dumps_compact(data):
+    """공백 없는 JSON 직렬화 (한글은 이스케이프하지 않음)"""
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+class PromptCompactor:
+    """
+    프롬프트 압축기
+
+    페르소나 카드와 학습 목표는 세션 동안 바뀌지 않으므로,
+    내용 해시가 같은 데이터의 압축 결과를 캐시하여 매 턴 다시 압축/토큰 계산하지 않는다.
+    (학습 목표별 채점처럼 호출마다 새로 만든 dict도 내용이 같으면 재사용된다)
+    압축 전(indent=2 전체 JSON) 대비 절약한 토큰 수를 집계한다.
+    """
+
+    def __init__(self, max_entries=256, metrics=None):
+        """
+        Args:
+            max_entries: 캐시할 최대 압축 결과 수
+            metrics: 절약한 토큰 수를 기록할 메트릭 집계기 (MetricsRecorder, 선택)
+        """
+        self.max_entries = max_entries
+        self.metrics = metrics
+        self._entries = OrderedDict()  # {내용 해시: (text, tokens_saved)}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.tokens_saved_total = 0
+        self.last_tokens_saved = 0
+
+    def compact_persona(self, persona_card):
+        """
+        인터뷰 프롬프트용 페르소나 카드 압축
+
+        Args:
+            persona_card: 페르소나 카드 (dict)
+
+        Returns:
+            str: 압축된 JSON 텍스트
+        """
+        return self._compact('interview_persona', persona_card, lambda card: dumps_compact(
+            select_fields(card, COMPACT_FIELDS['interview_persona'])
+        ))
+
+    def compact_objectives(self, objectives):
+        """
+        채점 프롬프트용 학습 목표 압축
+
+        Args:
+            objectives: 학습 목표 정보 (dict, objectives 리스트 포함)
+
+        Returns:
+            str: 압축된 JSON 텍스트
+        """
+        return self._compact('grading_objectives', objectives, lambda data: dumps_compact([
+            select_fields(obj, COMPACT_FIELDS['grading_objective'])
+            for obj in data.get('objectives', [])
+        ]))
+
+    def stats(self):
+        """
+        압축 통계
+
+        Returns:
+            dict: calls, tokens_saved_total, last_tokens_saved
+        """
+        return {
+            'calls': self.calls,
+            'tokens_saved_total': self.tokens_saved_total,
+            'last_tokens_saved': self.last_tokens_saved
+        }
+
+    def _compact(self, prompt_type, data, serialize):
+        key = make_cache_key(prompt_type, data, None, None)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                text, tokens_saved = entry
+
+        if entry is None:
+            text = serialize(data)
+            original = json.dumps(data, ensure_ascii=False, indent=2)
+            tokens_saved = count_tokens(original) - count_tokens(text)
+            with self._lock:
+                self._entries[key] = (text, tokens_saved)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+        with self._lock:
+            self.calls += 1
+            self.tokens_saved_total += tokens_saved
+            self.last_tokens_saved = tokens_saved
+        if self.metrics is not None:
+            self.metrics.increment('prompt_tokens_saved', tokens_saved)
+        return text
@@ -0,0 +1,164 @@
+"""
+인터뷰 근거 요약 모듈 - 대화가 오갈 때마다 학습 목표별로 관련 있는 발화를 골라 채점용 근거 요약을 준비
+"""
+import math
+import re
+import threading
+from collections import Counter
+
+from memory import ROLE_LABELS
+from retrieval import tokenize
+from tokens import count_tokens
+
+_SENTENCE_END = re.compile(r'(?<=[.!?。])\s+|\n+')
+
+# 학습 목표에서 근거 판단에 쓰는 필드
+OBJECTIVE_QUERY_FIELDS = ('title', 'objective', 'guide_question')
+OBJECTIVE_QUERY_LIST_FIELDS = ('success_criteria', 'required_evidence')
+
+
+class EvidenceDigest:
+    """
+    학습 목표별 인터뷰 근거 요약
+
+    학습 목표의 제목/목표/안내 질문/성공 기준/필요한 증거를 검색어로 삼아,
+    대화 턴이 추가될 때마다 문장 단위로 목표별 관련도를 한 번만 계산해 둔다.
+    render()는 목표마다 관련도가 높은 문장을 token_budget 안에서 골라 대화 순서대로 보여 주므로
+    제출 시점에는 추가 계산 없이 바로 채점에 넘길 수 있다.
+    """
+
+    def __init__(self, objectives, token_budget=300, max_sentence_chars=200, k1=1.2):
+        """
+        Args:
+            objectives: 학습 목표 정보 (dict, objectives 리스트 포함)
+            token_budget: 목표 하나의 근거 요약에 쓸 최대 토큰 수
+            max_sentence_chars: 근거 문장 하나의 최대 글자 수 (넘으면 잘라서 표시)
+            k1: 토큰 빈도 포화 계수
+        """
+        self.objectives = objectives
+        self.token_budget = token_budget
+        self.max_sentence_chars = max_sentence_chars
+        self.k1 = k1
+
+        objective_list = (objectives or {}).get('objectives', [])
+        self.titles = [obj['title'] for obj in objective_list]
+        self._queries = [Counter(tokenize(self._query_text(obj))) for obj in objective_list]
+
+        # 다른 목표에는 없는 검색어일수록 그 목표의 근거를 잘 가려내므로 가중치를 높인다
+        document_frequency = Counter(term for query in self._queries for term in query)
+        n = len(self._queries)
+        self._weights = [
+            {term: math.log(1 + n / document_frequency[term]) for term in query}
+            for query in self._queries
+        ]
+
+        self._units = []  # [{'persona', 'role', 'text', 'tokens', 'order', 'scores'}]
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _query_text(objective):
+        parts = [objective.get(field, '') for field in OBJECTIVE_QUERY_FIELDS]
+        for field in OBJECTIVE_QUERY_LIST_FIELDS:
+            parts.extend(objective.get(field, []))
+        return " ".join(parts)
+
+    def add_turn(self, persona_name, role, content):
+        """
+        대화 턴 추가 (문장별 목표 관련도를 이 시점에 계산)
+
+        Args:
+            persona_name: 페르소나 이름
+            role: 'student' 또는 'persona'
+            content: 발화 내용
+        """
+        units = []
+        for sentence in _SENTENCE_END.split(content or ""):
+            sentence = sentence.strip()
+            if not sentence:
+                continue
+            terms = Counter(tokenize(sentence))
+            if not terms:
+                continue
+            length_norm = math.sqrt(sum(terms.values()))
+            scores = [
+                sum(
+                    weight * terms[term] * (self.k1 + 1) / (terms[term] + self.k1)
+                    for term, weight in weights.items() if term in terms
+                ) / length_norm
+                for weights in self._weights
+            ]
+            if not any(scores):
+                continue
+            if len(sentence) > self.max_sentence_chars:
+                sentence = sentence[:self.max_sentence_chars] + "…"
+            line = f"[{persona_name}] {ROLE_LABELS.get(role, role)}: {sentence}"
+            units.append({
+                'persona': persona_name,
+                'text': line,
+                'tokens': count_tokens(line),
+                'scores': scores
+            })
+
+        with self._lock:
+            for unit in units:
+                unit['order'] = len(self._units)
+                self._units.append(unit)
+
+    def restore(self, turns):
+        """
+        저장된 대화 턴으로 복원
+
+        Args:
+            turns: 오래된 순으로 정렬된 턴 dict 리스트 (persona, role, content)
+        """
+        for turn in turns:
+            self.add_turn(turn['persona'], turn['role'], turn['content'])
+
+    def clear(self, persona_name=None):
+        """근거 삭제 (persona_name을 지정하면 해당 페르소나와의 대화만)"""
+        with self._lock:
+            if persona_name is None:
+                self._units = []
+            else:
+                self._units = [unit for unit in self._units if unit['persona'] != persona_name]
+
+    def summaries(self):
+        """
+        목표별 근거 요약
+
+        Returns:
+            dict: {목표 제목: 근거 문장 목록 텍스트 (관련 대화가 없으면 빈 문자열)}
+        """
+        with self._lock:
+            units = list(self._units)
+
+        result = {}
+        for idx, title in enumerate(self.titles):
+            ranked = sorted(
+                (unit for unit in units if unit['scores'][idx] > 0),
+                key=lambda unit: unit['scores'][idx],
+                reverse=True
+            )
+            selected = []
+            remaining = self.token_budget
+            for unit in ranked:
+                if unit['tokens'] > remaining:
+                    continue
+                selected.append(unit)
+                remaining -= unit['tokens']
+            selected.sort(key=lambda unit: unit['order'])
+            result[title] = "\n".join(unit['text'] for unit in selected)
+        return result
+
+    def render(self):
+        """
+        전체 근거 요약 (목표별 요약을 제목과 함께 이어 붙임)
+
+        Returns:
+            str: 근거 요약 텍스트 (관련 대화가 없으면 빈 문자열)
+        """
+        sections = [
+            f"[{title}]\n{summary}"
+            for title, summary in self.summaries().items() if summary
+        ]
+        return "\n\n".join(sections)
@@ -0,0 +1,269 @@
+"""
+FAQ 캐시 모듈 - 같은 수업에서 비슷한 질문이 반복되면 이전 인터뷰 응답을 재사용
+"""
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter, OrderedDict, defaultdict
+
+from prefetch import normalize_question
+
+# 의문사가 다르면 문자열이 비슷해도 다른 질문으로 본다 ("왜 만들었나요" vs "언제 만들었나요")
+QUESTION_WORDS = ('왜', '언제', '어디', '누구', '누가', '무엇', '무슨', '뭐', '어떻게', '어떤', '얼마', '몇')
+
+# 질문 끝의 시제/높임 어미 ("태어났어요", "태어났나요", "만드셨나요"를 같은 줄기로 맞춤)
+_QUESTION_ENDING = re.compile(
+    r'(셨|으셨|었|았|였|했)?(나요|어요|아요|에요|예요|이에요|인가요|습니까|입니까|니까|까요|나|니|요|가)$'
+)
+
+# 낱말 끝 조사 ("세종대왕은", "한글을"의 은/을)
+_PARTICLE = re.compile(r'(에서|에게|한테|께서|으로|은|는|이|가|을|를|에|의|도|로|와|과)$')
+
+
+def faq_key_text(question):
+    """유사도 비교용 질문 텍스트 (정규화 후 끝 어미 제거)"""
+    text = normalize_question(question)
+    return _QUESTION_ENDING.sub('', text) or text
+
+
+def ngram_vector(text, sizes=(2,)):
+    """
+    문자 n-gram 벡터 (L2 정규화)
+
+    Args:
+        text: 정규화된 질문 텍스트
+        sizes: 사용할 n-gram 길이
+
+    Returns:
+        dict: {n-gram: 가중치}
+    """
+    counts = Counter()
+    for size in sizes:
+        if len(text) < size:
+            continue
+        for i in range(len(text) - size + 1):
+            counts[text[i:i + size]] += 1
+    if not counts and text:
+        counts[text] = 1
+    norm = math.sqrt(sum(value * value for value in counts.values()))
+    return {gram: value / norm for gram, value in counts.items()} if norm else {}
+
+
+def question_words(text):
+    """질문에 들어 있는 의문사 집합"""
+    return frozenset(word for word in QUESTION_WORDS if word in text)
+
+
+def content_stems(question):
+    """
+    질문의 내용어 줄기 (띄어쓰기 단위로 조사/끝 어미를 떼고, 의문사는 제외)
+
+    Args:
+        question: 학생 질문 원문
+
+    Returns:
+        tuple: 내용어 줄기 목록
+    """
+    words = [
+        normalize_question(word)
+        for word in unicodedata.normalize('NFKC', question or "").lower().split()
+    ]
+    words = [word for word in words if word]
+    if words:
+        words[-1] = _QUESTION_ENDING.sub('', words[-1]) or words[-1]
+    stems = []
+    for word in words:
+        if any(word.startswith(question_word) for question_word in QUESTION_WORDS):
+            continue
+        stem = _PARTICLE.sub('', word) or word
+        stems.append(stem)
+    return tuple(stems)
+
+
+def _similar_stem(a, b):
+    """활용으로 끝 글자만 바뀐 줄기는 같은 낱말로 봄 ("만드"/"만들", "태어나"/"태어났")"""
+    if a == b:
+        return True
+    prefix = 0
+    for char_a, char_b in zip(a, b):
+        if char_a != char_b:
+            break
+        prefix += 1
+    return prefix >= max(1, min(len(a), len(b)) - 1)
+
+
+def same_content(stems_a, stems_b):
+    """
+    두 질문의 내용어가 서로 모두 대응하는지 확인
+
+    문자 n-gram 유사도는 주어·의문사가 같으면 서술어 하나가 달라도 높게 나오므로
+    ("세종대왕은 언제 태어났어요?" / "세종대왕은 언제 죽었어요?"), 재사용 전에 내용어를 한 번 더 비교한다.
+
+    >>> same_content(content_stems("세종대왕은 언제 태어났어요?"), content_stems("세종대왕은 언제 죽었어요?"))
+    False
+    >>> same_content(content_stems("한글을 왜 만드셨나요?"), content_stems("한글은 왜 만들었어요"))
+    True
+
+    Args:
+        stems_a: 첫 질문의 content_stems 결과
+        stems_b: 둘째 질문의 content_stems 결과
+
+    Returns:
+        bool: 한쪽에만 있는 내용어가 없으면 True
+    """
+    return (
+        all(any(_similar_stem(a, b) for b in stems_b) for a in stems_a)
+        and all(any(_similar_stem(b, a) for a in stems_a) for b in stems_b)
+    )
+
+
+class _ScopeIndex:
+    """한 범위(수업+페르소나)의 질문 벡터와 n-gram 역색인"""
+
+    def __init__(self):
+        self.entries = OrderedDict()  # {entry_id: (vector, question_words, content_stems, response)}
+        self.postings = defaultdict(set)  # {n-gram: {entry_id}}
+        self.next_id = 0
+
+    def add(self, vector, words, stems, response):
+        entry_id = self.next_id
+        self.next_id += 1
+        self.entries[entry_id] = (vector, words, stems, response)
+        for gram in vector:
+            self.postings[gram].add(entry_id)
+        return entry_id
+
+    def remove_oldest(self):
+        entry_id, (vector, _, _, _) = self.entries.popitem(last=False)
+        for gram in vector:
+            posting = self.postings[gram]
+            posting.discard(entry_id)
+            if not posting:
+                del self.postings[gram]
+
+    def nearest(self, vector, words, stems):
+        """
+        의문사와 내용어가 같은 항목 중 코사인 유사도가 가장 높은 항목
+        (역색인으로 n-gram을 공유하는 항목만 계산)
+        """
+        scores = defaultdict(float)
+        for gram, weight in vector.items():
+            for entry_id in self.postings.get(gram, ()):
+                scores[entry_id] += weight * self.entries[entry_id][0][gram]
+
+        best_id, best_score = None, 0.0
+        for entry_id, score in scores.items():
+            if score <= best_score:
+                continue
+            _, entry_words, entry_stems, _ = self.entries[entry_id]
+            if entry_words == words and same_content(stems, entry_stems):
+                best_id, best_score = entry_id, score
+        return best_id, best_score
+
+
+class FAQCache:
+    """
+    수업·페르소나별 질문 유사도 기반 응답 캐시 (프로세스 공용)
+
+    질문을 문자 n-gram 벡터로 바꿔 역색인에 넣고, 새 질문과의 코사인 유사도가
+    threshold 이상이면서 의문사와 내용어(서술어 줄기 포함)가 모두 대응하는 이전 질문이 있으면
+    그때의 인터뷰 응답을 그대로 돌려준다.
+    대화 맥락에 따라 답이 달라지지 않도록 대화 초반(히스토리가 짧을 때)에만 사용한다.
+    """
+
+    def __init__(self, threshold=0.75, max_entries_per_scope=200, metrics=None):
+        """
+        Args:
+            threshold: 재사용할 최소 코사인 유사도 (0~1)
+            max_entries_per_scope: 범위별 최대 저장 질문 수 (초과 시 오래된 질문부터 제거)
+            metrics: 적중/미스 수를 기록할 메트릭 집계기 (MetricsRecorder, 선택)
+        """
+        self.threshold = threshold
+        self.max_entries_per_scope = max_entries_per_scope
+        self.metrics = metrics
+        self.hits = 0
+        self.misses = 0
+        self._scopes = {}  # {(lesson_id, persona_name): _ScopeIndex}
+        self._lock = threading.Lock()
+
+    def lookup(self, lesson_id, persona_name, question):
+        """
+        비슷한 이전 질문의 응답 조회
+
+        Args:
+            lesson_id: 수업 ID
+            persona_name: 페르소나 이름
+            question: 학생 질문
+
+        Returns:
+            dict: 인터뷰 응답 (없으면 None)
+        """
+        text = faq_key_text(question)
+        vector = ngram_vector(text)
+        response = None
+        with self._lock:
+            index = self._scopes.get((lesson_id, persona_name))
+            if index is not None and vector:
+                entry_id, score = index.nearest(vector, question_words(text), content_stems(question))
+                if entry_id is not None and score >= self.threshold:
+                    response = dict(index.entries[entry_id][3])
+            if response is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if self.metrics is not None:
+            self.metrics.increment('faq_cache_hits' if response else 'faq_cache_misses')
+        return response
+
+    def store(self, lesson_id, persona_name, question, response):
+        """
+        질문과 응답 저장 (이미 비슷한 질문이 있으면 저장하지 않음)
+
+        Args:
+            lesson_id: 수업 ID
+            persona_name: 페르소나 이름
+            question: 학생 질문
+            response: 인터뷰 응답 (dict)
+        """
+        text = faq_key_text(question)
+        vector = ngram_vector(text)
+        if not vector:
+            return
+        words = question_words(text)
+        stems = content_stems(question)
+        with self._lock:
+            index = self._scopes.setdefault((lesson_id, persona_name), _ScopeIndex())
+            _, score = index.nearest(vector, words, stems)
+            if score >= self.threshold:
+                return
+            index.add(vector, words, stems, dict(response))
+            while len(index.entries) > self.max_entries_per_scope:
+                index.remove_oldest()
+
+    def clear(self, lesson_id=None):
+        """캐시 삭제 (lesson_id를 지정하면 해당 수업만)"""
+        with self._lock:
+            if lesson_id is None:
+                self._scopes.clear()
+            else:
+                for key in [key for key in self._scopes if key[0] == lesson_id]:
+                    del self._scopes[key]
+
+    def stats(self):
+        """
+        캐시 통계
+
+        Returns:
+            dict: hits, misses, hit_rate, size
+        """
+        with self._lock:
+            size = sum(len(index.entries) for index in self._scopes.values())
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'size': size
+        }
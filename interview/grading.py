@@ -0,0 +1,105 @@
+"""
+채점 결과 모듈 - 학습 목표별로 나눠 채점한 결과를 하나로 합치고, 상위 모델로 다시 채점할 애매한 결과를 가려냄
+"""
+from collections import OrderedDict
+
+from prompts import RUBRIC_CRITERIA
+
+# 등급 (낮은 순)
+BANDS = ["미달", "기본", "충족", "우수"]
+# 목표 달성으로 보는 기준별 평균 점수 경계 (0~3점 중 기본/충족 사이)
+PASS_LEVEL = 1.5
+
+
+def merge_grading_results(results):
+    """
+    학습 목표별 채점 결과를 기존 채점 결과 형식(scores, objective_alignment, weighted_total 등)으로 합침
+
+    기준별 점수는 목표별 점수의 평균(반올림)으로, 근거와 개선 방법은 점수가 가장 낮은 목표의 것을 쓴다.
+    총점과 등급은 목표별 값의 평균이다.
+
+    Args:
+        results: OrderedDict {목표 제목: 해당 목표만 채점한 결과 (dict)}
+
+    Returns:
+        dict: 합친 채점 결과
+    """
+    scores = []
+    for criterion in RUBRIC_CRITERIA:
+        entries = [
+            (title, score)
+            for title, result in results.items()
+            for score in result.get('scores', [])
+            if score.get('criterion') == criterion
+        ]
+        if not entries:
+            continue
+        title, weakest = min(entries, key=lambda entry: entry[1]['level'])
+        levels = [score['level'] for _, score in entries]
+        scores.append({
+            'criterion': criterion,
+            'level': int(round(sum(levels) / len(levels))),
+            'reason': f"[{title}] {weakest['reason']}",
+            'fix': f"[{title}] {weakest['fix']}"
+        })
+
+    objective_alignment = []
+    for title, result in results.items():
+        for alignment in result.get('objective_alignment', [])[:1]:
+            objective_alignment.append(dict(alignment, objective_title=title))
+
+    totals = [result['weighted_total'] for result in results.values() if result.get('weighted_total')]
+    if totals:
+        band_indexes = [BANDS.index(total['band']) for total in totals if total.get('band') in BANDS]
+        weighted_total = {
+            'raw': sum(total['raw'] for total in totals) / len(totals),
+            'weighted': sum(total['weighted'] for total in totals) / len(totals),
+            'band': BANDS[int(round(sum(band_indexes) / len(band_indexes)))] if band_indexes else BANDS[0]
+        }
+    else:
+        weighted_total = {'raw': 0.0, 'weighted': 0.0, 'band': BANDS[0]}
+
+    return {
+        'scores': scores,
+        'objective_alignment': objective_alignment,
+        'weighted_total': weighted_total,
+        'next_steps': _unique(step for result in results.values() for step in result.get('next_steps', [])),
+        'flags': _unique(flag for result in results.values() for flag in result.get('flags', []))
+    }
+
+
+def _unique(items):
+    """순서를 유지하며 중복 제거"""
+    return list(OrderedDict.fromkeys(items))
+
+
+def is_borderline(result, margin=0.25):
+    """
+    채점 결과가 애매한지 판단 (상위 모델로 다시 채점할 대상)
+
+    다음 중 하나면 애매하다고 본다.
+    - 기준별 점수나 목표 달성 판단이 비어 있음
+    - 목표 달성 여부와 등급이 어긋남 (달성인데 미달, 미달성인데 충족/우수)
+    - 기준별 평균 점수가 달성 경계(PASS_LEVEL)에서 margin 이내
+
+    Args:
+        result: 채점 결과 (dict)
+        margin: 경계로 볼 평균 점수 차이
+
+    Returns:
+        bool: 애매하면 True
+    """
+    scores = result.get('scores') or []
+    alignment = result.get('objective_alignment') or []
+    if not scores or not alignment:
+        return True
+
+    band = (result.get('weighted_total') or {}).get('band')
+    for item in alignment:
+        if item.get('met') and band == BANDS[0]:
+            return True
+        if not item.get('met') and band in BANDS[2:]:
+            return True
+
+    levels = [score.get('level', 0) for score in scores]
+    return abs(sum(levels) / len(levels) - PASS_LEVEL) <= margin
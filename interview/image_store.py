@@ -0,0 +1,140 @@
+"""
+이미지 저장소 모듈 - 생성된 페르소나 이미지를 로컬에 내용 주소(content-addressed) 방식으로 저장
+"""
+import hashlib
+import io
+import os
+import tempfile
+import threading
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow가 없으면 원본 이미지만 저장
+    Image = None
+
+
+# 변형 이미지 이름: 한 변의 픽셀 크기
+IMAGE_VARIANTS = {
+    'thumbnail': 256,
+    'avatar': 128,
+}
+
+
+class ImageStore:
+    """
+    로컬 이미지 저장소
+
+    이미지는 내용의 SHA-256 해시를 ID로 사용해 한 번만 저장되며,
+    페르소나 카드와 채팅 아바타에 쓰는 작은 WebP 변형을 함께 만든다.
+
+    디렉터리 구조:
+        {root}/{image_id[:2]}/{image_id}.png          원본
+        {root}/{image_id[:2]}/{image_id}_256.webp     썸네일
+        {root}/{image_id[:2]}/{image_id}_128.webp     아바타
+        {root}/prompts/{prompt_key}                   프롬프트 → image_id 매핑
+    """
+
+    def __init__(self, root_dir=None):
+        """
+        Args:
+            root_dir: 저장 디렉터리, None이면 IMAGE_STORE_DIR 환경변수 또는 "image_store"
+        """
+        self.root_dir = root_dir or os.getenv("IMAGE_STORE_DIR", "image_store")
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(self.root_dir, "prompts"), exist_ok=True)
+
+    def save(self, image_bytes, prompt_key=None):
+        """
+        이미지 저장 후 변형 이미지 생성
+
+        Args:
+            image_bytes: 원본 이미지 바이트 (PNG)
+            prompt_key: 이 이미지를 만든 프롬프트의 키 (같은 프롬프트 재요청 시 재사용)
+
+        Returns:
+            dict: image_id, image_path, thumbnail_path, avatar_path
+        """
+        image_id = hashlib.sha256(image_bytes).hexdigest()
+        original_path = self._path(image_id, "png")
+        if not os.path.exists(original_path):
+            self._write_atomic(original_path, image_bytes)
+
+        for size in IMAGE_VARIANTS.values():
+            variant_path = self._path(image_id, "webp", size)
+            if not os.path.exists(variant_path):
+                self._write_variant(image_bytes, variant_path, size)
+
+        if prompt_key:
+            self._write_atomic(
+                os.path.join(self.root_dir, "prompts", prompt_key),
+                image_id.encode('ascii')
+            )
+
+        return self.get(image_id)
+
+    def get(self, image_id):
+        """
+        저장된 이미지의 경로 정보 조회
+
+        Args:
+            image_id: 이미지 ID (내용 해시)
+
+        Returns:
+            dict: image_id, image_path, thumbnail_path, avatar_path (없으면 None)
+        """
+        original_path = self._path(image_id, "png")
+        if not os.path.exists(original_path):
+            return None
+
+        record = {'image_id': image_id, 'image_path': original_path}
+        for name, size in IMAGE_VARIANTS.items():
+            variant_path = self._path(image_id, "webp", size)
+            # Pillow가 없어 변형을 만들지 못한 경우 원본을 대신 사용
+            record[f'{name}_path'] = variant_path if os.path.exists(variant_path) else original_path
+        return record
+
+    def lookup_prompt(self, prompt_key):
+        """
+        같은 프롬프트로 이전에 저장한 이미지 조회
+
+        Args:
+            prompt_key: 프롬프트 키
+
+        Returns:
+            dict: 이미지 경로 정보 (없으면 None)
+        """
+        try:
+            with open(os.path.join(self.root_dir, "prompts", prompt_key), encoding='ascii') as f:
+                image_id = f.read().strip()
+        except OSError:
+            return None
+        return self.get(image_id) if image_id else None
+
+    def _path(self, image_id, ext, size=None):
+        name = f"{image_id}_{size}.{ext}" if size else f"{image_id}.{ext}"
+        return os.path.join(self.root_dir, image_id[:2], name)
+
+    def _write_variant(self, image_bytes, path, size):
+        if Image is None:
+            return
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            image = image.convert("RGB")
+            image.thumbnail((size, size))
+            buffer = io.BytesIO()
+            image.save(buffer, format="WEBP", quality=80, method=6)
+        self._write_atomic(path, buffer.getvalue())
+
+    def _write_atomic(self, path, data):
+        """임시 파일에 쓴 뒤 이름을 바꿔 동시에 읽는 세션이 반쯤 쓰인 파일을 보지 않게 한다"""
+        directory = os.path.dirname(path)
+        with self._lock:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
@@ -0,0 +1,168 @@
+"""
+수업 패키지 모듈 - 선생님이 한 번 생성한 수업을 파일로 배포하고, 학생은 LLM 호출 없이 불러옴
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+
+from compaction import PromptCompactor
+from prompts import (
+    INTERVIEW_SYSTEM_PROMPT, format_interview_objectives, format_interview_system_prompt
+)
+
+# 패키지 파일 형식 버전 (형식이 바뀌면 올리고, 이전 버전 읽기를 load()에서 처리)
+LESSON_FORMAT_VERSION = 1
+
+# 페르소나 카드에서 패키지 내부 상대 경로로 저장하는 이미지 필드
+IMAGE_PATH_FIELDS = ('image_path', 'thumbnail_path', 'avatar_path')
+
+_LESSON_ID_PATTERN = re.compile(r'^[0-9a-f]{8,32}$')
+
+
+def prompt_template_hash():
+    """인터뷰 system 프롬프트 템플릿의 해시 (템플릿이 바뀌면 미리 만든 프롬프트를 다시 생성)"""
+    return hashlib.sha256(INTERVIEW_SYSTEM_PROMPT.encode('utf-8')).hexdigest()[:16]
+
+
+def build_system_prompts(personae, objectives, disallowed="없음"):
+    """
+    페르소나별 인터뷰 system 메시지 미리 생성
+
+    Args:
+        personae: 페르소나 생성 결과 (dict, personae 리스트 포함)
+        objectives: 학습 목표 생성 결과 (dict)
+        disallowed: 금지 요소
+
+    Returns:
+        dict: {display_name: system 메시지}
+    """
+    compactor = PromptCompactor()
+    objectives_text = format_interview_objectives(objectives)
+    return {
+        persona['display_name']: format_interview_system_prompt(
+            persona_card_json=compactor.compact_persona(persona),
+            learning_objectives=objectives_text,
+            reading_level=persona.get('reading_level', '중등'),
+            disallowed=disallowed
+        )
+        for persona in personae.get('personae', [])
+    }
+
+
+class LessonPackageStore:
+    """
+    수업 패키지 저장소
+
+    디렉터리 구조:
+        {root}/{lesson_id}/lesson.json       페르소나, 학습 목표, 미리 만든 system 메시지
+        {root}/{lesson_id}/images/...        페르소나 이미지 (원본, 썸네일, 아바타)
+
+    패키지는 한 번 배포하면 바뀌지 않으므로 여러 학생 세션이 같은 파일을 읽기만 한다.
+    """
+
+    def __init__(self, root_dir=None):
+        """
+        Args:
+            root_dir: 저장 디렉터리, None이면 LESSON_PACKAGE_DIR 환경변수 또는 "lesson_packages"
+        """
+        self.root_dir = root_dir or os.getenv("LESSON_PACKAGE_DIR", "lesson_packages")
+        os.makedirs(self.root_dir, exist_ok=True)
+
+    def publish(self, personae, objectives, topic_info=None, disallowed="없음"):
+        """
+        수업 패키지 배포
+
+        Args:
+            personae: 페르소나 생성 결과 (dict, 이미지 경로 포함)
+            objectives: 학습 목표 생성 결과 (dict)
+            topic_info: 주제/과목/학년 정보 (dict)
+            disallowed: 인터뷰 금지 요소
+
+        Returns:
+            str: 수업 ID
+        """
+        lesson_id = uuid.uuid4().hex[:12]
+        lesson_dir = os.path.join(self.root_dir, lesson_id)
+        image_dir = os.path.join(lesson_dir, "images")
+        os.makedirs(image_dir)
+
+        packaged = dict(personae, personae=[])
+        for persona in personae.get('personae', []):
+            persona = dict(persona)
+            for field in IMAGE_PATH_FIELDS:
+                source = persona.get(field)
+                if source and os.path.exists(source):
+                    name = os.path.basename(source)
+                    shutil.copyfile(source, os.path.join(image_dir, name))
+                    persona[field] = f"images/{name}"
+                else:
+                    persona.pop(field, None)
+            packaged['personae'].append(persona)
+
+        package = {
+            'format_version': LESSON_FORMAT_VERSION,
+            'lesson_id': lesson_id,
+            'created_at': time.time(),
+            'topic_info': topic_info or {},
+            'personae': packaged,
+            'objectives': objectives,
+            'disallowed': disallowed,
+            'prompt_template_hash': prompt_template_hash(),
+            'system_prompts': build_system_prompts(packaged, objectives, disallowed),
+        }
+        self._write_atomic(os.path.join(lesson_dir, "lesson.json"), package)
+        return lesson_id
+
+    def load(self, lesson_id):
+        """
+        수업 패키지 불러오기 (LLM 호출 없음)
+
+        Args:
+            lesson_id: 수업 ID
+
+        Returns:
+            dict: 수업 패키지 (이미지 경로는 실제 파일 경로로 변환), 없으면 None
+        """
+        if not lesson_id or not _LESSON_ID_PATTERN.match(lesson_id):
+            return None
+        lesson_dir = os.path.join(self.root_dir, lesson_id)
+        try:
+            with open(os.path.join(lesson_dir, "lesson.json"), encoding="utf-8") as f:
+                package = json.load(f)
+        except OSError:
+            return None
+
+        if package.get('format_version', 0) > LESSON_FORMAT_VERSION:
+            raise ValueError(
+                f"지원하지 않는 수업 패키지 형식입니다: {package.get('format_version')}"
+            )
+
+        for persona in package['personae'].get('personae', []):
+            for field in IMAGE_PATH_FIELDS:
+                if persona.get(field):
+                    persona[field] = os.path.join(lesson_dir, persona[field])
+
+        # 프롬프트 템플릿이 바뀐 뒤 배포된 패키지면 system 메시지만 다시 만든다 (LLM 호출 없음)
+        if package.get('prompt_template_hash') != prompt_template_hash():
+            package['system_prompts'] = build_system_prompts(
+                package['personae'], package['objectives'], package.get('disallowed', "없음")
+            )
+        return package
+
+    def _write_atomic(self, path, data):
+        """임시 파일에 쓴 뒤 이름을 바꿔 읽는 쪽이 반쯤 쓰인 파일을 보지 않게 한다"""
+        directory = os.path.dirname(path)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
@@ -1,168 +1,611 @@
 """
 LLM 서비스 모듈 - OpenAI GPT API 사용
 """
-import json
+import asyncio
+import base64
+import logging
 import os
-import re
+import random
+from collections import OrderedDict
 
-from openai import OpenAI
+import httpx
+import openai
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+from async_runner import get_runner
+from cache import MemoryCache, make_cache_key
+from cassette import create_cassette_from_env
+from coalesce import SingleFlight
+from compaction import PromptCompactor
+from image_store import ImageStore
+from metrics import MetricsRecorder
+from routing import create_routing_from_env
+from scheduler import QueueTicket, RequestScheduler
+from streaming import InterviewResponseStream
+from structured_output import parse_structured, response_format as json_response_format
+from tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# 재시도할 일시적 오류 (요청 제한, 네트워크, 타임아웃, 서버 오류)
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
 
 
 class LLMService:
-    """LLM API 호출을 담당하는 서비스 클래스"""
+    """
+    LLM API 호출을 담당하는 서비스 클래스
 
-    def __init__(self):
+    모든 API 호출은 비동기 클라이언트(AsyncOpenAI)로 프로세스 공용 이벤트 루프에서 실행되며,
+    a로 시작하는 비동기 메서드(acall_llm, agenerate_persona 등)와 같은 이름의 동기 메서드를 함께 제공한다.
+    한 인스턴스를 여러 Streamlit 세션이 공유해도 되도록 세션별 상태는 보관하지 않는다.
+    """
+
+    def __init__(self, image_max_workers=3, cache=None, image_store=None, metrics=None,
+                 max_retries=3, max_connections=100, scheduler=None, cassette=None, routing=None):
         """
         LLMService 초기화
         환경변수에서 OpenAI API 키를 가져옴
+
+        Args:
+            image_max_workers: 페르소나 이미지 동시 생성 최대 개수
+            cache: 생성 응답 캐시 (ResponseCache), None이면 메모리 캐시 사용
+            image_store: 페르소나 이미지 저장소 (ImageStore), None이면 기본 경로 사용
+            metrics: 호출 메트릭 집계기 (MetricsRecorder), None이면 새로 생성
+            max_retries: 일시적 오류 시 최대 재시도 횟수
+            max_connections: 공유 HTTP 커넥션 풀의 최대 연결 수
+            scheduler: 모델별 요청 한도와 우선순위를 관리하는 스케줄러 (RequestScheduler),
+                None이면 기본 한도로 생성
+            cassette: 응답 기록/재생 카세트 (Cassette), None이면 LLM_CASSETTE_PATH 환경변수 설정을 따름
+            routing: 호출 종류별 모델/temperature 정책 (RoutingPolicy), None이면 LLM_MODEL_* 환경변수 설정을 따름
         """
+        self.cassette = cassette if cassette is not None else create_cassette_from_env()
         self.api_key = os.getenv("OPENAI_API_KEY")
         if not self.api_key:
-            raise ValueError("OPENAI_API_KEY가 설정되지 않았습니다.")
+            # 재생 모드는 네트워크를 쓰지 않으므로 API 키가 없어도 된다
+            if self.cassette is None or not self.cassette.replaying:
+                raise ValueError("OPENAI_API_KEY가 설정되지 않았습니다.")
+            self.api_key = "cassette-replay"
 
         # Streamlit Community Cloud 호환성을 위해 명시적으로 초기화
-        self.client = OpenAI(
+        # 재시도는 횟수를 메트릭에 기록하기 위해 클라이언트 대신 _acreate_with_retries에서 처리
+        # keep-alive 커넥션 풀을 모든 호출이 공유하여 요청마다 TLS 핸드셰이크를 반복하지 않는다
+        self.client = AsyncOpenAI(
             api_key=self.api_key,
             timeout=60.0,
-            max_retries=3
+            max_retries=0,
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections
+                )
+            )
         )
-        self.model = "gpt-4.1-nano"
+        self.max_retries = max_retries
+        self._runner = get_runner()
+        self.scheduler = scheduler if scheduler is not None else RequestScheduler()
+        self.cache = cache if cache is not None else MemoryCache()
+        self.image_store = image_store if image_store is not None else ImageStore()
+        self.image_max_workers = max(1, image_max_workers)
+        self.metrics = metrics if metrics is not None else MetricsRecorder()
+        # 호출 종류별 모델/temperature (상위 모델로 다시 호출한 비율은 routing.stats())
+        self.routing = routing if routing is not None else create_routing_from_env(metrics=self.metrics)
+        # 마지막 호출의 토큰 사용량 (cached_tokens: 프롬프트 캐시 적중 토큰), 누적값은 metrics 참고
+        self.last_usage = {}
+        # 페르소나 카드/학습 목표는 세션 동안 바뀌지 않으므로 압축 결과를 캐시
+        self.compactor = PromptCompactor(metrics=self.metrics)
+        # 진행 중인 같은 요청은 한 번만 호출 (합쳐서 아낀 호출 수는 metrics의 coalesced_calls)
+        self.single_flight = SingleFlight(metrics=self.metrics)
 
-    def _extract_json(self, text):
+    def _extract_json(self, text, schema=None):
         """
-        텍스트에서 JSON 추출
+        텍스트에서 JSON 추출 및 스키마 검증
+
+        JSON 모드 응답은 바로 파싱되며, 손상된 응답은 재요청 없이 로컬에서 복구한다.
 
         Args:
             text: LLM 응답 텍스트
+            schema: 검증할 JSON 스키마 (dict), None이면 검증 생략
 
         Returns:
             dict: 파싱된 JSON 객체
         """
-        # 먼저 전체 텍스트를 JSON으로 파싱 시도
-        try:
-            return json.loads(text)
-        except json.JSONDecodeError:
-            pass
+        return parse_structured(text, schema)
+
+    @staticmethod
+    def _to_messages(messages):
+        """프롬프트 문자열이면 user 메시지 하나로 감싸서 메시지 리스트로 변환"""
+        if isinstance(messages, str):
+            return [{"role": "user", "content": messages}]
+        return messages
+
+    def _record_usage(self, call, usage):
+        """
+        응답의 토큰 사용량을 호출 측정값과 last_usage에 기록
+
+        cached_tokens는 제공자 측 프롬프트 캐시로 재사용된 입력 토큰 수로,
+        system 메시지 앞부분이 이전 요청과 같을 때 늘어난다.
+        """
+        if usage is None:
+            return
+        call.set_usage(usage)
+        self.last_usage = {
+            'prompt_tokens': call.prompt_tokens,
+            'completion_tokens': call.completion_tokens,
+            'cached_tokens': call.cached_tokens
+        }
 
-        # JSON 코드 블록 찾기
-        json_match = re.search(r'```json\s*(\{.*?\})\s*```', text, re.DOTALL)
-        if json_match:
+    def _retry_delay(self, error, attempt):
+        """재시도 대기 시간 (Retry-After 헤더 우선, 없으면 지수 백오프 + 지터)"""
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        if retry_after:
             try:
-                return json.loads(json_match.group(1))
-            except json.JSONDecodeError:
+                return min(float(retry_after), 30.0)
+            except ValueError:
                 pass
+        return min(0.5 * 2 ** (attempt - 1), 8.0) + random.uniform(0, 0.25)
+
+    @staticmethod
+    def _estimate_tokens(messages, max_tokens):
+        """요청 한도 계산용 예상 토큰 수 (입력 토큰 + 최대 출력 토큰)"""
+        if isinstance(messages, str):
+            return count_tokens(messages) + max_tokens
+        return sum(count_tokens(message["content"]) for message in messages) + max_tokens
+
+    @staticmethod
+    def _queue_watch(on_queue):
+        """
+        대기열 위치 콜백 준비
+
+        Returns:
+            tuple: (QueueTicket 또는 None, 동기 대기 중 호출할 함수 또는 None)
+        """
+        if on_queue is None:
+            return None, None
+        ticket = QueueTicket()
+        return ticket, lambda: ticket.notify(on_queue)
+
+    async def _acreate_with_retries(self, call, request, tokens=0, ticket=None):
+        """
+        API 요청 실행 (일시적 오류는 max_retries 회까지 재시도하고 횟수를 기록)
 
-        # 중괄호로 둘러싸인 부분 찾기
-        json_match = re.search(r'\{.*\}', text, re.DOTALL)
-        if json_match:
+        매 시도 전에 스케줄러에서 전송 허가를 받는다. 429 응답이면 같은 모델의
+        대기열 전체를 멈춰서, 여러 요청이 제각각 재시도하지 않고 순서대로 다시 나가게 한다.
+        실패(재시도 포함)하거나 취소된 시도의 예약 토큰은 바로 전부 돌려주고, 성공한 시도의
+        예약분은 호출자가 응답 usage를 확인한 뒤 scheduler.release()로 정산한다.
+
+        Args:
+            call: 호출 측정 객체 (CallTracker)
+            request: 인자 없이 API 코루틴을 만드는 함수
+            tokens: 요청 한도 계산용 예상 토큰 수
+            ticket: 대기열 위치를 알려줄 QueueTicket (선택)
+
+        Returns:
+            API 응답 객체
+        """
+        while True:
+            await self.scheduler.acquire(call.model, call.call_type, tokens, ticket)
             try:
-                return json.loads(json_match.group(0))
-            except json.JSONDecodeError:
-                pass
+                return await request()
+            except BaseException as e:
+                self.scheduler.release(call.model, tokens, 0)
+                if not isinstance(e, RETRYABLE_ERRORS) or call.retries >= self.max_retries:
+                    raise
+                call.retries += 1
+                delay = self._retry_delay(e, call.retries)
+                if isinstance(e, openai.RateLimitError):
+                    self.scheduler.pause(call.model, delay)
+                else:
+                    await asyncio.sleep(delay)
+
+    def call_llm(self, messages, max_tokens=4000, response_format=None, call_type="llm",
+                 on_queue=None, session_id=None, shared=False):
+        """LLM API 호출 (acall_llm의 동기 버전, on_queue: 대기열 위치 콜백)"""
+        ticket, on_wait = self._queue_watch(on_queue)
+        return self._runner.run(
+            self.acall_llm(messages, max_tokens, response_format, call_type, ticket, session_id,
+                           shared=shared),
+            on_wait=on_wait
+        )
+
+    @staticmethod
+    def _flight_key(kind, model, messages, response_format, max_tokens, temperature, session_id, shared):
+        """
+        진행 중인 요청 합치기용 키 (세션별, shared면 세션 구분 없음)
 
-        raise ValueError(f"유효한 JSON을 찾을 수 없습니다: {text[:200]}")
+        Returns:
+            str: 요청 키, 합치지 않을 요청(세션 ID 없고 shared도 아님)이면 None
+        """
+        if session_id is None and not shared:
+            return None
+        scope = None if shared else session_id
+        return make_cache_key(model, [kind, messages, response_format, scope], max_tokens, temperature)
 
-    def call_llm(self, prompt, max_tokens=4000):
+    async def acall_llm(self, messages, max_tokens=4000, response_format=None, call_type="llm",
+                        ticket=None, session_id=None, model=None, temperature=None, shared=False):
         """
         LLM API 호출
 
+        같은 세션에서 같은 요청(프롬프트 해시 기준)이 이미 진행 중이면 새로 호출하지 않고
+        그 결과를 함께 받는다. (버튼 두 번 클릭, 재실행으로 인한 중복 호출 방지)
+        세션 ID가 없으면 합치지 않으며, shared면 다른 세션의 같은 요청과도 합친다.
+
         Args:
-            prompt: 프롬프트 텍스트
+            messages: 메시지 리스트 ([{"role", "content"}]) 또는 프롬프트 텍스트
             max_tokens: 최대 토큰 수
+            response_format: 응답 형식 (예: json_schema), None이면 일반 텍스트
+            call_type: 메트릭 집계용 호출 종류 (persona, objectives, interview, grading 등)
+            ticket: 대기열 위치를 알려줄 QueueTicket (선택)
+            session_id: 요청을 합칠 범위 (세션 ID), None이면 합치지 않음
+            model: 사용할 모델, None이면 호출 종류의 경로(routing)를 따름 (상위 모델로 다시 호출할 때 지정)
+            temperature: 샘플링 온도, None이면 호출 종류의 경로를 따름
+            shared: True면 세션이 달라도 같은 요청을 합침 (응답 캐시로 세션 간에 공유되는 요청)
 
         Returns:
             str: LLM 응답 텍스트
         """
+        route = self.routing.route(call_type)
+        model = model or route.model
+        temperature = route.temperature if temperature is None else temperature
+        key = self._flight_key(
+            "call", model, messages, response_format, max_tokens, temperature, session_id, shared
+        )
+        if key is None:
+            return await self._acall_llm(
+                messages, max_tokens, response_format, call_type, ticket, model, temperature
+            )
+        return await self.single_flight.do(
+            key,
+            lambda: self._acall_llm(
+                messages, max_tokens, response_format, call_type, ticket, model, temperature
+            ),
+            # 미리 생성은 취소되면 바로 중단 (다시 요청될 가능성이 낮음)
+            grace=0 if call_type == "prefetch" else None
+        )
+
+    async def _acall_llm(self, messages, max_tokens, response_format, call_type, ticket, model, temperature):
+        """LLM API 실제 호출 (acall_llm에서 중복 요청을 합친 뒤 호출, 카세트가 있으면 기록/재생)"""
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=max_tokens,
-                temperature=0.7
+            request = {
+                "model": model,
+                "messages": self._to_messages(messages),
+                "max_tokens": max_tokens,
+                "temperature": temperature
+            }
+            if response_format:
+                request["response_format"] = response_format
+            with self.metrics.track(call_type, model) as call:
+                if self.cassette is not None and self.cassette.replaying:
+                    content, usage = await self.cassette.replay_chat(request)
+                    self._record_usage(call, usage)
+                    return content
+
+                reserved_tokens = self._estimate_tokens(messages, max_tokens)
+                response = await self._acreate_with_retries(
+                    call, lambda: self.client.chat.completions.create(**request), reserved_tokens, ticket
+                )
+                try:
+                    self._record_usage(call, response.usage)
+                finally:
+                    self.scheduler.release(
+                        model, reserved_tokens, call.prompt_tokens + call.completion_tokens
+                    )
+            content = response.choices[0].message.content
+            if self.cassette is not None:
+                self.cassette.record_chat(request, content, response.usage)
+            return content
+        except Exception as e:
+            raise Exception(f"LLM API 호출 실패: {str(e)}")
+
+    def call_llm_stream(self, messages, max_tokens=4000, response_format=None, call_type="llm",
+                        on_queue=None, session_id=None):
+        """LLM API 스트리밍 호출 (acall_llm_stream의 동기 버전, 제너레이터, on_queue: 대기열 위치 콜백)"""
+        ticket, on_wait = self._queue_watch(on_queue)
+        return self._runner.iterate(
+            self.acall_llm_stream(messages, max_tokens, response_format, call_type, ticket, session_id),
+            on_wait=on_wait
+        )
+
+    async def acall_llm_stream(self, messages, max_tokens=4000, response_format=None, call_type="llm",
+                               ticket=None, session_id=None):
+        """
+        LLM API 스트리밍 호출
+
+        같은 세션에서 같은 스트리밍 요청이 이미 진행 중이면(재실행으로 같은 질문이 다시 들어온 경우)
+        새로 호출하지 않고, 지금까지 받은 조각부터 이어서 함께 받는다.
+
+        Args:
+            messages: 메시지 리스트 ([{"role", "content"}]) 또는 프롬프트 텍스트
+            max_tokens: 최대 토큰 수
+            response_format: 응답 형식 (예: json_schema), None이면 일반 텍스트
+            call_type: 메트릭 집계용 호출 종류
+            ticket: 대기열 위치를 알려줄 QueueTicket (선택)
+            session_id: 요청을 합칠 범위 (세션 ID), None이면 합치지 않음
+
+        Yields:
+            str: 도착한 순서대로의 응답 텍스트 조각
+        """
+        route = self.routing.route(call_type)
+        key = self._flight_key(
+            "stream", route.model, messages, response_format, max_tokens, route.temperature,
+            session_id, False
+        )
+        stream = (
+            self._acall_llm_stream(messages, max_tokens, response_format, call_type, ticket)
+            if key is None else
+            self.single_flight.stream(
+                key, lambda: self._acall_llm_stream(messages, max_tokens, response_format, call_type, ticket)
             )
-            return response.choices[0].message.content
+        )
+        async for piece in stream:
+            yield piece
+
+    async def _acall_llm_stream(self, messages, max_tokens, response_format, call_type, ticket):
+        """LLM API 실제 스트리밍 호출 (acall_llm_stream에서 중복 요청을 합친 뒤 호출, 카세트가 있으면 기록/재생)"""
+        try:
+            route = self.routing.route(call_type)
+            request = {
+                "model": route.model,
+                "messages": self._to_messages(messages),
+                "max_tokens": max_tokens,
+                "temperature": route.temperature
+            }
+            if response_format:
+                request["response_format"] = response_format
+            with self.metrics.track(call_type, route.model) as call:
+                if self.cassette is not None and self.cassette.replaying:
+                    async for piece, usage in self.cassette.replay_chat_stream(request):
+                        if usage is not None:
+                            self._record_usage(call, usage)
+                        else:
+                            call.mark_first_token()
+                            yield piece
+                    return
+
+                reserved_tokens = self._estimate_tokens(messages, max_tokens)
+                stream = await self._acreate_with_retries(call, lambda: self.client.chat.completions.create(
+                    stream=True,
+                    stream_options={"include_usage": True},
+                    **request
+                ), reserved_tokens, ticket)
+                pieces = []
+                usage = None
+                try:
+                    async for chunk in stream:
+                        # 마지막 청크는 choices 없이 usage만 담고 있다
+                        if getattr(chunk, 'usage', None):
+                            usage = chunk.usage
+                            self._record_usage(call, usage)
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            call.mark_first_token()
+                            pieces.append(chunk.choices[0].delta.content)
+                            yield chunk.choices[0].delta.content
+                finally:
+                    # usage를 받기 전에 끊긴 스트림(오류, 재실행으로 인한 취소)은 예약분을 전부 돌려준다
+                    used_tokens = call.prompt_tokens + call.completion_tokens if usage is not None else 0
+                    self.scheduler.release(route.model, reserved_tokens, used_tokens)
+                # 끝까지 받은 스트림만 기록 (중간에 취소된 응답은 기록하지 않음)
+                if self.cassette is not None:
+                    self.cassette.record_chat(request, "".join(pieces), usage)
+        except (GeneratorExit, asyncio.CancelledError):
+            raise
         except Exception as e:
             raise Exception(f"LLM API 호출 실패: {str(e)}")
 
-    def call_llm_json(self, prompt, max_tokens=4000):
+    def call_llm_json(self, messages, max_tokens=4000, use_cache=False,
+                      schema=None, schema_name="response", call_type="llm", on_queue=None,
+                      cache_key=None, session_id=None, escalate_if=None, scope=None):
+        """LLM API 호출 후 JSON 파싱 (acall_llm_json의 동기 버전, on_queue: 대기열 위치 콜백)"""
+        ticket, on_wait = self._queue_watch(on_queue)
+        return self._runner.run(self.acall_llm_json(
+            messages, max_tokens, use_cache, schema, schema_name, call_type, ticket, cache_key,
+            session_id, escalate_if, scope
+        ), on_wait=on_wait)
+
+    async def acall_llm_json(self, messages, max_tokens=4000, use_cache=False,
+                             schema=None, schema_name="response", call_type="llm", ticket=None,
+                             cache_key=None, session_id=None, escalate_if=None, scope=None):
         """
         LLM API 호출 후 JSON 파싱
 
+        schema가 주어지면 API의 JSON 스키마 응답 형식을 사용하고,
+        같은 스키마로 파싱과 검증을 한 번에 처리한다.
+        호출 종류의 경로에 상위 모델(escalate_to)이 있으면, 응답이 유효한 JSON이 아니거나
+        escalate_if가 True를 반환한 경우에만 상위 모델로 한 번 더 호출한다.
+
         Args:
-            prompt: 프롬프트 텍스트
+            messages: 메시지 리스트 ([{"role", "content"}]) 또는 프롬프트 텍스트
             max_tokens: 최대 토큰 수
+            use_cache: True면 같은 요청의 이전 응답을 재사용하고, 새 응답은 캐시에 저장
+            schema: 응답 JSON 스키마 (dict), None이면 JSON 모드 없이 호출
+            schema_name: 응답 형식에 표시할 스키마 이름
+            call_type: 메트릭 집계용 호출 종류
+            ticket: 대기열 위치를 알려줄 QueueTicket (선택)
+            cache_key: use_cache일 때 쓸 캐시 키 (None이면 메시지 전체로 생성),
+                응답에 영향이 적은 부분(예: 인터뷰 요약)이 바뀌어도 재사용하려면 직접 지정
+            session_id: 진행 중인 같은 요청을 합칠 범위 (세션 ID)
+            escalate_if: 파싱된 응답이 애매한지 판단하는 함수 (dict -> bool, 예: 채점 경계 점수), 선택
+            scope: 상위 모델 호출 비율을 집계할 범위 (수업 ID 등, 선택)
 
         Returns:
             dict: 파싱된 JSON 응답
         """
-        response_text = self.call_llm(prompt, max_tokens)
-        return self._extract_json(response_text)
+        route = self.routing.route(call_type)
+        if not use_cache:
+            cache_key = None
+        else:
+            if cache_key is None:
+                cache_key = make_cache_key(route.model, messages, max_tokens, route.temperature)
+            # 상위 모델로 다시 호출한 응답은 그 모델의 키에 저장되어 있다
+            lookup_key, cached_model = cache_key, route.model
+            escalated_key = self._escalated_cache_key(route, cache_key)
+            if escalated_key is not None and self.cache.contains(escalated_key):
+                lookup_key, cached_model = escalated_key, route.escalate_to
+            cached_text = self.cache.get(lookup_key)
+            if cached_text is not None:
+                with self.metrics.track(call_type, cached_model) as call:
+                    call.cache_hit = True
+                    return self._extract_json(cached_text, schema)
 
-    def generate_persona_image(self, persona_info):
+        async def request(model):
+            response_text = await self.acall_llm(
+                messages,
+                max_tokens,
+                response_format=json_response_format(schema_name, schema) if schema else None,
+                call_type=call_type,
+                ticket=ticket,
+                session_id=session_id,
+                model=model,
+                # 캐시로 세션 간에 공유되는 응답이면 다른 세션의 같은 요청과도 합친다
+                shared=use_cache
+            )
+            return response_text, self._extract_json(response_text, schema)
+
+        reason = None
+        if route.escalate_to is None:
+            response_text, result = await request(route.model)
+        else:
+            try:
+                response_text, result = await request(route.model)
+                if escalate_if is not None and escalate_if(result):
+                    reason = 'borderline'
+            except ValueError:
+                reason = 'invalid_json'
+            self.routing.record(call_type, reason, scope)
+            if reason is not None:
+                response_text, result = await request(route.escalate_to)
+
+        # 파싱에 성공한 응답만, 실제로 응답한 모델의 키로 캐시에 저장
+        if cache_key is not None:
+            if reason is not None:
+                cache_key = self._escalated_cache_key(route, cache_key)
+            self.cache.set(cache_key, response_text)
+        return result
+
+    @staticmethod
+    def _escalated_cache_key(route, cache_key):
+        """상위 모델로 다시 호출한 응답의 캐시 키 (기본 모델 키에서 파생, 상위 모델이 없으면 None)"""
+        if route.escalate_to is None:
+            return None
+        return make_cache_key(route.escalate_to, cache_key, None, route.temperature)
+
+    def _is_cached(self, call_type, cache_key):
+        """acall_llm_json의 캐시에 응답이 있는지 확인 (히트/미스 집계에 포함하지 않음)"""
+        escalated_key = self._escalated_cache_key(self.routing.route(call_type), cache_key)
+        return self.cache.contains(cache_key) or (
+            escalated_key is not None and self.cache.contains(escalated_key)
+        )
+
+    def generate_persona_image(self, persona_info, bypass_cache=False):
+        """페르소나 이미지 생성 (agenerate_persona_image의 동기 버전)"""
+        return self._runner.run(self.agenerate_persona_image(persona_info, bypass_cache))
+
+    async def agenerate_persona_image(self, persona_info, bypass_cache=False):
         """
         페르소나 이미지 생성 (실존 인물의 경우 역사적 정확성 추구)
 
+        생성된 이미지는 만료되는 URL 대신 로컬 이미지 저장소에 저장하며,
+        같은 프롬프트로 이미 만든 이미지가 있으면 다시 생성하지 않는다.
+
         Args:
             persona_info: 페르소나 정보 딕셔너리 (display_name, role, time_place 등)
+            bypass_cache: True면 저장된 이미지를 무시하고 새로 생성
 
         Returns:
-            str: 생성된 이미지 URL
+            dict: 이미지 경로 정보 (image_id, image_path, thumbnail_path, avatar_path),
+                실패 시 None
         """
         try:
-            display_name = persona_info.get('display_name', '')
-            role = persona_info.get('role', 'a person')
-            time_place = persona_info.get('time_place', 'historical period')
-            description = persona_info.get('description', '')
+            with self.metrics.track("image", "dall-e-3") as call:
+                return await self._agenerate_persona_image(call, persona_info, bypass_cache)
+        except Exception as e:
+            logger.warning("이미지 생성 실패: %s", e)
+            return None
 
-            # 실존 인물 여부 확인 (괄호 안에 실명이 있거나 역사적 인물인 경우)
-            is_historical_figure = '(' in display_name or any(keyword in role.lower() for keyword in ['king', 'emperor', 'inventor', 'scientist', 'writer', 'poet', '왕', '장군', '의사', '독립운동가'])
+    async def _agenerate_persona_image(self, call, persona_info, bypass_cache):
+        """페르소나 이미지 프롬프트 구성 및 생성 (오류는 호출자가 처리)"""
+        display_name = persona_info.get('display_name', '')
+        role = persona_info.get('role', 'a person')
+        time_place = persona_info.get('time_place', 'historical period')
+        description = persona_info.get('description', '')
 
-            # 한국 역사 인물 여부 확인
-            is_korean_historical = any(keyword in time_place for keyword in ['조선', '한국', '고려', '고구려', '백제', '신라', 'Korea', 'Joseon', 'Goryeo'])
+        # 실존 인물 여부 확인 (괄호 안에 실명이 있거나 역사적 인물인 경우)
+        is_historical_figure = '(' in display_name or any(keyword in role.lower() for keyword in ['king', 'emperor', 'inventor', 'scientist', 'writer', 'poet', '왕', '장군', '의사', '독립운동가'])
 
-            if is_historical_figure:
-                if is_korean_historical:
-                    # 한국 역사 인물: 한국 전통 복장과 문화 반영
-                    image_prompt = f"""A historically accurate portrait illustration of {role} from {time_place}.
+        # 한국 역사 인물 여부 확인
+        is_korean_historical = any(keyword in time_place for keyword in ['조선', '한국', '고려', '고구려', '백제', '신라', 'Korea', 'Joseon', 'Goryeo'])
+
+        if is_historical_figure:
+            if is_korean_historical:
+                # 한국 역사 인물: 한국 전통 복장과 문화 반영
+                image_prompt = f"""A historically accurate portrait illustration of {role} from {time_place}.
 Show authentic Korean traditional clothing (hanbok) appropriate to their status and era, with accurate colors and patterns.
 Include traditional Korean cultural elements, accessories, and headwear typical of {time_place}.
 Based on Korean historical records and traditional portrait paintings (초상화).
 Professional educational illustration style with Korean historical accuracy, detailed and respectful.
 Suitable for K-12 Korean history education.
 Realistic historical Korean portrait style with accurate period details and traditional aesthetics."""
-                else:
-                    # 일반 역사 인물: 역사적으로 정확한 복장, 시대적 배경, 지위에 맞는 모습
-                    image_prompt = f"""A historically accurate portrait illustration of {role} from {time_place}.
+            else:
+                # 일반 역사 인물: 역사적으로 정확한 복장, 시대적 배경, 지위에 맞는 모습
+                image_prompt = f"""A historically accurate portrait illustration of {role} from {time_place}.
 Show authentic period-appropriate clothing, accessories, and hairstyle typical of their social status and era.
 Include historically accurate details: traditional costume, cultural items, and setting that reflects {time_place}.
 Based on historical records and period artwork.
 Professional educational illustration style, detailed and respectful, suitable for K-12 history education.
 Realistic historical portrait style with accurate period details."""
-            else:
-                # 일반 페르소나: 직업과 시대에 맞는 일러스트레이션
-                image_prompt = f"""A portrait illustration of {role} from {time_place}.
+        else:
+            # 일반 페르소나: 직업과 시대에 맞는 일러스트레이션
+            image_prompt = f"""A portrait illustration of {role} from {time_place}.
 {description if description else 'Show professional attire and setting appropriate to their role.'}
 Professional educational illustration style, neutral background, suitable for K-12 education.
 Clean, modern illustration style."""
 
-            response = self.client.images.generate(
-                model="dall-e-3",
-                prompt=image_prompt,
-                size="1024x1024",
-                quality="standard",
-                n=1
+        prompt_key = make_cache_key("dall-e-3", image_prompt, "1024x1024", "standard")
+        if not bypass_cache:
+            stored = self.image_store.lookup_prompt(prompt_key)
+            if stored:
+                call.cache_hit = True
+                return stored
+
+        request = {
+            "model": "dall-e-3",
+            "prompt": image_prompt,
+            "size": "1024x1024",
+            "quality": "standard",
+            "response_format": "b64_json",
+            "n": 1
+        }
+        if self.cassette is not None and self.cassette.replaying:
+            image_bytes = await self.cassette.replay_image(request)
+        else:
+            response = await self._acreate_with_retries(
+                call, lambda: self.client.images.generate(**request)
             )
+            if self.cassette is not None:
+                self.cassette.record_image(request, response.data[0].b64_json)
+            image_bytes = base64.b64decode(response.data[0].b64_json)
+        call.images = 1
 
-            return response.data[0].url
-        except Exception as e:
-            print(f"이미지 생성 실패: {str(e)}")
-            return None
+        # 파일 저장과 WebP 변환은 이벤트 루프를 막지 않도록 별도 스레드에서 처리
+        return await asyncio.to_thread(self.image_store.save, image_bytes, prompt_key)
 
     def generate_persona(self, topic, subject, grade_level, scope="",
                         disallowed="없음", allowed_sources="",
-                        persona_style="", n=2):
+                        persona_style="", n=2, bypass_cache=False):
+        """페르소나 생성 (agenerate_persona의 동기 버전)"""
+        return self._runner.run(self.agenerate_persona(
+            topic, subject, grade_level, scope, disallowed, allowed_sources,
+            persona_style, n, bypass_cache
+        ))
+
+    async def agenerate_persona(self, topic, subject, grade_level, scope="",
+                                disallowed="없음", allowed_sources="",
+                                persona_style="", n=2, bypass_cache=False):
         """
         페르소나 생성 (이미지 포함)
 
@@ -175,11 +618,12 @@ Clean, modern illustration style."""
             allowed_sources: 지식 소스
             persona_style: 페르소나 스타일
             n: 생성할 페르소나 수
+            bypass_cache: True면 캐시를 무시하고 새로 생성
 
         Returns:
-            dict: 페르소나 정보 (이미지 URL 포함)
+            dict: 페르소나 정보 (이미지 경로 포함)
         """
-        from prompts import format_persona_prompt
+        from prompts import PERSONA_OUTPUT_SCHEMA, format_persona_prompt
 
         prompt = format_persona_prompt(
             topic=topic,
@@ -192,19 +636,69 @@ Clean, modern illustration style."""
             n=n
         )
 
-        result = self.call_llm_json(prompt)
+        result = await self.acall_llm_json(
+            prompt,
+            use_cache=not bypass_cache,
+            schema=PERSONA_OUTPUT_SCHEMA,
+            schema_name="persona_cards",
+            call_type="persona"
+        )
 
         # 각 페르소나에 대해 이미지 생성
         if result.get('status') == 'ok' and result.get('personae'):
-            for persona in result['personae']:
-                image_url = self.generate_persona_image(persona)
-                persona['image_url'] = image_url
+            await self.agenerate_persona_images(result['personae'], bypass_cache=bypass_cache)
 
         return result
 
+    def generate_persona_images(self, personae, bypass_cache=False):
+        """여러 페르소나 이미지 병렬 생성 (agenerate_persona_images의 동기 버전)"""
+        return self._runner.run(self.agenerate_persona_images(personae, bypass_cache))
+
+    async def agenerate_persona_images(self, personae, bypass_cache=False):
+        """
+        여러 페르소나의 이미지를 병렬로 생성하여 각 페르소나에 이미지 경로를 저장
+
+        이미지 한 장 생성에 10~20초가 걸리므로 image_max_workers 개까지 동시에 요청한다.
+        실패한 이미지는 경로 없이 남고 나머지 이미지 생성에는 영향을 주지 않는다.
+
+        Args:
+            personae: 페르소나 정보 딕셔너리 리스트
+            bypass_cache: True면 저장된 이미지를 무시하고 새로 생성
+
+        Returns:
+            list: 페르소나 순서대로 정렬된 이미지 경로 정보 리스트
+        """
+        if not personae:
+            return []
+
+        semaphore = asyncio.Semaphore(self.image_max_workers)
+
+        async def generate(persona):
+            async with semaphore:
+                return await self.agenerate_persona_image(persona, bypass_cache=bypass_cache)
+
+        images = await asyncio.gather(*(generate(persona) for persona in personae))
+
+        for persona, image in zip(personae, images):
+            if image:
+                persona.update(image)
+
+        return images
+
     def generate_objectives(self, topic, subject, grade_level,
                            duration_and_scope="45분, 인터뷰 10턴 후 서술문 400자",
-                           prior_knowledge="", focus="", disallowed="없음"):
+                           prior_knowledge="", focus="", disallowed="없음",
+                           bypass_cache=False):
+        """학습 목표 질문 생성 (agenerate_objectives의 동기 버전)"""
+        return self._runner.run(self.agenerate_objectives(
+            topic, subject, grade_level, duration_and_scope,
+            prior_knowledge, focus, disallowed, bypass_cache
+        ))
+
+    async def agenerate_objectives(self, topic, subject, grade_level,
+                                   duration_and_scope="45분, 인터뷰 10턴 후 서술문 400자",
+                                   prior_knowledge="", focus="", disallowed="없음",
+                                   bypass_cache=False):
         """
         학습 목표 질문 생성
 
@@ -216,11 +710,12 @@ Clean, modern illustration style."""
             prior_knowledge: 선수지식
             focus: 평가 포커스
             disallowed: 금지 요소
+            bypass_cache: True면 캐시를 무시하고 새로 생성
 
         Returns:
             dict: 학습 목표 정보
         """
-        from prompts import format_objectives_prompt
+        from prompts import OBJECTIVES_OUTPUT_SCHEMA, format_objectives_prompt
 
         prompt = format_objectives_prompt(
             topic=topic,
@@ -232,11 +727,85 @@ Clean, modern illustration style."""
             disallowed=disallowed
         )
 
-        return self.call_llm_json(prompt)
+        return await self.acall_llm_json(
+            prompt,
+            use_cache=not bypass_cache,
+            schema=OBJECTIVES_OUTPUT_SCHEMA,
+            schema_name="learning_objectives",
+            call_type="objectives"
+        )
+
+    def generate_lesson(self, topic, subject, grade_level, scope="", n=2,
+                        disallowed="없음", persona_kwargs=None, objectives_kwargs=None,
+                        bypass_cache=False):
+        """페르소나와 학습 목표 동시 생성 (agenerate_lesson의 동기 버전)"""
+        return self._runner.run(self.agenerate_lesson(
+            topic, subject, grade_level, scope, n, disallowed,
+            persona_kwargs, objectives_kwargs, bypass_cache
+        ))
+
+    async def agenerate_lesson(self, topic, subject, grade_level, scope="", n=2,
+                               disallowed="없음", persona_kwargs=None, objectives_kwargs=None,
+                               bypass_cache=False):
+        """
+        페르소나(이미지 포함)와 학습 목표를 동시에 생성
+
+        학습 목표 프롬프트는 페르소나 결과에 의존하지 않으므로 두 요청을 병렬로 보내고,
+        페르소나 응답이 도착하는 대로 이미지 생성을 이어서 진행한다.
+
+        Args:
+            topic: 주제
+            subject: 과목
+            grade_level: 학년/연령
+            scope: 수업 맥락/범위
+            n: 생성할 페르소나 수
+            disallowed: 금지 요소
+            persona_kwargs: agenerate_persona에 추가로 전달할 인자 (dict)
+            objectives_kwargs: agenerate_objectives에 추가로 전달할 인자 (dict)
+            bypass_cache: True면 캐시를 무시하고 새로 생성
+
+        Returns:
+            tuple: (페르소나 정보 dict, 학습 목표 정보 dict)
+        """
+        persona_result, objectives_result = await asyncio.gather(
+            self.agenerate_persona(
+                topic=topic,
+                subject=subject,
+                grade_level=grade_level,
+                scope=scope,
+                disallowed=disallowed,
+                n=n,
+                bypass_cache=bypass_cache,
+                **(persona_kwargs or {})
+            ),
+            self.agenerate_objectives(
+                topic=topic,
+                subject=subject,
+                grade_level=grade_level,
+                disallowed=disallowed,
+                bypass_cache=bypass_cache,
+                **(objectives_kwargs or {})
+            )
+        )
+        return persona_result, objectives_result
 
     def generate_interview_response(self, persona_card, student_question,
                                    learning_objectives=None, chat_history="",
-                                   reading_level="중등", disallowed="없음"):
+                                   reading_level="중등", disallowed="없음", on_queue=None,
+                                   system_prompt=None, passages="", session_id=None):
+        """인터뷰 응답 생성 (agenerate_interview_response의 동기 버전, on_queue: 대기열 위치 콜백)"""
+        ticket, on_wait = self._queue_watch(on_queue)
+        return self._runner.run(self.agenerate_interview_response(
+            persona_card, student_question, learning_objectives,
+            chat_history, reading_level, disallowed, ticket, system_prompt,
+            passages=passages, session_id=session_id
+        ), on_wait=on_wait)
+
+    async def agenerate_interview_response(self, persona_card, student_question,
+                                           learning_objectives=None, chat_history="",
+                                           reading_level="중등", disallowed="없음", ticket=None,
+                                           system_prompt=None, call_type="interview", passages="",
+                                           session_id=None):
         """
         인터뷰 응답 생성
 
@@ -247,34 +816,137 @@ Clean, modern illustration style."""
             chat_history: 대화 히스토리
             reading_level: 읽기 난이도
             disallowed: 금지 요소
+            ticket: 대기열 위치를 알려줄 QueueTicket (선택)
+            system_prompt: 미리 만들어 둔 system 메시지 (수업 패키지), None이면 새로 생성
+            call_type: 메트릭/우선순위용 호출 종류 (추가 질문 미리 생성은 "prefetch")
+            passages: 질문과 관련해 검색한 자료 구절 텍스트 (retrieval.format_passages)
+            session_id: 진행 중인 같은 요청을 합칠 범위 (세션 ID)
 
         Returns:
             dict: 인터뷰 응답 정보
         """
-        from prompts import format_interview_prompt
+        messages = self._build_interview_messages(
+            persona_card, student_question, learning_objectives,
+            chat_history, reading_level, disallowed, system_prompt, passages
+        )
+
+        from prompts import INTERVIEW_OUTPUT_SCHEMA
 
-        # 학습 목표를 텍스트로 포맷팅
-        learning_objectives_text = ""
-        if learning_objectives and learning_objectives.get('objectives'):
-            objectives_list = []
-            for obj in learning_objectives['objectives']:
-                objectives_list.append(f"- {obj['title']}: {obj['guide_question']}")
-            learning_objectives_text = "\n".join(objectives_list)
+        # 500자 이내 응답을 위해 max_tokens를 2000으로 설정
+        return await self.acall_llm_json(
+            messages,
+            max_tokens=2000,
+            schema=INTERVIEW_OUTPUT_SCHEMA,
+            schema_name="interview_response",
+            call_type=call_type,
+            ticket=ticket,
+            session_id=session_id
+        )
+
+    def generate_interview_response_stream(self, persona_card, student_question,
+                                          learning_objectives=None, chat_history="",
+                                          reading_level="중등", disallowed="없음", on_queue=None,
+                                          system_prompt=None, passages="", session_id=None):
+        """
+        인터뷰 응답 스트리밍 생성
 
-        prompt = format_interview_prompt(
-            persona_card_json=json.dumps(persona_card, ensure_ascii=False, indent=2),
+        Args:
+            persona_card: 페르소나 카드 정보 (dict)
+            student_question: 학생 질문
+            learning_objectives: 학습 목표 정보 (dict) - 학생 학습 유도용
+            chat_history: 대화 히스토리
+            reading_level: 읽기 난이도
+            disallowed: 금지 요소
+            on_queue: 요청 한도로 대기하는 동안 대기열 위치(int, 허가되면 None)를 받을 콜백,
+                스트림을 순회하는 스레드에서 호출된다
+            system_prompt: 미리 만들어 둔 system 메시지 (수업 패키지), None이면 새로 생성
+            passages: 질문과 관련해 검색한 자료 구절 텍스트 (retrieval.format_passages)
+            session_id: 진행 중인 같은 요청을 합칠 범위 (세션 ID, 재실행으로 다시 들어온 같은 질문은
+                진행 중인 스트림을 이어받음)
+
+        Returns:
+            InterviewResponseStream: 순회하면 utterance 조각을 반환하고,
+                순회가 끝나면 result에 전체 응답(dict)이 담기는 스트림
+        """
+        messages = self._build_interview_messages(
+            persona_card, student_question, learning_objectives,
+            chat_history, reading_level, disallowed, system_prompt, passages
+        )
+
+        from prompts import INTERVIEW_OUTPUT_SCHEMA
+
+        return InterviewResponseStream(
+            self.call_llm_stream(
+                messages,
+                max_tokens=2000,
+                response_format=json_response_format("interview_response", INTERVIEW_OUTPUT_SCHEMA),
+                call_type="interview",
+                on_queue=on_queue,
+                session_id=session_id
+            ),
+            lambda text: self._extract_json(text, INTERVIEW_OUTPUT_SCHEMA)
+        )
+
+    def _build_interview_messages(self, persona_card, student_question, learning_objectives,
+                                  chat_history, reading_level, disallowed, system_prompt=None,
+                                  passages=""):
+        """인터뷰 응답 메시지 생성 (고정 내용은 system, 턴별 내용은 user)"""
+        from prompts import format_interview_messages, format_interview_objectives
+
+        # 수업 패키지에 미리 만들어 둔 system 메시지가 있으면 그대로 사용
+        persona_card_json = None
+        if system_prompt is None:
+            persona_card_json = self.compactor.compact_persona(persona_card)
+            learning_objectives = format_interview_objectives(learning_objectives)
+        return format_interview_messages(
+            persona_card_json=persona_card_json,
             student_question=student_question,
-            learning_objectives=learning_objectives_text,
+            learning_objectives=learning_objectives,
             chat_history=chat_history,
             reading_level=reading_level,
-            disallowed=disallowed
+            disallowed=disallowed,
+            passages=passages,
+            system_prompt=system_prompt
         )
 
-        # 500자 이내 응답을 위해 max_tokens를 2000으로 설정
-        return self.call_llm_json(prompt, max_tokens=2000)
+    def summarize_conversation(self, previous_summary, turns, max_chars=400):
+        """대화 누적 요약 (asummarize_conversation의 동기 버전)"""
+        return self._runner.run(self.asummarize_conversation(previous_summary, turns, max_chars))
+
+    async def asummarize_conversation(self, previous_summary, turns, max_chars=400):
+        """
+        대화 누적 요약 (ConversationMemory의 요약 함수로 사용)
+
+        Args:
+            previous_summary: 기존 요약 텍스트
+            turns: 요약에 새로 합칠 대화 턴 텍스트 리스트
+            max_chars: 요약 최대 글자 수
+
+        Returns:
+            str: 갱신된 요약 텍스트
+        """
+        from prompts import format_summary_prompt
+
+        prompt = format_summary_prompt(
+            previous_summary=previous_summary,
+            new_turns="\n".join(turns),
+            max_chars=max_chars
+        )
+
+        summary = await self.acall_llm(prompt, max_tokens=600, call_type="summary")
+        return summary.strip()
 
     def grade_answer(self, objectives, student_answer, interview_summary="",
-                    weights="", originality_rules=""):
+                    weights="", originality_rules="", on_queue=None, session_id=None):
+        """답안 채점 (agrade_answer의 동기 버전, on_queue: 대기열 위치 콜백)"""
+        ticket, on_wait = self._queue_watch(on_queue)
+        return self._runner.run(self.agrade_answer(
+            objectives, student_answer, interview_summary, weights, originality_rules, ticket,
+            session_id
+        ), on_wait=on_wait)
+
+    async def agrade_answer(self, objectives, student_answer, interview_summary="",
+                            weights="", originality_rules="", ticket=None, session_id=None):
         """
         답안 채점
 
@@ -284,18 +956,112 @@ Clean, modern illustration style."""
             interview_summary: 인터뷰 로그 요약
             weights: 교사 가중치
             originality_rules: 표절/AI 작성 의심 규칙
+            ticket: 대기열 위치를 알려줄 QueueTicket (선택)
+            session_id: 진행 중인 같은 요청을 합칠 범위 (세션 ID)
 
         Returns:
             dict: 채점 결과
         """
-        from prompts import format_grading_prompt
+        from grading import is_borderline
+        from prompts import GRADING_OUTPUT_SCHEMA, format_grading_messages
 
-        prompt = format_grading_prompt(
-            objectives_json=json.dumps(objectives, ensure_ascii=False, indent=2),
+        messages = format_grading_messages(
+            objectives_json=self.compactor.compact_objectives(objectives),
             student_answer=student_answer,
             interview_summary=interview_summary,
             weights=weights,
             originality_rules=originality_rules
         )
 
-        return self.call_llm_json(prompt)
+        return await self.acall_llm_json(
+            messages,
+            schema=GRADING_OUTPUT_SCHEMA,
+            schema_name="grading_result",
+            call_type="grading",
+            ticket=ticket,
+            session_id=session_id,
+            escalate_if=is_borderline
+        )
+
+    def grade_answers_by_objective(self, objectives, answers, interview_summary="",
+                                   weights="", originality_rules="", on_queue=None, session_id=None,
+                                   lesson_id=None):
+        """학습 목표별 채점 (agrade_answers_by_objective의 동기 버전, on_queue: 대기열 위치 콜백)"""
+        ticket, on_wait = self._queue_watch(on_queue)
+        return self._runner.run(self.agrade_answers_by_objective(
+            objectives, answers, interview_summary, weights, originality_rules, ticket, session_id,
+            lesson_id
+        ), on_wait=on_wait)
+
+    async def agrade_answers_by_objective(self, objectives, answers, interview_summary="",
+                                          weights="", originality_rules="", ticket=None,
+                                          session_id=None, lesson_id=None):
+        """
+        학습 목표별 답안 채점 후 하나의 채점 결과로 합침
+
+        목표마다 그 목표와 답안만으로 채점하고, 결과는 (목표, 답안, 근거 요약, 가중치, 규칙) 해시를 키로 캐시한다.
+        다시 제출하면 답안이나 인터뷰 근거가 바뀐 목표만 병렬로 다시 채점한다.
+        채점 경로에 상위 모델이 지정되어 있으면 경계 점수이거나 형식이 잘못된 목표만 상위 모델로 다시 채점한다.
+
+        Args:
+            objectives: 학습 목표 (dict, objectives 리스트 포함)
+            answers: 목표별 답안 {목표 제목: 답안}
+            interview_summary: 인터뷰 로그 요약 (str) 또는 목표별 근거 요약 {목표 제목: 요약}
+            weights: 교사 가중치
+            originality_rules: 표절/AI 작성 의심 규칙
+            ticket: 대기열 위치를 알려줄 QueueTicket (선택)
+            session_id: 진행 중인 같은 요청을 합칠 범위 (세션 ID)
+            lesson_id: 상위 모델 재채점 비율을 집계할 수업 ID (선택)
+
+        Returns:
+            dict: 합친 채점 결과 (grade_answer와 같은 형식, regraded_objectives에 새로 채점한 목표 제목)
+        """
+        from grading import is_borderline, merge_grading_results
+        from prompts import GRADING_OUTPUT_SCHEMA, format_grading_messages
+
+        regraded = []
+
+        route = self.routing.route("grading")
+
+        async def grade_objective(objective):
+            title = objective['title']
+            answer = answers.get(title, '')
+            objective_json = self.compactor.compact_objectives({'objectives': [objective]})
+            summary = (
+                interview_summary.get(title, "") if isinstance(interview_summary, dict)
+                else interview_summary
+            )
+            cache_key = make_cache_key(
+                route.model, ["grading", objective_json, answer, summary, weights, originality_rules],
+                None, route.temperature
+            )
+            # 히트/미스는 아래 acall_llm_json에서 한 번만 집계
+            cached = self._is_cached("grading", cache_key)
+            result = await self.acall_llm_json(
+                format_grading_messages(
+                    objectives_json=objective_json,
+                    student_answer=f"[{title}]\n{answer}",
+                    interview_summary=summary,
+                    weights=weights,
+                    originality_rules=originality_rules
+                ),
+                use_cache=True,
+                schema=GRADING_OUTPUT_SCHEMA,
+                schema_name="grading_result",
+                call_type="grading",
+                ticket=ticket,
+                cache_key=cache_key,
+                session_id=session_id,
+                escalate_if=is_borderline,
+                scope=lesson_id
+            )
+            if not cached:
+                regraded.append(title)
+            return title, result
+
+        objective_list = objectives.get('objectives', [])
+        results = await asyncio.gather(*(grade_objective(obj) for obj in objective_list))
+
+        merged = merge_grading_results(OrderedDict(results))
+        merged['regraded_objectives'] = [obj['title'] for obj in objective_list if obj['title'] in regraded]
+        return merged
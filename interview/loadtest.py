@@ -0,0 +1,424 @@
+"""
+부하 테스트 모듈 - 한 반 학생들이 동시에 인터뷰하고 채점받는 흐름을 재현해 지연 시간과 처리량 측정
+
+사용 예:
+    python loadtest.py --students 30 --turns 5
+    python loadtest.py --students 200 --turns 8 --latency lognormal:0.8:0.6 --rate-limit-rate 0.02
+    python loadtest.py --students 30 --base-url http://127.0.0.1:8800/v1 --output report.json
+    python loadtest.py --students 30 --seed 1 --cassette run.jsonl --cassette-mode record
+    python loadtest.py --students 30 --seed 1 --cassette run.jsonl --think-time 0 --ramp-up 0
+
+--base-url을 지정하지 않으면 모의 OpenAI 서버(mock_openai_server.py)를 같은 프로세스에서 띄운다.
+학생 한 명은 Streamlit 세션 하나처럼 스레드 하나에서 동기 메서드를 호출하며, 모든 학생이
+앱과 같이 LLMService 하나(공용 커넥션 풀/요청 스케줄러)를 함께 쓴다.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from evidence import EvidenceDigest
+from memory import ConversationMemory
+
+# 학생이 첫 질문으로 고르는 질문 (이후에는 제안된 추가 질문이나 학습 목표 안내 질문을 사용)
+OPENING_QUESTIONS = [
+    "안녕하세요, 자기소개를 해 주세요.",
+    "그 일을 하게 된 이유가 무엇인가요?",
+    "당시 가장 어려웠던 점은 무엇이었나요?",
+]
+
+
+def percentile(values, ratio):
+    """정렬된 값에서 비율 위치의 값 (최근접 순위, 값이 없으면 None)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(int(round(ratio * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def latency_summary(values):
+    """지연 시간 목록 요약 (count, p50, p95, p99, max)"""
+    return {
+        'count': len(values),
+        'p50': percentile(values, 0.5),
+        'p95': percentile(values, 0.95),
+        'p99': percentile(values, 0.99),
+        'max': max(values) if values else None
+    }
+
+
+class StudentResult:
+    """학생 한 명의 측정값"""
+
+    def __init__(self, student_id, persona_name):
+        self.student_id = student_id
+        self.persona_name = persona_name
+        self.turn_latencies = []
+        self.ttfts = []
+        self.grading_latency = None
+        self.errors = []
+
+
+class ClassroomLoadTest:
+    """
+    교실 부하 테스트
+
+    선생님이 수업(페르소나/학습 목표/이미지)을 한 번 만든 뒤, 학생들이 ramp_up초에 걸쳐 들어와
+    페르소나 선택 → 인터뷰 turns턴 → 학습 목표별 채점을 진행한다.
+    인터뷰는 앱과 같이 스트리밍으로 받아 첫 조각까지 걸린 시간(TTFT)과 전체 턴 시간을 잰다.
+    """
+
+    def __init__(self, llm_service, students=30, turns=5, think_time=2.0, ramp_up=10.0,
+                 topic="훈민정음 창제", subject="역사", grade_level="중학교 2학년", personae=2, seed=None,
+                 deterministic=False):
+        """
+        Args:
+            llm_service: 모든 학생이 함께 쓸 LLMService
+            students: 동시 학생 수
+            turns: 학생당 인터뷰 질문 수
+            think_time: 질문 사이 평균 대기 시간(초, 질문을 읽고 입력하는 시간)
+            ramp_up: 모든 학생이 들어오는 데 걸리는 시간(초)
+            topic, subject, grade_level: 선생님이 만드는 수업 정보
+            personae: 만들 페르소나 수
+            seed: 난수 시드 (학생별 선택 재현용)
+            deterministic: True면 백그라운드 대화 요약이 끝난 뒤 다음 질문을 보내
+                대화 히스토리(요청 지문)가 실행마다 같게 유지된다 (카세트 기록/재생용)
+        """
+        self.llm_service = llm_service
+        self.students = students
+        self.turns = turns
+        self.think_time = think_time
+        self.ramp_up = ramp_up
+        self.topic = topic
+        self.subject = subject
+        self.grade_level = grade_level
+        self.personae = personae
+        self.seed = seed
+        self.deterministic = deterministic
+        self._stop = threading.Event()
+
+    def prepare_lesson(self):
+        """
+        선생님 단계: 페르소나/학습 목표/이미지 생성
+
+        Returns:
+            tuple: (페르소나 목록, 학습 목표 dict, 소요 시간(초))
+        """
+        started = time.perf_counter()
+        persona_result, objectives = self.llm_service.generate_lesson(
+            topic=self.topic,
+            subject=self.subject,
+            grade_level=self.grade_level,
+            n=self.personae,
+            bypass_cache=True
+        )
+        personae = persona_result.get('personae', [])
+        self.llm_service.generate_persona_images(personae)
+        return personae, objectives, time.perf_counter() - started
+
+    def run(self):
+        """
+        부하 테스트 실행
+
+        Returns:
+            dict: 측정 보고서 (report() 형식)
+        """
+        personae, objectives, lesson_time = self.prepare_lesson()
+        if not personae:
+            raise RuntimeError("페르소나가 생성되지 않아 부하 테스트를 진행할 수 없습니다.")
+        lesson_calls = self._call_counts()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.students, thread_name_prefix="student") as executor:
+            futures = [
+                executor.submit(self._run_student, idx, personae, objectives)
+                for idx in range(self.students)
+            ]
+            try:
+                results = [future.result() for future in futures]
+            except KeyboardInterrupt:
+                self._stop.set()
+                raise
+        elapsed = time.perf_counter() - started
+
+        return self.report(results, elapsed, lesson_time, lesson_calls)
+
+    def _run_student(self, idx, personae, objectives):
+        """학생 한 명의 시나리오 (학생 스레드에서 실행)"""
+        rng = random.Random(None if self.seed is None else self.seed + idx)
+        if self.ramp_up > 0:
+            time.sleep(self.ramp_up * idx / self.students)
+
+        # 페르소나 선택
+        persona = rng.choice(personae)
+        result = StudentResult(f"student-{idx:03d}", persona['display_name'])
+        session_id = uuid.uuid4().hex
+        memory = ConversationMemory(summarize=self.llm_service.summarize_conversation)
+        digest = EvidenceDigest(objectives)
+        guide_questions = [obj.get('guide_question') for obj in objectives.get('objectives', [])]
+        question = rng.choice(OPENING_QUESTIONS)
+
+        for _ in range(self.turns):
+            if self._stop.is_set():
+                return result
+            time.sleep(rng.uniform(0.5, 1.5) * self.think_time)
+
+            digest.add_turn(persona['display_name'], 'student', question)
+            if self.deterministic:
+                memory.wait_for_summary()
+            started = time.perf_counter()
+            ttft = None
+            try:
+                stream = self.llm_service.generate_interview_response_stream(
+                    persona_card=persona,
+                    student_question=question,
+                    learning_objectives=objectives,
+                    chat_history=memory.render(),
+                    reading_level=persona.get('reading_level', '중등'),
+                    session_id=session_id
+                )
+                for _ in stream:
+                    if ttft is None:
+                        ttft = time.perf_counter() - started
+                response = stream.result
+            except Exception as e:
+                result.errors.append(f"interview: {e}")
+                continue
+            result.turn_latencies.append(time.perf_counter() - started)
+            if ttft is not None:
+                result.ttfts.append(ttft)
+
+            digest.add_turn(persona['display_name'], 'persona', response['utterance'])
+            memory.add_turn('student', question)
+            memory.add_turn('persona', response['utterance'])
+
+            # 다음 질문: 제안된 추가 질문을 누르거나 학습 목표 안내 질문을 입력
+            candidates = response.get('suggested_followups') or [q for q in guide_questions if q]
+            question = rng.choice(candidates) if candidates else rng.choice(OPENING_QUESTIONS)
+
+        # 답안이 같으면 채점 캐시를 재사용하므로 학생마다 다른 답안을 쓴다
+        answers = {
+            obj['title']: f"{obj.get('objective', obj['title'])}에 대해 인터뷰에서 알게 된 내용을 정리했습니다. "
+                          f"({result.student_id})"
+            for obj in objectives.get('objectives', [])
+        }
+        started = time.perf_counter()
+        try:
+            self.llm_service.grade_answers_by_objective(
+                objectives=objectives,
+                answers=answers,
+                interview_summary={
+                    title: summary or "관련 인터뷰 기록 없음"
+                    for title, summary in digest.summaries().items()
+                },
+                session_id=session_id
+            )
+            result.grading_latency = time.perf_counter() - started
+        except Exception as e:
+            result.errors.append(f"grading: {e}")
+        return result
+
+    def _call_counts(self):
+        """호출 종류별 누적 API 호출 수 (로컬 캐시 적중 제외)"""
+        return {
+            call_type: values['calls'] - values['cache_hits']
+            for call_type, values in self.llm_service.metrics.summary().items()
+        }
+
+    def report(self, results, elapsed, lesson_time, lesson_calls):
+        """
+        측정 보고서 작성
+
+        Args:
+            results: StudentResult 리스트
+            elapsed: 학생 단계 전체 소요 시간(초)
+            lesson_time: 선생님 단계 소요 시간(초)
+            lesson_calls: 선생님 단계까지의 호출 종류별 호출 수
+
+        Returns:
+            dict: 설정, 지연 시간 분포(p50/p95/p99), 처리량, 학생당 호출 수, 오류, 서버 지표
+        """
+        turn_latencies = [value for result in results for value in result.turn_latencies]
+        ttfts = [value for result in results for value in result.ttfts]
+        grading_latencies = [result.grading_latency for result in results if result.grading_latency is not None]
+        errors = [error for result in results for error in result.errors]
+
+        student_calls = {
+            call_type: calls - lesson_calls.get(call_type, 0)
+            for call_type, calls in self._call_counts().items()
+        }
+        student_calls = {call_type: calls for call_type, calls in student_calls.items() if calls}
+        summary = self.llm_service.metrics.summary()
+
+        return {
+            'config': {
+                'students': self.students,
+                'turns': self.turns,
+                'think_time': self.think_time,
+                'ramp_up': self.ramp_up,
+                'personae': self.personae
+            },
+            'lesson_time': lesson_time,
+            'elapsed': elapsed,
+            'turn_latency': latency_summary(turn_latencies),
+            'ttft': latency_summary(ttfts),
+            'grading_latency': latency_summary(grading_latencies),
+            'throughput_turns_per_sec': len(turn_latencies) / elapsed if elapsed else 0.0,
+            'calls_per_student': {
+                call_type: calls / self.students for call_type, calls in sorted(student_calls.items())
+            },
+            'calls_per_student_total': sum(student_calls.values()) / self.students,
+            'retries': sum(values['retries'] for values in summary.values()),
+            'errors': len(errors),
+            'error_samples': errors[:5],
+            'counters': self.llm_service.metrics.counters(),
+            'scheduler': self.llm_service.scheduler.stats(),
+            'routing': self.llm_service.routing.stats()
+        }
+
+
+def format_report(report):
+    """보고서를 터미널 출력용 텍스트로 변환"""
+    def fmt(value):
+        return "-" if value is None else f"{value:.3f}s"
+
+    config = report['config']
+    lines = [
+        f"학생 {config['students']}명 × 인터뷰 {config['turns']}턴 "
+        f"(생각 시간 {config['think_time']}s, 입장 {config['ramp_up']}s)",
+        f"수업 준비: {report['lesson_time']:.2f}s, 학생 단계: {report['elapsed']:.2f}s",
+        "",
+        f"{'구간':<14}{'건수':>6}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}",
+    ]
+    for label, key in (("인터뷰 턴", 'turn_latency'), ("첫 조각(TTFT)", 'ttft'), ("채점", 'grading_latency')):
+        stats = report[key]
+        lines.append(
+            f"{label:<14}{stats['count']:>6}{fmt(stats['p50']):>10}{fmt(stats['p95']):>10}"
+            f"{fmt(stats['p99']):>10}{fmt(stats['max']):>10}"
+        )
+    lines += [
+        "",
+        f"처리량: {report['throughput_turns_per_sec']:.2f} 턴/초",
+        f"학생당 API 호출: {report['calls_per_student_total']:.2f} "
+        + ", ".join(f"{name}={value:.2f}" for name, value in report['calls_per_student'].items()),
+        f"재시도: {report['retries']}회, 오류: {report['errors']}건",
+    ]
+    if report.get('routing'):
+        lines.append(f"모델 라우팅: {report['routing']}")
+    if report.get('cassette'):
+        lines.append(f"카세트: {report['cassette']}")
+    if report.get('server'):
+        lines.append(f"모의 서버: {report['server']}")
+    for error in report['error_samples']:
+        lines.append(f"  - {error}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    """부하 테스트 CLI"""
+    parser = argparse.ArgumentParser(description="교실 단위 부하 테스트 (모의 OpenAI 서버 사용)")
+    parser.add_argument("--students", type=int, default=30, help="동시 학생 수")
+    parser.add_argument("--turns", type=int, default=5, help="학생당 인터뷰 질문 수")
+    parser.add_argument("--think-time", type=float, default=2.0, help="질문 사이 평균 대기 시간(초)")
+    parser.add_argument("--ramp-up", type=float, default=10.0, help="모든 학생이 들어오는 데 걸리는 시간(초)")
+    parser.add_argument("--personae", type=int, default=2, help="페르소나 수")
+    parser.add_argument("--base-url", help="이미 실행 중인 OpenAI 호환 서버 주소 (없으면 모의 서버 실행)")
+    parser.add_argument("--latency", default="lognormal:0.6:0.5",
+                        help="모의 서버 첫 토큰 지연 분포 (fixed:초 | uniform:최소:최대 | lognormal:중앙값:sigma)")
+    parser.add_argument("--tokens-per-sec", type=float, default=80.0, help="모의 서버 출력 토큰 생성 속도")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="모의 서버 429 응답 확률 (0~1)")
+    parser.add_argument("--seed", type=int, help="난수 시드")
+    parser.add_argument("--cassette", help="응답 카세트 파일 (record: 기록, replay: 네트워크 없이 재생)")
+    parser.add_argument("--cassette-mode", choices=["record", "replay"], default="replay", help="카세트 모드")
+    parser.add_argument("--cassette-latency", type=float, default=0.0, help="재생할 때 첫 토큰 지연(초)")
+    parser.add_argument("--cassette-tokens-per-sec", type=float, default=0.0,
+                        help="재생할 때 출력 토큰 생성 속도 (0이면 즉시)")
+    parser.add_argument("--output", help="보고서를 저장할 JSON 파일")
+    args = parser.parse_args(argv)
+
+    server = None
+    replaying = bool(args.cassette) and args.cassette_mode == "replay"
+    # 카세트 재생은 네트워크를 쓰지 않으므로 서버가 필요 없다
+    if args.base_url and not replaying:
+        os.environ["OPENAI_BASE_URL"] = args.base_url
+    elif not replaying:
+        from mock_openai_server import MockOpenAIServer, parse_latency
+
+        server = MockOpenAIServer(
+            latency=parse_latency(args.latency),
+            tokens_per_sec=args.tokens_per_sec,
+            rate_limit_rate=args.rate_limit_rate,
+            seed=args.seed
+        ).start()
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "mock")
+
+    from cache import MemoryCache
+    from cassette import Cassette
+    from image_store import ImageStore
+    from llm_service import LLMService
+    from metrics import MetricsRecorder
+    from routing import create_routing_from_env
+    from scheduler import create_scheduler_from_env
+
+    cassette = None
+    if args.cassette:
+        cassette = Cassette(
+            args.cassette,
+            mode=args.cassette_mode,
+            latency=args.cassette_latency,
+            tokens_per_sec=args.cassette_tokens_per_sec
+        )
+
+    with tempfile.TemporaryDirectory(prefix="loadtest-images-") as image_dir:
+        # 앱의 get_llm_service와 같은 구성 (이미지는 임시 디렉터리에 저장)
+        metrics = MetricsRecorder()
+        routing = create_routing_from_env(metrics=metrics)
+        llm_service = LLMService(
+            cache=MemoryCache(),
+            image_store=ImageStore(image_dir),
+            metrics=metrics,
+            max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "100")),
+            scheduler=create_scheduler_from_env(text_model=routing.default.model, extra_models=routing.models()),
+            routing=routing,
+            cassette=cassette
+        )
+        test = ClassroomLoadTest(
+            llm_service,
+            students=args.students,
+            turns=args.turns,
+            think_time=args.think_time,
+            ramp_up=args.ramp_up,
+            personae=args.personae,
+            seed=args.seed,
+            deterministic=cassette is not None
+        )
+        try:
+            report = test.run()
+        finally:
+            if server is not None:
+                report_server = server.stats()
+                server.stop()
+            if cassette is not None:
+                cassette.close()
+
+    if cassette is not None:
+        report['cassette'] = cassette.stats()
+    if server is not None:
+        report['server'] = report_server
+    print(format_report(report))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 1 if report['errors'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
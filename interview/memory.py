@@ -0,0 +1,175 @@
+"""
+대화 메모리 모듈 - 토큰 예산 안에서 최근 대화는 그대로, 오래된 대화는 요약으로 유지
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from tokens import count_tokens
+
+# 요약 작업은 화면 응답을 막지 않도록 백그라운드 스레드에서 실행
+_summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="memory-summary")
+
+ROLE_LABELS = {
+    'student': '학생',
+    'persona': '페르소나',
+}
+
+
+def format_turn(turn):
+    """대화 한 턴을 프롬프트용 한 줄 텍스트로 변환"""
+    return f"{ROLE_LABELS.get(turn['role'], turn['role'])}: {turn['content']}"
+
+
+class ConversationMemory:
+    """
+    토큰 예산 기반 대화 메모리
+
+    최근 recent_turns 턴은 원문 그대로 두고, 그보다 오래된 턴은 fold_batch 개씩 모아
+    백그라운드에서 기존 요약에 이어 붙인다(누적 요약).
+    render()는 요약 + 최근 턴을 token_budget 안에서 구성하므로
+    인터뷰가 길어져도 턴당 프롬프트 길이가 일정하게 유지된다.
+    """
+
+    def __init__(self, summarize=None, token_budget=1200, recent_turns=6, fold_batch=4):
+        """
+        Args:
+            summarize: 요약 함수 (previous_summary, turn_texts) -> str, None이면 요약 없이 잘라냄
+            token_budget: 대화 히스토리에 사용할 최대 토큰 수
+            recent_turns: 요약하지 않고 원문으로 유지할 최근 턴 수
+            fold_batch: 한 번에 요약에 합칠 오래된 턴 수
+        """
+        self.summarize = summarize
+        self.token_budget = token_budget
+        self.recent_turns = recent_turns
+        self.fold_batch = fold_batch
+
+        self.turns = []  # [{'role', 'content', 'tokens'}]
+        self.summary = ""
+        self.summary_tokens = 0
+        self._summarized_count = 0  # 요약에 반영된 앞쪽 턴 수
+        self._pending = None
+        self._lock = threading.Lock()
+
+    def add_turn(self, role, content):
+        """
+        대화 턴 추가 (필요하면 백그라운드 요약 시작)
+
+        Args:
+            role: 'student' 또는 'persona'
+            content: 발화 내용
+        """
+        with self._lock:
+            self.turns.append({
+                'role': role,
+                'content': content,
+                'tokens': count_tokens(format_turn({'role': role, 'content': content}))
+            })
+        self._maybe_fold()
+
+    def restore(self, turns):
+        """
+        저장된 대화 턴으로 메모리 복원 (요약은 다음 add_turn 때 이어서 진행)
+
+        Args:
+            turns: 오래된 순으로 정렬된 턴 dict 리스트 (role, content)
+        """
+        with self._lock:
+            for turn in turns:
+                self.turns.append({
+                    'role': turn['role'],
+                    'content': turn['content'],
+                    'tokens': count_tokens(format_turn(turn))
+                })
+
+    def clear(self):
+        """대화 메모리 초기화"""
+        with self._lock:
+            self.turns = []
+            self.summary = ""
+            self.summary_tokens = 0
+            self._summarized_count = 0
+            if self._pending is not None:
+                self._pending.cancel()
+            self._pending = None
+
+    def wait_for_summary(self, timeout=None):
+        """
+        진행 중인 백그라운드 요약이 끝날 때까지 대기 (응답 재생 등 대화 히스토리가 매번 같아야 할 때)
+
+        Args:
+            timeout: 최대 대기 시간(초), None이면 끝날 때까지
+        """
+        with self._lock:
+            pending = self._pending
+        if pending is None:
+            return
+        try:
+            pending.exception(timeout=timeout)
+        except Exception:
+            return
+        # 요약 결과 반영 중 이어서 시작된 요약도 기다린다
+        if self._pending is not None and self._pending is not pending:
+            self.wait_for_summary(timeout)
+
+    def render(self):
+        """
+        토큰 예산 안에서 프롬프트용 대화 히스토리 구성
+
+        요약이 있으면 먼저 넣고, 남은 예산으로 아직 요약되지 않은 턴을 최신순으로 채운다.
+        (백그라운드 요약이 끝나지 않은 턴도 예산이 허락하는 만큼 원문으로 포함된다)
+
+        Returns:
+            str: 대화 히스토리 텍스트 (대화가 없으면 빈 문자열)
+        """
+        with self._lock:
+            summary = self.summary
+            remaining = self.token_budget - self.summary_tokens
+            unsummarized = self.turns[self._summarized_count:]
+
+        lines = []
+        for turn in reversed(unsummarized):
+            if turn['tokens'] > remaining:
+                break
+            lines.append(format_turn(turn))
+            remaining -= turn['tokens']
+        lines.reverse()
+
+        if summary:
+            lines.insert(0, f"(이전 대화 요약) {summary}")
+        return "\n".join(lines)
+
+    def _maybe_fold(self):
+        """요약 대상 턴이 fold_batch 개 이상 쌓이면 백그라운드 요약 시작"""
+        if self.summarize is None:
+            return
+
+        with self._lock:
+            if self._pending is not None:
+                return
+            fold_end = len(self.turns) - self.recent_turns
+            if fold_end - self._summarized_count < self.fold_batch:
+                return
+            previous_summary = self.summary
+            turns_to_fold = [format_turn(turn) for turn in self.turns[self._summarized_count:fold_end]]
+            pending = _summary_executor.submit(self.summarize, previous_summary, turns_to_fold)
+            self._pending = pending
+
+        pending.add_done_callback(lambda future: self._apply_summary(future, fold_end))
+
+    def _apply_summary(self, future, fold_end):
+        """백그라운드 요약 결과 반영"""
+        with self._lock:
+            if future is not self._pending:
+                return  # clear()로 취소된 요약
+            self._pending = None
+            if future.cancelled() or future.exception() is not None:
+                return  # 실패하면 다음 턴에 다시 시도, 그동안은 원문 턴을 예산만큼 사용
+            summary = (future.result() or "").strip()
+            if not summary:
+                return
+            self.summary = summary
+            self.summary_tokens = count_tokens(summary)
+            self._summarized_count = fold_end
+
+        # 요약하는 동안 쌓인 턴이 있으면 이어서 처리
+        self._maybe_fold()
@@ -0,0 +1,332 @@
+"""
+메트릭 모듈 - LLM/이미지 호출별 시간, 토큰, 비용, 재시도, 오류 집계
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 모델별 100만 토큰당 가격(USD): (입력, 캐시된 입력, 출력), 이미지는 장당 가격
+MODEL_PRICES = {
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+}
+IMAGE_PRICES = {
+    "dall-e-3": 0.04,
+}
+
+# 호출 종류별 최근 기록 보관 개수 (백분위 계산용)
+_SAMPLE_WINDOW = 1000
+
+
+def estimate_cost(model, prompt_tokens=0, completion_tokens=0, cached_tokens=0, images=0):
+    """
+    호출 비용 추정
+
+    Args:
+        model: 모델명
+        prompt_tokens: 입력 토큰 수 (캐시된 토큰 포함)
+        completion_tokens: 출력 토큰 수
+        cached_tokens: 프롬프트 캐시로 재사용된 입력 토큰 수
+        images: 생성한 이미지 수
+
+    Returns:
+        float: 예상 비용 (USD), 가격 정보가 없으면 0
+    """
+    if images:
+        return IMAGE_PRICES.get(model, 0.0) * images
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        return 0.0
+    input_price, cached_price, output_price = prices
+    uncached = max(prompt_tokens - cached_tokens, 0)
+    return (uncached * input_price + cached_tokens * cached_price + completion_tokens * output_price) / 1_000_000
+
+
+def _percentile(values, ratio):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(int(round(ratio * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+class CallTracker:
+    """
+    호출 한 건의 측정값 (MetricsRecorder.track()이 반환)
+
+    with 블록이 끝나면 경과 시간과 오류 여부가 자동으로 기록된다.
+    """
+
+    def __init__(self, recorder, call_type, model):
+        self._recorder = recorder
+        self.call_type = call_type
+        self.model = model
+        self.started_at = time.perf_counter()
+        self.ttft = None
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self.images = 0
+        self.cache_hit = False
+
+    def mark_first_token(self):
+        """첫 토큰 도착 시점 기록 (스트리밍 호출)"""
+        if self.ttft is None:
+            self.ttft = time.perf_counter() - self.started_at
+
+    def set_usage(self, usage):
+        """
+        API 응답의 usage 객체 반영
+
+        Args:
+            usage: OpenAI usage 객체 (prompt_tokens_details.cached_tokens 포함)
+        """
+        if usage is None:
+            return
+        details = getattr(usage, 'prompt_tokens_details', None)
+        self.prompt_tokens = usage.prompt_tokens or 0
+        self.completion_tokens = usage.completion_tokens or 0
+        self.cached_tokens = (getattr(details, 'cached_tokens', None) or 0) if details else 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and issubclass(exc_type, (GeneratorExit, asyncio.CancelledError)):
+            error = "cancelled"
+        else:
+            error = exc_type.__name__ if exc_type else None
+        self._recorder.record(
+            self.call_type,
+            model=self.model,
+            wall_time=time.perf_counter() - self.started_at,
+            ttft=self.ttft,
+            prompt_tokens=self.prompt_tokens,
+            completion_tokens=self.completion_tokens,
+            cached_tokens=self.cached_tokens,
+            images=self.images,
+            retries=self.retries,
+            cache_hit=self.cache_hit,
+            error=error
+        )
+        return False
+
+
+class MetricsRecorder:
+    """
+    호출 종류(persona, objectives, interview, grading, image 등)별 메트릭 집계기
+
+    집계 결과는 summary()로 조회하거나, Prometheus 텍스트 형식(/metrics 엔드포인트)
+    또는 호출 단위 JSONL 파일로 내보낼 수 있다.
+    """
+
+    def __init__(self, jsonl_path=None):
+        """
+        Args:
+            jsonl_path: 호출 기록을 한 줄씩 추가할 JSONL 파일 경로 (None이면 파일 기록 안 함)
+        """
+        self.jsonl_path = jsonl_path
+        self._lock = threading.Lock()
+        self._totals = defaultdict(lambda: defaultdict(float))
+        self._wall_times = defaultdict(lambda: deque(maxlen=_SAMPLE_WINDOW))
+        self._ttfts = defaultdict(lambda: deque(maxlen=_SAMPLE_WINDOW))
+        self._counters = defaultdict(int)
+        self._server = None
+
+    def track(self, call_type, model=None):
+        """
+        호출 측정 시작
+
+        Args:
+            call_type: 호출 종류
+            model: 모델명 (비용 계산용)
+
+        Returns:
+            CallTracker: with 문으로 사용하는 측정 객체
+        """
+        return CallTracker(self, call_type, model)
+
+    def record(self, call_type, model=None, wall_time=0.0, ttft=None, prompt_tokens=0,
+               completion_tokens=0, cached_tokens=0, images=0, retries=0,
+               cache_hit=False, error=None):
+        """
+        호출 한 건 기록
+
+        Args:
+            call_type: 호출 종류
+            model: 모델명
+            wall_time: 전체 소요 시간(초)
+            ttft: 첫 토큰까지 걸린 시간(초), 스트리밍이 아니면 None
+            prompt_tokens: 입력 토큰 수
+            completion_tokens: 출력 토큰 수
+            cached_tokens: 프롬프트 캐시 적중 토큰 수
+            images: 생성한 이미지 수
+            retries: 재시도 횟수
+            cache_hit: 로컬 캐시에서 응답했는지 여부
+            error: 오류 종류 (성공이면 None)
+        """
+        cost = 0.0 if cache_hit else estimate_cost(
+            model, prompt_tokens, completion_tokens, cached_tokens, images
+        )
+        with self._lock:
+            totals = self._totals[call_type]
+            totals['calls'] += 1
+            totals['errors'] += 1 if error else 0
+            totals['retries'] += retries
+            totals['cache_hits'] += 1 if cache_hit else 0
+            totals['wall_time'] += wall_time
+            totals['prompt_tokens'] += prompt_tokens
+            totals['completion_tokens'] += completion_tokens
+            totals['cached_tokens'] += cached_tokens
+            totals['images'] += images
+            totals['cost_usd'] += cost
+            self._wall_times[call_type].append(wall_time)
+            if ttft is not None:
+                totals['ttft'] += ttft
+                totals['ttft_count'] += 1
+                self._ttfts[call_type].append(ttft)
+
+        if self.jsonl_path:
+            event = {
+                'ts': time.time(),
+                'call_type': call_type,
+                'model': model,
+                'wall_time': round(wall_time, 4),
+                'ttft': round(ttft, 4) if ttft is not None else None,
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'cached_tokens': cached_tokens,
+                'images': images,
+                'retries': retries,
+                'cache_hit': cache_hit,
+                'cost_usd': round(cost, 6),
+                'error': error,
+            }
+            line = json.dumps(event, ensure_ascii=False) + "\n"
+            with self._lock, open(self.jsonl_path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    def increment(self, name, value=1):
+        """
+        호출 종류와 무관한 카운터 증가 (예: 프롬프트 압축으로 절약한 토큰 수)
+
+        Args:
+            name: 카운터 이름
+            value: 증가량
+        """
+        with self._lock:
+            self._counters[name] += value
+
+    def summary(self):
+        """
+        호출 종류별 집계 결과
+
+        Returns:
+            dict: {call_type: {calls, errors, retries, wall_time_avg/p50/p95/max,
+                   ttft_avg/p50, prompt_tokens, completion_tokens, cached_tokens, cost_usd, ...}}
+        """
+        with self._lock:
+            result = {}
+            for call_type, totals in self._totals.items():
+                calls = totals['calls']
+                wall_times = list(self._wall_times[call_type])
+                ttfts = list(self._ttfts[call_type])
+                result[call_type] = {
+                    'calls': int(calls),
+                    'errors': int(totals['errors']),
+                    'retries': int(totals['retries']),
+                    'cache_hits': int(totals['cache_hits']),
+                    'wall_time_avg': totals['wall_time'] / calls if calls else 0.0,
+                    'wall_time_p50': _percentile(wall_times, 0.5),
+                    'wall_time_p95': _percentile(wall_times, 0.95),
+                    'wall_time_max': max(wall_times) if wall_times else None,
+                    'ttft_avg': totals['ttft'] / totals['ttft_count'] if totals['ttft_count'] else None,
+                    'ttft_p50': _percentile(ttfts, 0.5),
+                    'prompt_tokens': int(totals['prompt_tokens']),
+                    'completion_tokens': int(totals['completion_tokens']),
+                    'cached_tokens': int(totals['cached_tokens']),
+                    'images': int(totals['images']),
+                    'cost_usd': totals['cost_usd'],
+                }
+            return result
+
+    def counters(self):
+        """호출 종류와 무관한 카운터 조회"""
+        with self._lock:
+            return dict(self._counters)
+
+    def to_prometheus(self):
+        """
+        Prometheus 텍스트 노출 형식으로 변환
+
+        Returns:
+            str: /metrics 응답 본문
+        """
+        with self._lock:
+            snapshot = {call_type: dict(totals) for call_type, totals in self._totals.items()}
+            counters = dict(self._counters)
+
+        metrics = [
+            ('llm_calls_total', 'counter', 'LLM/이미지 호출 수', 'calls'),
+            ('llm_errors_total', 'counter', '실패한 호출 수', 'errors'),
+            ('llm_retries_total', 'counter', '재시도 횟수', 'retries'),
+            ('llm_cache_hits_total', 'counter', '로컬 캐시로 응답한 호출 수', 'cache_hits'),
+            ('llm_prompt_tokens_total', 'counter', '입력 토큰 수', 'prompt_tokens'),
+            ('llm_completion_tokens_total', 'counter', '출력 토큰 수', 'completion_tokens'),
+            ('llm_cached_tokens_total', 'counter', '프롬프트 캐시 적중 토큰 수', 'cached_tokens'),
+            ('llm_images_total', 'counter', '생성한 이미지 수', 'images'),
+            ('llm_cost_usd_total', 'counter', '예상 비용(USD)', 'cost_usd'),
+            ('llm_wall_time_seconds_sum', 'counter', '호출 소요 시간 합계(초)', 'wall_time'),
+            ('llm_ttft_seconds_sum', 'counter', '첫 토큰까지 걸린 시간 합계(초)', 'ttft'),
+            ('llm_ttft_seconds_count', 'counter', '첫 토큰 시간이 측정된 호출 수', 'ttft_count'),
+        ]
+
+        lines = []
+        for name, metric_type, help_text, key in metrics:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for call_type, totals in sorted(snapshot.items()):
+                lines.append(f'{name}{{call_type="{call_type}"}} {totals.get(key, 0):g}')
+
+        for name, value in sorted(counters.items()):
+            metric_name = f"llm_{name}_total"
+            lines.append(f"# TYPE {metric_name} counter")
+            lines.append(f"{metric_name} {value:g}")
+
+        return "\n".join(lines) + "\n"
+
+    def start_http_server(self, port, host="127.0.0.1"):
+        """
+        Prometheus 수집용 /metrics 엔드포인트를 백그라운드 스레드에서 시작 (이미 실행 중이면 무시)
+
+        Args:
+            port: 포트 번호
+            host: 바인딩할 주소 (기본값: 로컬에서만 접근 가능)
+        """
+        if self._server is not None:
+            return
+
+        recorder = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = recorder.to_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
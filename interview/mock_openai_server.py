@@ -0,0 +1,415 @@
+"""
+모의 OpenAI 서버 모듈 - 실제 API 없이 부하 테스트를 하기 위한 OpenAI 호환 로컬 서버
+
+사용 예:
+    python mock_openai_server.py --port 8800 --latency lognormal:0.6:0.5 --tokens-per-sec 80
+    OPENAI_BASE_URL=http://127.0.0.1:8800/v1 OPENAI_API_KEY=mock streamlit run app.py
+
+지원 엔드포인트:
+    POST /v1/chat/completions     (stream 포함, response_format의 JSON 스키마에 맞는 응답 생성)
+    POST /v1/images/generations   (b64_json 이미지)
+    GET  /stats                   (요청 수/429 주입 수)
+"""
+import argparse
+import base64
+import io
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from tokens import count_tokens
+
+# 스트리밍 응답 한 조각의 글자 수
+STREAM_PIECE_CHARS = 8
+
+_UTTERANCE_SENTENCES = [
+    "그 일은 백성들이 글을 몰라 억울한 일을 당하는 것을 보고 시작하게 되었습니다.",
+    "당시 기록을 보면 여러 신하들이 반대했지만 저는 뜻을 굽히지 않았지요.",
+    "소리의 원리를 살펴 글자를 만들었기 때문에 누구나 쉽게 배울 수 있습니다.",
+    "이 부분은 사료마다 설명이 조금씩 달라서 직접 비교해 보는 것이 좋겠습니다.",
+    "그 결과 많은 사람이 자신의 생각을 글로 남길 수 있게 되었습니다.",
+    "학생이라면 이 변화가 오늘날 우리 생활에 어떤 영향을 주었는지 생각해 보세요.",
+]
+_FOLLOWUPS = [
+    "그때 반대한 사람들은 어떤 이유를 들었나요?",
+    "글자를 만드는 데 얼마나 오래 걸렸나요?",
+    "이 일이 백성들의 생활을 어떻게 바꾸었나요?",
+    "다른 나라의 문자와 비교하면 어떤 점이 다른가요?",
+]
+_FILLER = "관련 사료와 교과서 내용을 바탕으로 정리한 설명입니다."
+
+
+def parse_latency(spec):
+    """
+    지연 시간 분포 문자열 해석
+
+    Args:
+        spec: "fixed:초", "uniform:최소:최대", "lognormal:중앙값:sigma" 중 하나
+
+    Returns:
+        LatencyModel: 지연 시간 분포
+    """
+    kind, _, params = spec.partition(":")
+    values = [float(value) for value in params.split(":") if value]
+    expected = {'fixed': 1, 'uniform': 2, 'lognormal': 2}
+    if kind not in expected or len(values) != expected[kind]:
+        raise ValueError(f"지연 시간 형식이 잘못되었습니다: {spec}")
+    return LatencyModel(kind, *values)
+
+
+class LatencyModel:
+    """첫 토큰까지의 지연 시간 분포 (fixed / uniform / lognormal)"""
+
+    def __init__(self, kind="lognormal", a=0.6, b=0.5):
+        """
+        Args:
+            kind: 분포 종류
+            a: fixed는 지연 시간(초), uniform은 최솟값, lognormal은 중앙값(초)
+            b: uniform은 최댓값, lognormal은 sigma (fixed는 사용 안 함)
+        """
+        self.kind = kind
+        self.a = a
+        self.b = b
+
+    def sample(self, rng):
+        if self.kind == 'fixed':
+            return self.a
+        if self.kind == 'uniform':
+            return rng.uniform(self.a, self.b)
+        return self.a * rng.lognormvariate(0.0, self.b)
+
+    def __repr__(self):
+        return f"{self.kind}:{self.a}:{self.b}"
+
+
+def sample_from_schema(schema, rng, field="", index=0):
+    """
+    JSON 스키마에 맞는 그럴듯한 값 생성 (prompts.py의 출력 스키마용)
+
+    필드 이름에 따라 한국어 문장을 채우고, 목록 항목의 이름/제목은 번호를 붙여 겹치지 않게 한다.
+
+    Args:
+        schema: JSON 스키마 (dict)
+        rng: random.Random
+        field: 현재 필드 이름
+        index: 목록 안에서의 순서
+
+    Returns:
+        스키마에 맞는 값
+    """
+    schema_type = schema.get('type')
+    enum = schema.get('enum')
+    if enum:
+        return rng.choice(enum)
+    if schema_type == 'object':
+        return {
+            key: sample_from_schema(prop_schema, rng, key, index)
+            for key, prop_schema in schema.get('properties', {}).items()
+        }
+    if schema_type == 'array':
+        count = 3 if schema.get('items', {}).get('type') == 'object' else 2
+        if field == 'suggested_followups':
+            return rng.sample(_FOLLOWUPS, 2)
+        return [sample_from_schema(schema.get('items', {}), rng, field, i) for i in range(count)]
+    if schema_type == 'string':
+        if field == 'utterance':
+            return " ".join(rng.sample(_UTTERANCE_SENTENCES, rng.randint(2, 4)))
+        if field in ('display_name', 'title', 'objective_title'):
+            return f"{field} {index + 1}"
+        if field == 'persona':
+            return "페르소나"
+        return _FILLER
+    if schema_type == 'integer':
+        return rng.randint(0, 3)
+    if schema_type == 'number':
+        return round(rng.uniform(0, 3), 2)
+    if schema_type == 'boolean':
+        return rng.random() < 0.7
+    return None
+
+
+def _placeholder_png(size=64):
+    """이미지 생성 응답용 단색 PNG"""
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (size, size), (180, 160, 130)).save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+class _ThreadingServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # 한 반 학생이 동시에 연결해도 접속 대기열이 넘치지 않게 한다
+    request_queue_size = 512
+
+
+class MockOpenAIServer:
+    """
+    OpenAI 호환 모의 서버 (스레드 기반)
+
+    요청마다 지연 시간 분포에서 첫 토큰 지연을 뽑고, 출력 토큰 수를 tokens_per_sec로 나눈 만큼
+    생성 시간을 더해 응답한다. rate_limit_rate 확률로 429 응답(Retry-After 포함)을 돌려준다.
+    응답 내용은 seed와 요청 본문으로 정해지므로 같은 요청에는 항상 같은 응답을 돌려준다.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=None, tokens_per_sec=80.0,
+                 rate_limit_rate=0.0, retry_after=1.0, image_latency=None, seed=None):
+        """
+        Args:
+            host: 바인드 주소
+            port: 포트 (0이면 빈 포트 자동 선택)
+            latency: 첫 토큰 지연 분포 (LatencyModel), None이면 lognormal:0.6:0.5
+            tokens_per_sec: 출력 토큰 생성 속도 (0이면 생성 시간 없음)
+            rate_limit_rate: 429 응답을 돌려줄 확률 (0~1)
+            retry_after: 429 응답의 Retry-After 값(초)
+            image_latency: 이미지 생성 지연 분포, None이면 fixed:2
+            seed: 난수 시드 (지연 시간/429 주입 재현, 응답 내용 변경용)
+        """
+        self.latency = latency or LatencyModel()
+        self.tokens_per_sec = tokens_per_sec
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.image_latency = image_latency or LatencyModel('fixed', 2.0)
+        self.seed = seed
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._stats = Counter()
+        self._stats_lock = threading.Lock()
+        self._image_b64 = None
+        self._thread = None
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                if self.path.rstrip("/") == "/stats":
+                    self._send_json(200, server.stats())
+                else:
+                    self._send_json(404, {"error": {"message": "not found"}})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                except json.JSONDecodeError:
+                    self._send_json(400, {"error": {"message": "invalid JSON body"}})
+                    return
+                path = self.path.rstrip("/")
+                if path.endswith("/chat/completions"):
+                    server._handle_chat(self, body)
+                elif path.endswith("/images/generations"):
+                    server._handle_image(self, body)
+                else:
+                    self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+
+            def _send_json(self, status, payload, headers=None):
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = _ThreadingServer((host, port), Handler)
+
+    @property
+    def base_url(self):
+        """OPENAI_BASE_URL로 쓸 주소"""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        """백그라운드 스레드에서 서버 시작"""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """현재 스레드에서 서버 실행 (CLI)"""
+        self._httpd.serve_forever()
+
+    def stop(self):
+        """서버 중지"""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def stats(self):
+        """
+        요청 통계
+
+        Returns:
+            dict: {요청 종류: 수} (chat, chat_stream, image, rate_limited, 응답 스키마 이름별 수)
+        """
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def _count(self, *names):
+        with self._stats_lock:
+            for name in names:
+                self._stats[name] += 1
+
+    def _random(self, func):
+        """공용 난수 생성기로 func(rng) 실행 (요청 스레드끼리 잠금)"""
+        with self._rng_lock:
+            return func(self._rng)
+
+    def _maybe_rate_limit(self, handler):
+        """rate_limit_rate 확률로 429 응답 (응답했으면 True)"""
+        if self.rate_limit_rate <= 0 or self._random(lambda rng: rng.random()) >= self.rate_limit_rate:
+            return False
+        self._count("rate_limited")
+        handler._send_json(429, {
+            "error": {"message": "Rate limit reached (mock)", "type": "requests", "code": "rate_limit_exceeded"}
+        }, headers={"Retry-After": str(self.retry_after)})
+        return True
+
+    def _handle_chat(self, handler, body):
+        if self._maybe_rate_limit(handler):
+            return
+
+        # 응답 내용은 요청에 따라 정해지도록(같은 요청이면 같은 응답) 요청 해시로 난수를 만든다
+        content_rng = random.Random(f"{self.seed}:{json.dumps(body, ensure_ascii=False, sort_keys=True)}")
+        response_format = body.get("response_format") or {}
+        if response_format.get("type") == "json_schema":
+            json_schema = response_format.get("json_schema", {})
+            schema_name = json_schema.get("name", "response")
+            content = json.dumps(
+                sample_from_schema(json_schema.get("schema", {}), content_rng), ensure_ascii=False
+            )
+        else:
+            schema_name = "text"
+            content = " ".join(content_rng.sample(_UTTERANCE_SENTENCES, 3))
+
+        prompt_tokens = sum(count_tokens(str(message.get("content", ""))) for message in body.get("messages", []))
+        completion_tokens = count_tokens(content)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": 0}
+        }
+        ttft = self._random(self.latency.sample)
+        generation_time = completion_tokens / self.tokens_per_sec if self.tokens_per_sec > 0 else 0.0
+        completion_id = f"chatcmpl-mock-{uuid.uuid4().hex[:12]}"
+        model = body.get("model", "mock")
+        created = int(time.time())
+
+        if body.get("stream"):
+            self._count("chat_stream", schema_name)
+            self._stream_chat(handler, content, usage, ttft, generation_time, completion_id, model, created)
+            return
+
+        self._count("chat", schema_name)
+        time.sleep(ttft + generation_time)
+        handler._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": usage
+        })
+
+    def _stream_chat(self, handler, content, usage, ttft, generation_time, completion_id, model, created):
+        """SSE 스트리밍 응답 (chunked 전송, 조각 사이에 생성 시간을 나눠 대기)"""
+        pieces = [content[i:i + STREAM_PIECE_CHARS] for i in range(0, len(content), STREAM_PIECE_CHARS)]
+        delay = generation_time / len(pieces) if pieces else 0.0
+
+        def chunk(choices, extra=None):
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": choices
+            }
+            payload.update(extra or {})
+            return "data: " + json.dumps(payload, ensure_ascii=False) + "\n\n"
+
+        def write(text):
+            data = text.encode("utf-8")
+            handler.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            handler.wfile.flush()
+
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+        time.sleep(ttft)
+        try:
+            for piece in pieces:
+                write(chunk([{"index": 0, "delta": {"content": piece}, "finish_reason": None}]))
+                time.sleep(delay)
+            write(chunk([{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+            write(chunk([], {"usage": usage}))
+            write("data: [DONE]\n\n")
+            handler.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # 클라이언트가 스트림을 중간에 닫은 경우 (질문 취소 등)
+            handler.close_connection = True
+
+    def _handle_image(self, handler, body):
+        if self._maybe_rate_limit(handler):
+            return
+        self._count("image")
+        time.sleep(self._random(self.image_latency.sample))
+        if self._image_b64 is None:
+            self._image_b64 = _placeholder_png()
+        handler._send_json(200, {
+            "created": int(time.time()),
+            "data": [{"b64_json": self._image_b64, "revised_prompt": body.get("prompt", "")}]
+        })
+
+
+def main(argv=None):
+    """모의 서버 CLI"""
+    parser = argparse.ArgumentParser(description="OpenAI 호환 모의 서버 (부하 테스트용)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--latency", default="lognormal:0.6:0.5",
+                        help="첫 토큰 지연 분포 (fixed:초 | uniform:최소:최대 | lognormal:중앙값:sigma)")
+    parser.add_argument("--tokens-per-sec", type=float, default=80.0, help="출력 토큰 생성 속도")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="429 응답 확률 (0~1)")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="429 응답의 Retry-After(초)")
+    parser.add_argument("--image-latency", default="fixed:2", help="이미지 생성 지연 분포")
+    parser.add_argument("--seed", type=int, help="난수 시드")
+    args = parser.parse_args(argv)
+
+    server = MockOpenAIServer(
+        host=args.host,
+        port=args.port,
+        latency=parse_latency(args.latency),
+        tokens_per_sec=args.tokens_per_sec,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        image_latency=parse_latency(args.image_latency),
+        seed=args.seed
+    )
+    print(f"모의 OpenAI 서버: {server.base_url}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
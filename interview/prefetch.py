@@ -0,0 +1,135 @@
+"""
+추가 질문 미리 생성 모듈 - 페르소나가 제안한 추가 질문의 답을 백그라운드에서 미리 만들어 둠
+"""
+import re
+import threading
+import unicodedata
+
+_NON_WORD = re.compile(r'[^\w]+')
+
+
+def normalize_question(text):
+    """
+    질문 비교용 정규화 (유니코드 정규화, 소문자, 공백/문장부호 제거)
+
+    "왜 한글을 만드셨나요?"와 "왜 한글을 만드셨나요"처럼 표기만 다른 질문을 같은 키로 본다.
+    """
+    text = unicodedata.normalize('NFKC', text or "").lower()
+    return _NON_WORD.sub('', text)
+
+
+class FollowupPrefetcher:
+    """
+    세션별 추가 질문 답변 미리 생성기
+
+    페르소나 응답이 표시된 뒤 suggested_followups 중 앞쪽 질문들의 답을 낮은 우선순위로 미리 생성하고,
+    학생이 그 질문을 하면 바로 보여준다. 학생이 다른 질문을 하면 남은 생성은 취소한다.
+    세션당 미리 생성 횟수(budget)를 넘으면 더 이상 생성하지 않는다.
+    """
+
+    def __init__(self, service, max_followups=2, budget=20):
+        """
+        Args:
+            service: LLMService 인스턴스
+            max_followups: 응답 하나당 미리 생성할 추가 질문 수 (0이면 사용 안 함)
+            budget: 세션 전체에서 미리 생성할 수 있는 최대 횟수
+        """
+        self.service = service
+        self.max_followups = max_followups
+        self.budget = budget
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+        self.cancelled = 0
+        self._pending = {}  # {(persona_name, normalized_question): concurrent Future}
+        self._lock = threading.Lock()
+
+    def start(self, persona_name, followups, retrieve=None, **interview_kwargs):
+        """
+        추가 질문 답변 미리 생성 시작 (이전에 미리 생성 중이던 작업은 취소)
+
+        Args:
+            persona_name: 페르소나 이름
+            followups: 제안된 추가 질문 리스트
+            retrieve: 질문별 참고 자료 구절을 찾는 함수 (question) -> str (선택)
+            **interview_kwargs: agenerate_interview_response에 넘길 나머지 인자
+                (persona_card, learning_objectives, chat_history, reading_level, system_prompt 등)
+        """
+        self.cancel()
+        if self.max_followups <= 0 or not followups:
+            return
+        # 요청 대기열에 실제 요청이 쌓여 있으면 미리 생성하지 않는다
+        if any(queue['waiting'] for queue in self.service.scheduler.stats().values()):
+            return
+
+        with self._lock:
+            for question in followups[:self.max_followups]:
+                key = (persona_name, normalize_question(question))
+                if not key[1] or key in self._pending or self.used >= self.budget:
+                    continue
+                self.used += 1
+                self._pending[key] = self.service._runner.submit(
+                    self.service.agenerate_interview_response(
+                        student_question=question,
+                        call_type="prefetch",
+                        passages=retrieve(question) if retrieve else "",
+                        **interview_kwargs
+                    )
+                )
+
+    def take(self, persona_name, question, timeout=60):
+        """
+        미리 생성한 답변 꺼내기 (없으면 None, 나머지 미리 생성 작업은 취소)
+
+        아직 생성 중이면 새로 요청하는 것보다 빠르므로 끝날 때까지 기다린다.
+
+        Args:
+            persona_name: 페르소나 이름
+            question: 학생 질문
+            timeout: 생성 중인 답변을 기다릴 최대 시간(초)
+
+        Returns:
+            dict: 인터뷰 응답 (utterance, suggested_followups 등) 또는 None
+        """
+        with self._lock:
+            future = self._pending.pop((persona_name, normalize_question(question)), None)
+        self.cancel()
+
+        if future is None:
+            self.misses += 1
+            return None
+        try:
+            response = future.result(timeout)
+        except Exception:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.service.metrics.increment('prefetch_hits')
+        return response
+
+    def cancel(self):
+        """진행 중인 미리 생성 작업 모두 취소"""
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+        for future in pending:
+            if future.cancel():
+                self.cancelled += 1
+
+    def stats(self):
+        """
+        미리 생성 통계
+
+        Returns:
+            dict: used, budget, hits, misses, cancelled, pending
+        """
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            'used': self.used,
+            'budget': self.budget,
+            'hits': self.hits,
+            'misses': self.misses,
+            'cancelled': self.cancelled,
+            'pending': pending
+        }
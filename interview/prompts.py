@@ -81,6 +81,49 @@ S4(60): 후대 전문가·분석가·교육자·현대 학생(보조)
 """
 
 
+# JSON 모드(structured output)용 스키마 - 위 [OUTPUT JSON SCHEMA] 블록과 동일한 구조를 유지할 것
+_STRING = {"type": "string"}
+_STRING_LIST = {"type": "array", "items": _STRING}
+RUBRIC_CRITERIA = ["정확성", "근거인용", "질문심층", "구조·표현", "성찰"]
+
+
+def _object_schema(properties):
+    """모든 필드가 필수이고 추가 필드를 허용하지 않는 object 스키마 (strict 모드 요구사항)"""
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False
+    }
+
+
+PERSONA_OUTPUT_SCHEMA = _object_schema({
+    "status": {"type": "string", "enum": ["ok", "fallback"]},
+    "personae": {
+        "type": "array",
+        "items": _object_schema({
+            "display_name": _STRING,
+            "description": _STRING,
+            "role": _STRING,
+            "time_place": _STRING,
+            "speaking_style": _STRING,
+            "bias_risks": _STRING_LIST,
+            "interview_dos": _STRING_LIST,
+            "interview_donts": _STRING_LIST,
+            "rag_hints": _object_schema({
+                "keywords": _STRING_LIST,
+                "primary_sources": _STRING_LIST,
+                "secondary_sources": _STRING_LIST
+            }),
+            "reading_level": {"type": "string", "enum": ["중등", "초등고", "고등", "대학초"]},
+            "safety_notes": _STRING
+        })
+    },
+    "fallback": _object_schema({
+        "type": {"type": "string", "enum": ["expert_panel", "textbook_explainer", "timeline_navigator"]},
+        "reason": _STRING
+    })
+})
 
 
 LEARNING_OBJECTIVES_PROMPT = """[SYSTEM]
@@ -126,8 +169,31 @@ LEARNING_OBJECTIVES_PROMPT = """[SYSTEM]
 반드시 valid JSON만 출력하라."""
 
 
-INTERVIEW_RESPONSE_PROMPT = """[SYSTEM]
-너는 지정된 페르소나로서 학생의 질문에 답하는 "인터뷰 응답기"다.
+OBJECTIVES_OUTPUT_SCHEMA = _object_schema({
+    "objectives": {
+        "type": "array",
+        "items": _object_schema({
+            "title": _STRING,
+            "level": {"type": "string", "enum": ["기초", "확장", "도전"]},
+            "bloom": {
+                "type": "string",
+                "enum": ["Understand", "Remember", "Apply", "Analyze", "Evaluate", "Create"]
+            },
+            "objective": _STRING,
+            "success_criteria": _STRING_LIST,
+            "required_evidence": _STRING_LIST,
+            "guide_question": _STRING,
+            "rubric_links": {"type": "array", "items": {"type": "string", "enum": RUBRIC_CRITERIA}}
+        })
+    },
+    "notes": _STRING
+})
+
+
+# 인터뷰/채점 프롬프트는 system/user 메시지 쌍으로 구성한다.
+# 제공자 측 프롬프트 캐시(prefix caching)가 적용되도록 고정 지시문 → 스키마 → 페르소나 카드 → 학습 목표
+# 순서로 세션 동안 바뀌지 않는 내용을 system 메시지 앞쪽에 두고, 매 턴 바뀌는 내용은 user 메시지에만 둔다.
+INTERVIEW_SYSTEM_PROMPT = """너는 지정된 페르소나로서 학생의 질문에 답하는 "인터뷰 응답기"다.
 
 핵심 원칙:
 - **페르소나 카드의 speaking_style을 100% 준수한다.** 이것이 최우선 규칙이다.
@@ -137,20 +203,9 @@ INTERVIEW_RESPONSE_PROMPT = """[SYSTEM]
 - **페르소나가 알 수 없거나 경험하지 않은 내용은 솔직하게 "모른다" 또는 "경험하지 못했다"고 답한다.**
 - 과제의 "정답 완성" 대신, 학생이 스스로 답안을 구성하도록 **힌트/추가 질문**을 제시한다.
 - 학습 목표를 참고하여 학생의 학습을 유도하되, 직접 답을 주지 않는다.
+- **참고 자료가 주어지면 그 내용을 우선 근거로 삼고, 자료와 어긋나는 사실을 지어내지 않는다.**
 - 출력은 반드시 valid JSON.
 
-[USER]
-페르소나 카드:
-{persona_card_json}
-
-학습 목표 (참고용 - 학생 학습 유도):
-{learning_objectives}
-
-학생 질문: {student_question}
-대화 히스토리(있다면): {chat_history}
-읽기 난이도: {reading_level}
-금지 요소: {disallowed}
-
 요구사항:
 - **페르소나 카드의 speaking_style을 반드시 따라야 한다.** 이게 가장 중요하다.
   예: "격식 존댓말"이면 "~습니다/~니다" 사용, "친근한 반말"이면 "~야/~거야" 사용
@@ -172,25 +227,38 @@ INTERVIEW_RESPONSE_PROMPT = """[SYSTEM]
   ]
 }}
 
-반드시 valid JSON만 출력하라."""
+반드시 valid JSON만 출력하라.
+
+페르소나 카드:
+{persona_card_json}
+
+학습 목표 (참고용 - 학생 학습 유도):
+{learning_objectives}
+
+읽기 난이도: {reading_level}
+금지 요소: {disallowed}"""
+
+
+INTERVIEW_USER_PROMPT = """참고 자료(있다면): {passages}
+
+대화 히스토리(있다면): {chat_history}
+
+학생 질문: {student_question}"""
 
 
-GRADING_PROMPT = """[SYSTEM]
-너는 형성평가용 루브릭 채점기다. 기준별 0–3점(4수준)으로 평가하고, **행동지시형 피드백**을 제공한다.
+INTERVIEW_OUTPUT_SCHEMA = _object_schema({
+    "persona": _STRING,
+    "utterance": _STRING,
+    "suggested_followups": _STRING_LIST
+})
+
+
+GRADING_SYSTEM_PROMPT = """너는 형성평가용 루브릭 채점기다. 기준별 0–3점(4수준)으로 평가하고, **행동지시형 피드백**을 제공한다.
 주의:
 - 학생의 아이디어를 존중하고, 모호한 경우 낮게 단정하지 말고 "어떻게 보완해야 하는지"를 구체적으로 제안한다.
 - 출처·사실검증·표절 의심은 신중히, 근거 제시를 요구하는 형태로 안내한다.
 - 출력은 반드시 valid JSON. 채점 근거는 **간결한 이유**로 제시(내부 추론 장문 공개 금지).
 
-[USER]
-학습목표 3개:
-{objectives_json}
-
-학생 최종 답안: {student_answer}
-인터뷰 로그 요약(선택): {interview_summary}
-교사 가중치(선택): {weights}
-표절/AI 작성 의심 규칙(선택): {originality_rules}
-
 평가기준 정의(기본 5개):
 - 정확성: 사실·개념의 타당성
 - 근거인용: 출처 명시, 인용·요약 구분, 관련성
@@ -227,7 +295,61 @@ GRADING_PROMPT = """[SYSTEM]
   "flags": ["표절의심(근거 요청)", "사실확인 필요", "출처 불충분"]
 }}
 
-반드시 valid JSON만 출력하라."""
+반드시 valid JSON만 출력하라.
+
+학습목표:
+{objectives_json}
+
+교사 가중치(선택): {weights}
+표절/AI 작성 의심 규칙(선택): {originality_rules}"""
+
+
+GRADING_USER_PROMPT = """인터뷰 로그 요약(선택): {interview_summary}
+
+학생 최종 답안: {student_answer}"""
+
+
+GRADING_OUTPUT_SCHEMA = _object_schema({
+    "scores": {
+        "type": "array",
+        "items": _object_schema({
+            "criterion": {"type": "string", "enum": RUBRIC_CRITERIA},
+            "level": {"type": "integer", "enum": [0, 1, 2, 3]},
+            "reason": _STRING,
+            "fix": _STRING
+        })
+    },
+    "objective_alignment": {
+        "type": "array",
+        "items": _object_schema({
+            "objective_title": _STRING,
+            "met": {"type": "boolean"},
+            "evidence_spans": _STRING_LIST,
+            "gap": _STRING
+        })
+    },
+    "weighted_total": _object_schema({
+        "raw": {"type": "number"},
+        "weighted": {"type": "number"},
+        "band": {"type": "string", "enum": ["미달", "기본", "충족", "우수"]}
+    }),
+    "next_steps": _STRING_LIST,
+    "flags": _STRING_LIST
+})
+
+
+CONVERSATION_SUMMARY_PROMPT = """[SYSTEM]
+너는 학생-페르소나 인터뷰 기록을 압축하는 요약기다.
+- 기존 요약에 새 대화를 합쳐 하나의 요약으로 갱신한다.
+- 학생이 이미 물어본 질문, 페르소나가 제시한 핵심 사실·근거·출처, 아직 답하지 않은 질문을 보존한다.
+- 인사말, 반복 표현, 말투 묘사는 생략한다.
+- {max_chars}자 이내의 평문으로만 출력한다(JSON/목록 기호 금지).
+
+[USER]
+기존 요약: {previous_summary}
+
+새 대화:
+{new_turns}"""
 
 
 def format_persona_prompt(topic, subject, grade_level, scope="", disallowed="없음",
@@ -259,26 +381,72 @@ def format_objectives_prompt(topic, subject, grade_level, duration_and_scope="45
     )
 
 
-def format_interview_prompt(persona_card_json, student_question, learning_objectives="",
-                            chat_history="", reading_level="중등", disallowed="없음"):
-    """인터뷰 응답 프롬프트 포맷"""
-    return INTERVIEW_RESPONSE_PROMPT.format(
+def format_interview_objectives(learning_objectives):
+    """인터뷰 프롬프트용 학습 목표 텍스트 ("- 제목: 안내 질문" 목록)"""
+    if not learning_objectives or not learning_objectives.get('objectives'):
+        return ""
+    return "\n".join(
+        f"- {obj['title']}: {obj['guide_question']}"
+        for obj in learning_objectives['objectives']
+    )
+
+
+def format_interview_system_prompt(persona_card_json, learning_objectives="",
+                                   reading_level="중등", disallowed="없음"):
+    """인터뷰 system 메시지 포맷 (고정 지시문+페르소나, 세션 동안 바뀌지 않음)"""
+    return INTERVIEW_SYSTEM_PROMPT.format(
         persona_card_json=persona_card_json,
         learning_objectives=learning_objectives or "없음",
-        student_question=student_question,
-        chat_history=chat_history or "없음",
         reading_level=reading_level,
         disallowed=disallowed
     )
 
 
-def format_grading_prompt(objectives_json, student_answer, interview_summary="",
-                         weights="", originality_rules=""):
-    """채점 프롬프트 포맷"""
-    return GRADING_PROMPT.format(
-        objectives_json=objectives_json,
-        student_answer=student_answer,
-        interview_summary=interview_summary or "없음",
-        weights=weights or "없음",
-        originality_rules=originality_rules or "없음"
+def format_interview_user_prompt(student_question, chat_history="", passages=""):
+    """인터뷰 user 메시지 포맷 (턴별 검색 자료+대화 히스토리+질문)"""
+    return INTERVIEW_USER_PROMPT.format(
+        passages=passages or "없음",
+        chat_history=chat_history or "없음",
+        student_question=student_question
+    )
+
+
+def format_interview_messages(persona_card_json, student_question, learning_objectives="",
+                              chat_history="", reading_level="중등", disallowed="없음", passages="",
+                              system_prompt=None):
+    """인터뷰 응답 메시지 포맷 (system: 고정 지시문+페르소나, user: 턴별 질문, system_prompt: 미리 만든 system 메시지)"""
+    if system_prompt is None:
+        system_prompt = format_interview_system_prompt(
+            persona_card_json, learning_objectives, reading_level, disallowed
+        )
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": format_interview_user_prompt(
+            student_question, chat_history, passages
+        )}
+    ]
+
+
+def format_grading_messages(objectives_json, student_answer, interview_summary="",
+                            weights="", originality_rules=""):
+    """채점 메시지 포맷 (system: 고정 지시문+학습목표, user: 학생별 답안)"""
+    return [
+        {"role": "system", "content": GRADING_SYSTEM_PROMPT.format(
+            objectives_json=objectives_json,
+            weights=weights or "없음",
+            originality_rules=originality_rules or "없음"
+        )},
+        {"role": "user", "content": GRADING_USER_PROMPT.format(
+            interview_summary=interview_summary or "없음",
+            student_answer=student_answer
+        )}
+    ]
+
+
+def format_summary_prompt(previous_summary, new_turns, max_chars=400):
+    """대화 요약 프롬프트 포맷"""
+    return CONVERSATION_SUMMARY_PROMPT.format(
+        previous_summary=previous_summary or "없음",
+        new_turns=new_turns,
+        max_chars=max_chars
     )
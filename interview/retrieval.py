@@ -0,0 +1,339 @@
+"""
+자료 검색 모듈 - 선생님이 올린 자료를 잘게 나눠 BM25 색인으로 저장하고, 인터뷰 질문에 맞는 구절만 찾아 줌
+"""
+import heapq
+import json
+import math
+import os
+import re
+import shutil
+import tempfile
+import threading
+import unicodedata
+from collections import Counter, OrderedDict, defaultdict
+
+# 색인 파일 형식 버전 (토큰화 방식이 바뀌면 올려서 기존 색인을 다시 만들게 함)
+INDEX_FORMAT_VERSION = 1
+
+_WORD = re.compile(r'\w+')
+_HANGUL = re.compile(r'[가-힣]')
+_SENTENCE_END = re.compile(r'(?<=[.!?。])\s+|\n\s*\n')
+_COLLECTION_ID_PATTERN = re.compile(r'^[0-9a-f]{8,32}$')
+
+
+def tokenize(text):
+    """
+    검색용 토큰 분리
+
+    한국어는 형태소 분석기 없이 조사/어미가 붙은 단어도 맞출 수 있도록 단어를 글자 2-gram으로 나누고
+    ("한글을" → "한글", "글을"), 그 밖의 단어(영문/숫자)는 단어 그대로 쓴다.
+
+    Args:
+        text: 원문
+
+    Returns:
+        list: 토큰 리스트
+    """
+    text = unicodedata.normalize('NFKC', text or "").lower()
+    tokens = []
+    for word in _WORD.findall(text):
+        if _HANGUL.search(word) and len(word) > 1:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word)
+    return tokens
+
+
+def chunk_text(text, max_chars=400, overlap=80):
+    """
+    자료를 검색 단위 구절로 분할 (문장 경계 기준, 앞 구절 끝부분을 겹쳐 문맥 유지)
+
+    Args:
+        text: 자료 원문
+        max_chars: 구절 최대 글자 수
+        overlap: 앞 구절과 겹칠 글자 수
+
+    Returns:
+        list: 구절 문자열 리스트
+    """
+    sentences = [s.strip() for s in _SENTENCE_END.split(text or "") if s and s.strip()]
+    chunks = []
+    current = ""
+    for sentence in sentences:
+        # 한 문장이 너무 길면 글자 수로 자른다
+        while len(sentence) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(sentence[:max_chars])
+            sentence = sentence[max_chars - overlap:]
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            chunks.append(current)
+            tail = current[-overlap:] if overlap else ""
+            current = f"{tail} {sentence}".strip() if len(tail) + len(sentence) < max_chars else sentence
+        else:
+            current = f"{current} {sentence}".strip()
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class BM25Index:
+    """
+    구절 BM25 색인 (메모리)
+
+    구절별 토큰 빈도와 토큰 → 구절 역색인을 유지하므로 검색은 질문 토큰이 들어 있는 구절만 계산한다.
+    """
+
+    def __init__(self, k1=1.2, b=0.75):
+        """
+        Args:
+            k1: 토큰 빈도 포화 계수
+            b: 구절 길이 정규화 계수
+        """
+        self.k1 = k1
+        self.b = b
+        self.chunks = []  # [{'source', 'text', 'length', 'terms'}]
+        self.postings = defaultdict(list)  # {token: [(chunk_idx, tf)]}
+        self.total_length = 0
+
+    def add(self, source, text, term_counts=None):
+        """
+        구절 추가
+
+        Args:
+            source: 자료 이름
+            text: 구절 텍스트
+            term_counts: 미리 계산한 토큰 빈도 (색인 파일에서 불러올 때), None이면 계산
+        """
+        if term_counts is None:
+            term_counts = Counter(tokenize(text))
+        chunk_idx = len(self.chunks)
+        length = sum(term_counts.values())
+        self.chunks.append({'source': source, 'text': text, 'length': length, 'terms': dict(term_counts)})
+        for token, tf in term_counts.items():
+            self.postings[token].append((chunk_idx, tf))
+        self.total_length += length
+
+    def search(self, query, k=3, boost_terms=None, boost_weight=0.3):
+        """
+        질문과 가장 관련 있는 구절 검색
+
+        Args:
+            query: 질문
+            k: 돌려줄 최대 구절 수
+            boost_terms: 함께 찾을 보조 검색어 (예: 페르소나 rag_hints 키워드)
+            boost_weight: 보조 검색어 가중치 (질문 토큰은 1)
+
+        Returns:
+            list: [{'source', 'text', 'score'}] (점수 높은 순)
+        """
+        if not self.chunks or k <= 0:
+            return []
+
+        weights = Counter()
+        for token in tokenize(query):
+            weights[token] = 1.0
+        for token in tokenize(" ".join(boost_terms or [])):
+            weights[token] = max(weights[token], boost_weight)
+
+        n = len(self.chunks)
+        avg_length = self.total_length / n if n else 0.0
+        scores = defaultdict(float)
+        for token, weight in weights.items():
+            posting = self.postings.get(token)
+            if not posting:
+                continue
+            idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+            for chunk_idx, tf in posting:
+                length = self.chunks[chunk_idx]['length']
+                norm = self.k1 * (1 - self.b + self.b * length / avg_length) if avg_length else self.k1
+                scores[chunk_idx] += weight * idf * tf * (self.k1 + 1) / (tf + norm)
+
+        top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [
+            {'source': self.chunks[idx]['source'], 'text': self.chunks[idx]['text'], 'score': score}
+            for idx, score in top if score > 0
+        ]
+
+    def sources(self):
+        """
+        색인된 자료 목록
+
+        Returns:
+            dict: {자료 이름: 구절 수}
+        """
+        return dict(Counter(chunk['source'] for chunk in self.chunks))
+
+
+class SourceIndexStore:
+    """
+    자료 색인 저장소
+
+    디렉터리 구조:
+        {root}/{collection_id}/index.json    구절 원문과 구절별 토큰 빈도
+
+    collection_id는 선생님 세션 ID(배포 전) 또는 수업 ID(배포 후)다.
+    색인은 한 번 불러오면 프로세스 안에서 재사용하므로(LRU) 검색마다 파일을 읽지 않는다.
+    """
+
+    def __init__(self, root_dir=None, max_loaded=32, chunk_chars=400, chunk_overlap=80):
+        """
+        Args:
+            root_dir: 저장 디렉터리, None이면 SOURCE_INDEX_DIR 환경변수 또는 "source_index"
+            max_loaded: 메모리에 올려 둘 최대 색인 수
+            chunk_chars: 구절 최대 글자 수
+            chunk_overlap: 앞 구절과 겹칠 글자 수
+        """
+        self.root_dir = root_dir or os.getenv("SOURCE_INDEX_DIR", "source_index")
+        self.max_loaded = max_loaded
+        self.chunk_chars = chunk_chars
+        self.chunk_overlap = chunk_overlap
+        self._loaded = OrderedDict()  # {collection_id: BM25Index}
+        self._lock = threading.Lock()
+        os.makedirs(self.root_dir, exist_ok=True)
+
+    def add_source(self, collection_id, source, text):
+        """
+        자료 추가 (같은 이름의 자료가 있으면 교체)
+
+        Args:
+            collection_id: 색인 ID
+            source: 자료 이름 (파일 이름 등)
+            text: 자료 원문
+
+        Returns:
+            int: 추가된 구절 수
+        """
+        chunks = chunk_text(text, self.chunk_chars, self.chunk_overlap)
+        with self._lock:
+            index = self._get(collection_id)
+            rebuilt = BM25Index(index.k1, index.b)
+            for chunk in index.chunks:
+                if chunk['source'] != source:
+                    rebuilt.add(chunk['source'], chunk['text'], chunk['terms'])
+            for chunk in chunks:
+                rebuilt.add(source, chunk)
+            self._save(collection_id, rebuilt)
+            self._remember(collection_id, rebuilt)
+        return len(chunks)
+
+    def copy_collection(self, source_id, target_id):
+        """
+        색인 복사 (수업 패키지를 배포할 때 선생님 세션의 자료를 수업으로 옮김)
+
+        Returns:
+            bool: 복사할 색인이 있었는지 여부
+        """
+        source_dir = self._collection_dir(source_id)
+        if source_dir is None or not os.path.exists(os.path.join(source_dir, "index.json")):
+            return False
+        target_dir = self._collection_dir(target_id)
+        if target_dir is None:
+            raise ValueError(f"잘못된 색인 ID입니다: {target_id}")
+        shutil.copytree(source_dir, target_dir, dirs_exist_ok=True)
+        with self._lock:
+            self._loaded.pop(target_id, None)
+        return True
+
+    def search(self, collection_id, query, k=3, boost_terms=None):
+        """
+        색인에서 질문과 관련 있는 구절 검색
+
+        Args:
+            collection_id: 색인 ID
+            query: 질문
+            k: 돌려줄 최대 구절 수
+            boost_terms: 보조 검색어 (페르소나 rag_hints 키워드 등)
+
+        Returns:
+            list: [{'source', 'text', 'score'}]
+        """
+        with self._lock:
+            index = self._get(collection_id)
+        return index.search(query, k=k, boost_terms=boost_terms)
+
+    def sources(self, collection_id):
+        """색인된 자료 목록 ({자료 이름: 구절 수})"""
+        with self._lock:
+            return self._get(collection_id).sources()
+
+    def _collection_dir(self, collection_id):
+        if not collection_id or not _COLLECTION_ID_PATTERN.match(collection_id):
+            return None
+        return os.path.join(self.root_dir, collection_id)
+
+    def _get(self, collection_id):
+        """메모리에 올린 색인 (없으면 파일에서 불러옴, 파일도 없으면 빈 색인)"""
+        if collection_id in self._loaded:
+            self._loaded.move_to_end(collection_id)
+            return self._loaded[collection_id]
+
+        index = BM25Index()
+        directory = self._collection_dir(collection_id)
+        if directory is not None:
+            try:
+                with open(os.path.join(directory, "index.json"), encoding="utf-8") as f:
+                    data = json.load(f)
+            except OSError:
+                data = None
+            if data and data.get('format_version') == INDEX_FORMAT_VERSION:
+                for chunk in data['chunks']:
+                    index.add(chunk['source'], chunk['text'], chunk['terms'])
+            elif data:
+                # 토큰화 방식이 바뀐 색인은 원문으로 다시 만든다
+                for chunk in data['chunks']:
+                    index.add(chunk['source'], chunk['text'])
+        self._remember(collection_id, index)
+        return index
+
+    def _remember(self, collection_id, index):
+        self._loaded[collection_id] = index
+        self._loaded.move_to_end(collection_id)
+        while len(self._loaded) > self.max_loaded:
+            self._loaded.popitem(last=False)
+
+    def _save(self, collection_id, index):
+        """임시 파일에 쓴 뒤 이름을 바꿔 읽는 쪽이 반쯤 쓰인 파일을 보지 않게 한다"""
+        directory = self._collection_dir(collection_id)
+        if directory is None:
+            raise ValueError(f"잘못된 색인 ID입니다: {collection_id}")
+        os.makedirs(directory, exist_ok=True)
+        data = {
+            'format_version': INDEX_FORMAT_VERSION,
+            'chunks': [
+                {'source': chunk['source'], 'text': chunk['text'], 'terms': chunk['terms']}
+                for chunk in index.chunks
+            ]
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, os.path.join(directory, "index.json"))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+def format_passages(passages, max_chars=1200):
+    """
+    검색된 구절을 인터뷰 프롬프트용 텍스트로 변환
+
+    Args:
+        passages: search() 결과
+        max_chars: 전체 최대 글자 수 (넘는 구절은 제외)
+
+    Returns:
+        str: "[자료 이름] 구절" 목록 (없으면 빈 문자열)
+    """
+    lines = []
+    used = 0
+    for passage in passages:
+        line = f"- [{passage['source']}] {passage['text']}"
+        if used + len(line) > max_chars:
+            break
+        lines.append(line)
+        used += len(line)
+    return "\n".join(lines)
@@ -0,0 +1,152 @@
+"""
+모델 라우팅 모듈 - 호출 종류별로 모델/temperature를 정하고, 필요할 때만 더 강한 모델로 다시 호출
+"""
+import os
+import threading
+from collections import Counter, defaultdict
+
+DEFAULT_MODEL = "gpt-4.1-nano"
+DEFAULT_TEMPERATURE = 0.7
+
+# 환경변수로 경로를 지정할 수 있는 호출 종류
+CALL_TYPES = ("persona", "objectives", "interview", "summary", "grading")
+# 다른 호출 종류의 경로를 그대로 쓰는 호출 종류 (추가 질문 미리 생성은 인터뷰와 같은 모델)
+ROUTE_ALIASES = {"prefetch": "interview"}
+# 호출 종류별 기본 temperature (채점은 같은 답안에 같은 점수가 나오도록 낮게)
+DEFAULT_TEMPERATURES = {"grading": 0.2}
+
+
+class Route:
+    """호출 종류 하나의 경로 (모델, temperature, 다시 호출할 상위 모델)"""
+
+    __slots__ = ('model', 'temperature', 'escalate_to')
+
+    def __init__(self, model=DEFAULT_MODEL, temperature=DEFAULT_TEMPERATURE, escalate_to=None):
+        """
+        Args:
+            model: 먼저 호출할 모델
+            temperature: 샘플링 온도
+            escalate_to: 응답이 검증에 실패하거나 애매할 때 다시 호출할 모델 (None이면 다시 호출 안 함)
+        """
+        self.model = model
+        self.temperature = temperature
+        self.escalate_to = escalate_to if escalate_to != model else None
+
+    def __repr__(self):
+        escalate = f" → {self.escalate_to}" if self.escalate_to else ""
+        return f"{self.model}@{self.temperature}{escalate}"
+
+
+class RoutingPolicy:
+    """
+    호출 종류별 모델 라우팅 정책 (프로세스 공용)
+
+    호출 종류마다 가장 저렴한 모델로 먼저 호출하고, 상위 모델(escalate_to)이 지정된 경로는
+    응답이 JSON 검증에 실패하거나 호출자가 애매하다고 판단한 경우(예: 채점 경계 점수)에만 다시 호출한다.
+    상위 모델 호출 비율은 호출 종류·수업별로 집계하여 지연 시간/비용 조정에 쓴다.
+    """
+
+    def __init__(self, routes=None, default=None, metrics=None):
+        """
+        Args:
+            routes: {호출 종류: Route}
+            default: 경로가 없는 호출 종류에 쓸 Route, None이면 DEFAULT_MODEL
+            metrics: 상위 모델 호출 수를 기록할 메트릭 집계기 (MetricsRecorder, 선택)
+        """
+        self.routes = dict(routes or {})
+        self.default = default or Route()
+        self.metrics = metrics
+        self._calls = defaultdict(Counter)  # {(call_type, scope): Counter(calls, escalations)}
+        self._reasons = defaultdict(Counter)  # {(call_type, scope): Counter(reason)}
+        self._lock = threading.Lock()
+
+    def route(self, call_type):
+        """
+        호출 종류의 경로
+
+        Args:
+            call_type: 호출 종류 (persona, objectives, interview, grading 등)
+
+        Returns:
+            Route: 경로 (지정되지 않았으면 기본 경로)
+        """
+        call_type = ROUTE_ALIASES.get(call_type, call_type)
+        return self.routes.get(call_type, self.default)
+
+    def models(self):
+        """정책에서 쓰는 모든 모델 (요청 한도 설정용)"""
+        routes = [self.default, *self.routes.values()]
+        return sorted({model for route in routes for model in (route.model, route.escalate_to) if model})
+
+    def record(self, call_type, reason=None, scope=None):
+        """
+        상위 모델로 다시 호출할 수 있는 호출 한 건 기록
+
+        Args:
+            call_type: 호출 종류
+            reason: 상위 모델로 다시 호출한 이유 ('invalid_json', 'borderline' 등), 다시 호출하지 않았으면 None
+            scope: 집계 범위 (수업 ID 등, 선택)
+        """
+        call_type = ROUTE_ALIASES.get(call_type, call_type)
+        with self._lock:
+            for key in {(call_type, None), (call_type, scope)}:
+                counts = self._calls[key]
+                counts['calls'] += 1
+                if reason:
+                    counts['escalations'] += 1
+                    self._reasons[key][reason] += 1
+        if reason and self.metrics is not None:
+            self.metrics.increment(f'{call_type}_escalations')
+
+    def stats(self, scope=None):
+        """
+        상위 모델 호출 통계
+
+        Args:
+            scope: 집계 범위 (None이면 전체)
+
+        Returns:
+            dict: {호출 종류: {calls, escalations, escalation_rate, reasons}}
+        """
+        with self._lock:
+            result = {}
+            for (call_type, key_scope), counts in self._calls.items():
+                if key_scope != scope:
+                    continue
+                calls = counts['calls']
+                result[call_type] = {
+                    'calls': calls,
+                    'escalations': counts['escalations'],
+                    'escalation_rate': counts['escalations'] / calls if calls else 0.0,
+                    'reasons': dict(self._reasons[(call_type, key_scope)])
+                }
+            return result
+
+
+def create_routing_from_env(metrics=None):
+    """
+    환경변수 설정에 따라 라우팅 정책 생성
+
+    - LLM_MODEL: 모든 호출의 기본 모델 (기본값 gpt-4.1-nano)
+    - LLM_MODEL_{종류}: 호출 종류별 모델 (예: LLM_MODEL_PERSONA=gpt-4.1-mini)
+    - LLM_TEMPERATURE_{종류}: 호출 종류별 temperature (채점 기본값 0.2, 나머지 0.7)
+    - LLM_ESCALATE_{종류}: 검증 실패/애매한 응답을 다시 호출할 상위 모델 (예: LLM_ESCALATE_GRADING=gpt-4.1-mini)
+
+    Args:
+        metrics: 상위 모델 호출 수를 기록할 메트릭 집계기 (선택)
+
+    Returns:
+        RoutingPolicy: 라우팅 정책
+    """
+    default_model = os.getenv("LLM_MODEL", DEFAULT_MODEL)
+    routes = {}
+    for call_type in CALL_TYPES:
+        name = call_type.upper()
+        routes[call_type] = Route(
+            model=os.getenv(f"LLM_MODEL_{name}", default_model),
+            temperature=float(os.getenv(
+                f"LLM_TEMPERATURE_{name}", DEFAULT_TEMPERATURES.get(call_type, DEFAULT_TEMPERATURE)
+            )),
+            escalate_to=os.getenv(f"LLM_ESCALATE_{name}") or None
+        )
+    return RoutingPolicy(routes, default=Route(default_model), metrics=metrics)
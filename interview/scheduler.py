@@ -0,0 +1,298 @@
+"""
+요청 스케줄러 모듈 - 모델별 분당 요청/토큰 한도 안에서 우선순위 순서로 API 호출을 내보냄
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+
+# 모델별 기본 분당 한도 (rpm: 요청 수, tpm: 토큰 수, None이면 제한 없음)
+DEFAULT_LIMITS = {
+    "gpt-4.1-nano": {"rpm": 500, "tpm": 200000},
+    "gpt-4.1-mini": {"rpm": 500, "tpm": 200000},
+    "gpt-4.1": {"rpm": 500, "tpm": 30000},
+    "dall-e-3": {"rpm": 5, "tpm": None},
+}
+
+# 호출 종류별 우선순위 (숫자가 작을수록 먼저): 학생이 기다리는 인터뷰 턴이 일괄 채점보다 앞선다
+PRIORITIES = {
+    "interview": 0,
+    "summary": 1,
+    "persona": 2,
+    "objectives": 2,
+    "image": 2,
+    "grading": 3,
+    "prefetch": 4,  # 추가 질문 미리 생성은 남는 한도로만
+}
+DEFAULT_PRIORITY = 2
+
+
+class TokenBucket:
+    """분당 한도를 초당 보충량으로 나눠 채우는 토큰 버킷 (한도가 None이면 항상 통과)"""
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.tokens = float(per_minute) if per_minute else 0.0
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now):
+        if self.capacity is None:
+            return
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.capacity / 60.0)
+        self.updated_at = now
+
+    def wait_time(self, amount, now):
+        """amount만큼 꺼낼 수 있을 때까지 남은 시간(초)"""
+        if self.capacity is None:
+            return 0.0
+        self._refill(now)
+        # 한도보다 큰 요청은 버킷이 가득 찼을 때 통과시킨다
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) * 60.0 / self.capacity
+
+    def take(self, amount, now):
+        if self.capacity is None:
+            return
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+
+    def refund(self, amount, now):
+        if self.capacity is None or amount <= 0:
+            return
+        self._refill(now)
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class QueueTicket:
+    """
+    대기열 위치 조회용 표식
+
+    호출 측이 만들어 LLMService에 넘기면, 스케줄러가 대기 중인 동안 position(1부터)을 갱신하고
+    실행이 허가되면 None으로 되돌린다.
+    """
+
+    def __init__(self):
+        self.position = None
+        self._notified = None
+
+    def notify(self, callback):
+        """위치가 바뀌었을 때만 callback(position) 호출"""
+        position = self.position
+        if position != self._notified:
+            self._notified = position
+            callback(position)
+
+
+class _Waiter:
+    __slots__ = ('priority', 'seq', 'tokens', 'future', 'ticket', 'enqueued_at')
+
+    def __init__(self, priority, seq, tokens, future, ticket):
+        self.priority = priority
+        self.seq = seq
+        self.tokens = tokens
+        self.future = future
+        self.ticket = ticket
+        self.enqueued_at = time.monotonic()
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class _ModelQueue:
+    def __init__(self, limits):
+        self.requests = TokenBucket(limits.get("rpm"))
+        self.tokens = TokenBucket(limits.get("tpm"))
+        self.heap = []
+        self.paused_until = 0.0
+        self.timer = None
+        self.granted = 0
+        self.total_wait = 0.0
+
+
+class RequestScheduler:
+    """
+    프로세스 공용 요청 스케줄러
+
+    모델별로 분당 요청 수(rpm)와 토큰 수(tpm) 토큰 버킷을 두고, 한도를 넘는 요청은
+    우선순위 큐에서 기다리게 한다. 429 응답을 받으면 해당 모델의 큐 전체를 잠시 멈춰
+    여러 요청이 동시에 재시도하는 것을 막는다.
+    acquire()는 LLMService의 공용 이벤트 루프 안에서만 호출한다.
+    """
+
+    def __init__(self, limits=None):
+        """
+        Args:
+            limits: {모델명: {"rpm": int|None, "tpm": int|None}}, None이면 DEFAULT_LIMITS
+        """
+        self.limits = dict(DEFAULT_LIMITS if limits is None else limits)
+        self._queues = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()  # stats()를 다른 스레드에서 읽을 때 사용
+
+    async def acquire(self, model, call_type, tokens=0, ticket=None):
+        """
+        요청 한 건을 보낼 수 있을 때까지 대기
+
+        Args:
+            model: 모델명 (한도가 없는 모델은 바로 통과)
+            call_type: 호출 종류 (PRIORITIES로 우선순위 결정)
+            tokens: 예상 토큰 수 (입력 + 최대 출력)
+            ticket: 대기열 위치를 알려줄 QueueTicket (선택)
+        """
+        queue = self._get_queue(model)
+        if queue is None:
+            return
+
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(
+            PRIORITIES.get(call_type, DEFAULT_PRIORITY), next(self._seq),
+            tokens, loop.create_future(), ticket
+        )
+        with self._lock:
+            heapq.heappush(queue.heap, waiter)
+        self._dispatch(model)
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            # 대기 중 취소되면 큐에서 빼고, 이미 허가된 뒤라면 예약분을 돌려준다
+            with self._lock:
+                if waiter in queue.heap:
+                    queue.heap.remove(waiter)
+                    heapq.heapify(queue.heap)
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.release(model, tokens, 0)
+            self._dispatch(model)
+            raise
+        finally:
+            if ticket is not None:
+                ticket.position = None
+
+    def release(self, model, reserved_tokens, used_tokens):
+        """
+        예약한 토큰 중 실제로 쓰지 않은 만큼 버킷에 반환
+
+        Args:
+            model: 모델명
+            reserved_tokens: acquire()에 넘긴 예상 토큰 수
+            used_tokens: 응답 usage 기준 실제 토큰 수
+        """
+        queue = self._queues.get(model)
+        if queue is None:
+            return
+        with self._lock:
+            queue.tokens.refund(reserved_tokens - used_tokens, time.monotonic())
+        self._dispatch(model)
+
+    def pause(self, model, seconds):
+        """
+        429 응답 등으로 모델의 요청 전송을 잠시 중단
+
+        Args:
+            model: 모델명
+            seconds: 중단할 시간(초)
+        """
+        queue = self._get_queue(model)
+        if queue is None:
+            return
+        with self._lock:
+            queue.paused_until = max(queue.paused_until, time.monotonic() + seconds)
+        self._dispatch(model)
+
+    def stats(self):
+        """
+        모델별 대기 현황
+
+        Returns:
+            dict: {모델명: {waiting, granted, avg_wait}}
+        """
+        with self._lock:
+            return {
+                model: {
+                    'waiting': len(queue.heap),
+                    'granted': queue.granted,
+                    'avg_wait': queue.total_wait / queue.granted if queue.granted else 0.0,
+                }
+                for model, queue in self._queues.items()
+            }
+
+    def _get_queue(self, model):
+        limits = self.limits.get(model)
+        if limits is None:
+            return None
+        with self._lock:
+            if model not in self._queues:
+                self._queues[model] = _ModelQueue(limits)
+            return self._queues[model]
+
+    def _dispatch(self, model):
+        """우선순위 순서로 한도가 허락하는 만큼 대기 요청을 허가하고, 나머지는 위치를 갱신"""
+        queue = self._queues[model]
+        loop = asyncio.get_running_loop()
+        if queue.timer is not None:
+            queue.timer.cancel()
+            queue.timer = None
+
+        with self._lock:
+            delay = 0.0
+            while queue.heap:
+                now = time.monotonic()
+                waiter = queue.heap[0]
+                if waiter.future.done():
+                    heapq.heappop(queue.heap)  # 이미 취소된 대기
+                    continue
+                delay = max(
+                    queue.paused_until - now,
+                    queue.requests.wait_time(1, now),
+                    queue.tokens.wait_time(waiter.tokens, now)
+                )
+                if delay > 0:
+                    break
+                heapq.heappop(queue.heap)
+                queue.requests.take(1, now)
+                queue.tokens.take(waiter.tokens, now)
+                queue.granted += 1
+                queue.total_wait += now - waiter.enqueued_at
+                waiter.future.set_result(None)
+
+            # 남은 대기열의 위치 갱신 (우선순위 순)
+            for position, waiter in enumerate(sorted(queue.heap), start=1):
+                if waiter.ticket is not None:
+                    waiter.ticket.position = position
+
+        if queue.heap:
+            queue.timer = loop.call_later(delay, self._dispatch, model)
+
+
+def create_scheduler_from_env(text_model="gpt-4.1-nano", image_model="dall-e-3", extra_models=()):
+    """
+    환경변수 설정에 따라 요청 스케줄러 생성
+
+    - LLM_RPM / LLM_TPM: 텍스트 모델의 분당 요청/토큰 한도 (0이면 제한 없음)
+    - IMAGE_RPM: 이미지 모델의 분당 요청 한도 (0이면 제한 없음)
+
+    Args:
+        text_model: 텍스트 생성 기본 모델명
+        image_model: 이미지 생성 모델명
+        extra_models: 호출 종류별 라우팅으로 함께 쓰는 다른 텍스트 모델 (DEFAULT_LIMITS의 한도 적용)
+
+    Returns:
+        RequestScheduler: 요청 스케줄러
+    """
+    text_defaults = DEFAULT_LIMITS.get(text_model, {})
+    image_defaults = DEFAULT_LIMITS.get(image_model, {})
+    rpm = int(os.getenv("LLM_RPM", text_defaults.get("rpm") or 0))
+    tpm = int(os.getenv("LLM_TPM", text_defaults.get("tpm") or 0))
+    image_rpm = int(os.getenv("IMAGE_RPM", image_defaults.get("rpm") or 0))
+    limits = {
+        model: dict(DEFAULT_LIMITS[model])
+        for model in extra_models if model in DEFAULT_LIMITS
+    }
+    limits[text_model] = {"rpm": rpm or None, "tpm": tpm or None}
+    limits[image_model] = {"rpm": image_rpm or None, "tpm": None}
+    return RequestScheduler(limits)
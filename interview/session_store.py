@@ -0,0 +1,291 @@
+"""
+세션 저장소 모듈 - 새로고침이나 재시작 후에도 인터뷰 대화와 답안/채점 결과를 유지
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+
+def new_session_id():
+    """추측하기 어려운 세션 ID 생성"""
+    return uuid.uuid4().hex
+
+
+class SessionStore:
+    """
+    세션 저장소 기본 클래스
+
+    세션 상태(페르소나, 학습 목표, 답안, 채점 결과 등)는 키별 JSON 값으로,
+    인터뷰 대화는 페르소나별 턴 단위로 추가만(append-only) 저장한다.
+    대화는 필요한 페이지만 최신순으로 읽어 오므로 대화가 길어도 한 번에 전부 불러오지 않는다.
+    하위 클래스는 아래 메서드를 모두 구현한다.
+    """
+
+    def create_session(self):
+        """
+        새 세션 생성
+
+        Returns:
+            str: 세션 ID
+        """
+        raise NotImplementedError
+
+    def exists(self, session_id):
+        """세션이 있는지 확인"""
+        raise NotImplementedError
+
+    def load_state(self, session_id):
+        """
+        세션 상태 전체 조회
+
+        Returns:
+            dict: {키: 값}
+        """
+        raise NotImplementedError
+
+    def save_state(self, session_id, key, value):
+        """
+        세션 상태 한 항목 저장 (JSON으로 직렬화 가능한 값)
+
+        Args:
+            session_id: 세션 ID
+            key: 상태 키 (예: personae, student_answers)
+            value: 저장할 값
+        """
+        raise NotImplementedError
+
+    def append_turn(self, session_id, persona_name, turn):
+        """
+        대화 턴 추가
+
+        Args:
+            session_id: 세션 ID
+            persona_name: 페르소나 이름
+            turn: 턴 정보 (role, content 필수, 그 밖의 키는 함께 저장)
+        """
+        raise NotImplementedError
+
+    def count_turns(self, session_id, persona_name=None):
+        """대화 턴 수 (persona_name이 None이면 모든 페르소나 합계)"""
+        raise NotImplementedError
+
+    def load_turns(self, session_id, persona_name=None, limit=None, offset=0):
+        """
+        최근 대화 턴 조회 (페이지 단위)
+
+        Args:
+            session_id: 세션 ID
+            persona_name: 페르소나 이름, None이면 모든 페르소나
+            limit: 가져올 최대 턴 수, None이면 전체
+            offset: 최신 턴부터 건너뛸 턴 수 (이전 페이지를 볼 때 사용)
+
+        Returns:
+            list: 오래된 순으로 정렬된 턴 dict 리스트 (persona 키 포함)
+        """
+        raise NotImplementedError
+
+    def clear_turns(self, session_id, persona_name):
+        """페르소나와의 대화 삭제 (인터뷰 초기화)"""
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    """프로세스 메모리 기반 세션 저장소 (새로고침에는 유지, 재시작하면 초기화)"""
+
+    def __init__(self):
+        self._states = {}  # {session_id: {key: json_text}}
+        self._turns = {}  # {session_id: [turn]}
+        self._lock = threading.Lock()
+
+    def create_session(self):
+        session_id = new_session_id()
+        with self._lock:
+            self._states[session_id] = {}
+            self._turns[session_id] = []
+        return session_id
+
+    def exists(self, session_id):
+        with self._lock:
+            return session_id in self._states
+
+    def load_state(self, session_id):
+        with self._lock:
+            state = dict(self._states.get(session_id, {}))
+        return {key: json.loads(value) for key, value in state.items()}
+
+    def save_state(self, session_id, key, value):
+        text = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._states.setdefault(session_id, {})[key] = text
+
+    def append_turn(self, session_id, persona_name, turn):
+        with self._lock:
+            self._turns.setdefault(session_id, []).append(dict(turn, persona=persona_name))
+
+    def count_turns(self, session_id, persona_name=None):
+        return len(self._select(session_id, persona_name))
+
+    def load_turns(self, session_id, persona_name=None, limit=None, offset=0):
+        turns = self._select(session_id, persona_name)
+        end = len(turns) - offset
+        start = 0 if limit is None else max(end - limit, 0)
+        return [dict(turn) for turn in turns[start:max(end, 0)]]
+
+    def clear_turns(self, session_id, persona_name):
+        with self._lock:
+            self._turns[session_id] = [
+                turn for turn in self._turns.get(session_id, [])
+                if turn['persona'] != persona_name
+            ]
+
+    def _select(self, session_id, persona_name):
+        with self._lock:
+            turns = self._turns.get(session_id, [])
+            if persona_name is None:
+                return list(turns)
+            return [turn for turn in turns if turn['persona'] == persona_name]
+
+
+class SQLiteSessionStore(SessionStore):
+    """SQLite 파일 기반 세션 저장소 (앱 재시작 후에도 유지)"""
+
+    def __init__(self, path):
+        """
+        Args:
+            path: SQLite 파일 경로
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            # 여러 세션이 동시에 쓰는 동안에도 읽기가 막히지 않도록 WAL 모드 사용
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS sessions (
+                    id TEXT PRIMARY KEY,
+                    created_at REAL NOT NULL
+                )"""
+            )
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS session_state (
+                    session_id TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (session_id, key)
+                )"""
+            )
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS chat_turns (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    persona TEXT NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    extra TEXT,
+                    created_at REAL NOT NULL
+                )"""
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_chat_turns_session "
+                "ON chat_turns (session_id, persona, id)"
+            )
+
+    def create_session(self):
+        session_id = new_session_id()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO sessions (id, created_at) VALUES (?, ?)",
+                (session_id, time.time())
+            )
+        return session_id
+
+    def exists(self, session_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+        return row is not None
+
+    def load_state(self, session_id):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, value FROM session_state WHERE session_id = ?",
+                (session_id,)
+            ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def save_state(self, session_id, key, value):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO session_state (session_id, key, value, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                (session_id, key, json.dumps(value, ensure_ascii=False), time.time())
+            )
+
+    def append_turn(self, session_id, persona_name, turn):
+        extra = {key: value for key, value in turn.items() if key not in ('role', 'content')}
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO chat_turns (session_id, persona, role, content, extra, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    session_id, persona_name, turn['role'], turn['content'],
+                    json.dumps(extra, ensure_ascii=False) if extra else None, time.time()
+                )
+            )
+
+    def count_turns(self, session_id, persona_name=None):
+        where, params = self._where(session_id, persona_name)
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT COUNT(*) FROM chat_turns WHERE {where}", params
+            ).fetchone()[0]
+
+    def load_turns(self, session_id, persona_name=None, limit=None, offset=0):
+        where, params = self._where(session_id, persona_name)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT persona, role, content, extra FROM chat_turns WHERE {where} "
+                "ORDER BY id DESC LIMIT ? OFFSET ?",
+                params + (-1 if limit is None else limit, offset)
+            ).fetchall()
+
+        turns = []
+        for persona, role, content, extra in reversed(rows):
+            turn = json.loads(extra) if extra else {}
+            turn.update({'persona': persona, 'role': role, 'content': content})
+            turns.append(turn)
+        return turns
+
+    def clear_turns(self, session_id, persona_name):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM chat_turns WHERE session_id = ? AND persona = ?",
+                (session_id, persona_name)
+            )
+
+    @staticmethod
+    def _where(session_id, persona_name):
+        if persona_name is None:
+            return "session_id = ?", (session_id,)
+        return "session_id = ? AND persona = ?", (session_id, persona_name)
+
+
+def create_session_store_from_env():
+    """
+    환경변수 설정에 따라 세션 저장소 생성
+
+    SESSION_STORE_PATH(기본값 sessions.sqlite3)에 SQLite 파일로 저장하며,
+    "memory"로 지정하면 프로세스 메모리에만 저장한다.
+
+    Returns:
+        SessionStore: 세션 저장소
+    """
+    path = os.getenv("SESSION_STORE_PATH", "sessions.sqlite3")
+    if path == "memory":
+        return MemorySessionStore()
+    return SQLiteSessionStore(path)
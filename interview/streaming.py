@@ -0,0 +1,163 @@
+"""
+스트리밍 응답 모듈 - 인터뷰 응답 JSON을 토큰 단위로 파싱
+"""
+import re
+
+_ESCAPES = {
+    '"': '"',
+    '\\': '\\',
+    '/': '/',
+    'b': '\b',
+    'f': '\f',
+    'n': '\n',
+    'r': '\r',
+    't': '\t',
+}
+
+
+class IncrementalFieldParser:
+    """
+    스트리밍 중인 JSON 텍스트에서 특정 문자열 필드의 값을 점진적으로 디코딩하는 파서
+
+    {"utterance": "..."} 처럼 문자열 값을 가진 필드가 완성되기 전에도,
+    지금까지 도착한 부분의 이스케이프를 풀어서 돌려준다.
+    """
+
+    def __init__(self, field="utterance"):
+        """
+        Args:
+            field: 점진적으로 추출할 문자열 필드 이름
+        """
+        self._key_pattern = re.compile(r'"' + re.escape(field) + r'"\s*:\s*"')
+        self._buffer = ""
+        self._state = "seek"  # seek -> value -> done
+        self.value = ""
+
+    @property
+    def done(self):
+        """필드 값의 닫는 따옴표까지 모두 읽었는지 여부"""
+        return self._state == "done"
+
+    def feed(self, chunk):
+        """
+        새로 도착한 텍스트 조각을 입력
+
+        Args:
+            chunk: 스트림에서 받은 텍스트 조각
+
+        Returns:
+            str: 이번 조각으로 새로 디코딩된 필드 값 (없으면 빈 문자열)
+        """
+        if self._state == "done" or not chunk:
+            return ""
+
+        self._buffer += chunk
+
+        if self._state == "seek":
+            match = self._key_pattern.search(self._buffer)
+            if not match:
+                return ""
+            self._buffer = self._buffer[match.end():]
+            self._state = "value"
+
+        decoded = []
+        i = 0
+        buffer = self._buffer
+        while i < len(buffer):
+            char = buffer[i]
+            if char == '"':
+                self._state = "done"
+                i += 1
+                break
+            if char != '\\':
+                decoded.append(char)
+                i += 1
+                continue
+
+            # 이스케이프 시퀀스가 조각 경계에서 잘린 경우 다음 조각을 기다린다
+            if i + 1 >= len(buffer):
+                break
+            escape = buffer[i + 1]
+            if escape == 'u':
+                if i + 6 > len(buffer):
+                    break
+                try:
+                    code = int(buffer[i + 2:i + 6], 16)
+                except ValueError:
+                    decoded.append(buffer[i:i + 6])
+                    i += 6
+                    continue
+                # 서로게이트 쌍(🚀 등)은 두 번째 절반까지 받은 뒤 합친다
+                if 0xD800 <= code < 0xDC00:
+                    if i + 12 > len(buffer):
+                        break
+                    if buffer[i + 6:i + 8] == '\\u':
+                        try:
+                            low = int(buffer[i + 8:i + 12], 16)
+                        except ValueError:
+                            low = 0
+                        if 0xDC00 <= low < 0xE000:
+                            decoded.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                            i += 12
+                            continue
+                decoded.append(chr(code))
+                i += 6
+            else:
+                decoded.append(_ESCAPES.get(escape, escape))
+                i += 2
+
+        self._buffer = buffer[i:]
+        text = "".join(decoded)
+        self.value += text
+        return text
+
+
+class InterviewResponseStream:
+    """
+    인터뷰 응답 스트림
+
+    순회하면 utterance 텍스트가 도착하는 대로 조각 단위로 반환되고,
+    스트림이 끝나면 result 속성에 suggested_followups를 포함한 전체 응답이 채워진다.
+    st.write_stream에 그대로 넘길 수 있다.
+    """
+
+    def __init__(self, chunks, parse_json):
+        """
+        Args:
+            chunks: LLM 응답 텍스트 조각 이터레이터
+            parse_json: 완성된 응답 텍스트를 dict로 파싱하는 함수
+        """
+        self._chunks = chunks
+        self._parse_json = parse_json
+        self._parser = IncrementalFieldParser("utterance")
+        self._text = []
+        self.result = None
+
+    @property
+    def text(self):
+        """지금까지 받은 원본 응답 텍스트"""
+        return "".join(self._text)
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            self._text.append(chunk)
+            delta = self._parser.feed(chunk)
+            if delta:
+                yield delta
+
+        self.result = self._finalize()
+
+    def _finalize(self):
+        """스트림 종료 후 전체 응답을 파싱 (파싱 실패 시 지금까지 받은 utterance로 대체)"""
+        try:
+            result = self._parse_json(self.text)
+        except ValueError:
+            result = {}
+
+        if not isinstance(result, dict):
+            result = {}
+        if not result.get('utterance'):
+            result['utterance'] = self._parser.value
+        result.setdefault('suggested_followups', [])
+        return result
+
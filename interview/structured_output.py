@@ -0,0 +1,248 @@
+"""
+구조화 출력 모듈 - JSON 스키마 기반 응답 형식 지정, 파싱, 검증, 로컬 복구
+"""
+import json
+import re
+
+_FENCE_PATTERN = re.compile(r'^```(?:json)?\s*|\s*```$')
+_TRAILING_COMMA_PATTERN = re.compile(r',\s*([}\]])')
+
+
+def response_format(name, schema):
+    """
+    OpenAI Chat Completions API의 json_schema 응답 형식 생성
+
+    Args:
+        name: 스키마 이름
+        schema: JSON 스키마 (dict)
+
+    Returns:
+        dict: response_format 파라미터 값
+    """
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": name,
+            "schema": schema,
+            "strict": True
+        }
+    }
+
+
+def parse_structured(text, schema=None):
+    """
+    응답 텍스트를 파싱하고 스키마에 맞게 정리 (한 번의 패스)
+
+    네이티브 JSON 모드 응답은 그대로 json.loads로 끝나고,
+    코드 블록이 섞이거나 max_tokens로 잘린 응답은 재요청 없이 로컬에서 복구한다.
+    복구한 결과라도 필수 필드가 빠졌거나 타입이 맞지 않으면 검증 실패로 처리한다.
+
+    Args:
+        text: LLM 응답 텍스트
+        schema: JSON 스키마 (dict), None이면 검증 생략
+
+    Returns:
+        dict: 파싱 및 검증된 JSON 객체
+
+    Raises:
+        ValueError: JSON을 찾을 수 없거나 스키마 검증에 실패한 경우
+    """
+    try:
+        data = json.loads(text)
+    except (json.JSONDecodeError, TypeError):
+        data = repair_json(text or "")
+        if data is None:
+            raise ValueError(f"유효한 JSON을 찾을 수 없습니다: {(text or '')[:200]}")
+
+    if schema is not None:
+        data = conform(data, schema, strict=True)
+    return data
+
+
+def repair_json(text):
+    """
+    손상된 JSON 텍스트 로컬 복구
+
+    코드 블록 표시 제거, 앞뒤 설명 문장 제거, 후행 쉼표 제거,
+    잘린 문자열/괄호 닫기를 순서대로 시도한다.
+
+    Args:
+        text: 복구할 텍스트
+
+    Returns:
+        dict | list: 복구된 JSON 값 (복구 불가 시 None)
+    """
+    text = _FENCE_PATTERN.sub('', text.strip())
+    start = text.find('{')
+    if start < 0:
+        return None
+    text = text[start:]
+
+    # 문자열/괄호 상태를 추적하면서 닫히지 않은 구조를 찾는다
+    stack = []
+    cut_points = []  # (위치, 그 시점의 괄호 스택) - 쉼표 직전에서 자를 수 있는 지점
+    in_string = False
+    escaped = False
+    end = None
+    for i, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+
+        if char == '"':
+            in_string = True
+        elif char in '{[':
+            stack.append('}' if char == '{' else ']')
+        elif char in '}]':
+            if stack:
+                stack.pop()
+            if not stack:
+                end = i + 1
+                break
+        elif char == ',':
+            cut_points.append((i, list(stack)))
+
+    if end is not None:
+        candidates = [text[:end]]
+    else:
+        # 잘린 응답: 열린 문자열과 괄호를 닫고, 안 되면 마지막 완성된 항목까지 잘라낸다
+        tail = text.rstrip()
+        if in_string:
+            tail += '"'
+        tail = tail.rstrip().rstrip(',')
+        if tail.endswith(':'):
+            tail += ' null'
+        candidates = [tail + ''.join(reversed(stack))]
+        for position, cut_stack in reversed(cut_points[-5:]):
+            candidates.append(text[:position] + ''.join(reversed(cut_stack)))
+
+    for candidate in candidates:
+        for attempt in (candidate, _TRAILING_COMMA_PATTERN.sub(r'\1', candidate)):
+            try:
+                return json.loads(attempt)
+            except json.JSONDecodeError:
+                continue
+    return None
+
+
+def conform(value, schema, strict=False, path="$"):
+    """
+    값을 스키마에 맞게 정리
+
+    숫자 문자열 등 단순한 타입 불일치는 변환하고, 스키마에 없는 필드는 그대로 둔다.
+    strict이면 필수 필드가 빠졌거나 변환할 수 없는 타입/enum 값일 때 ValueError를 낸다.
+    strict는 최상위 객체와 그 안의 객체 필드(예: weighted_total.band)에 적용되고,
+    배열 항목(채점 기준 한 줄 등) 안에서는 누락된 필드를 기본값으로 채운다.
+
+    Args:
+        value: 정리할 값
+        schema: JSON 스키마 (dict)
+        strict: 필수 필드 누락/타입 불일치를 오류로 처리할지 여부
+        path: 오류 메시지에 표시할 필드 경로
+
+    Returns:
+        스키마에 맞게 정리된 값
+
+    Raises:
+        ValueError: strict이고 값이 스키마에 맞지 않는 경우
+    """
+    schema_type = schema.get('type')
+    enum = schema.get('enum')
+
+    if schema_type == 'object':
+        if not isinstance(value, dict):
+            if strict:
+                raise ValueError(f"{path}: 객체가 아닙니다")
+            value = {}
+        required = set(schema.get('required', ()))
+        result = dict(value)
+        for key, prop_schema in schema.get('properties', {}).items():
+            if key in value and value[key] is not None:
+                result[key] = conform(value[key], prop_schema, strict, f"{path}.{key}")
+            elif strict and key in required:
+                raise ValueError(f"{path}.{key}: 필수 필드가 없습니다")
+            else:
+                result[key] = default_value(prop_schema)
+        return result
+
+    if schema_type == 'array':
+        if value is None:
+            return []
+        if not isinstance(value, list):
+            if strict:
+                raise ValueError(f"{path}: 배열이 아닙니다")
+            value = [value]
+        item_schema = schema.get('items')
+        if item_schema is None:
+            return value
+        return [conform(item, item_schema) for item in value]
+
+    if schema_type == 'string':
+        if value is None:
+            return default_value(schema)
+        if strict and isinstance(value, (dict, list)):
+            raise ValueError(f"{path}: 문자열이 아닙니다")
+        text = value if isinstance(value, str) else str(value)
+        if enum and text not in enum:
+            normalized = {option.strip().lower(): option for option in enum}
+            option = normalized.get(text.strip().lower())
+            if option is None:
+                if strict:
+                    raise ValueError(f"{path}: 허용되지 않는 값입니다: {text}")
+                option = enum[0]
+            return option
+        return text
+
+    if schema_type in ('integer', 'number'):
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            if strict:
+                raise ValueError(f"{path}: 숫자가 아닙니다: {value}")
+            return default_value(schema)
+        if schema_type == 'integer':
+            number = int(round(number))
+        if enum and number not in enum:
+            number = min(max(number, min(enum)), max(enum))
+        return number
+
+    if schema_type == 'boolean':
+        if isinstance(value, str):
+            return value.strip().lower() in ('true', 'yes', '1', '예')
+        return bool(value)
+
+    return value
+
+
+def default_value(schema):
+    """
+    스키마 타입별 기본값
+
+    Args:
+        schema: JSON 스키마 (dict)
+
+    Returns:
+        타입에 맞는 빈 값
+    """
+    schema_type = schema.get('type')
+    enum = schema.get('enum')
+    if enum:
+        return enum[0]
+    if schema_type == 'object':
+        return conform({}, schema)
+    if schema_type == 'array':
+        return []
+    if schema_type == 'string':
+        return ""
+    if schema_type == 'integer':
+        return 0
+    if schema_type == 'number':
+        return 0.0
+    if schema_type == 'boolean':
+        return False
+    return None
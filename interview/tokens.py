@@ -0,0 +1,45 @@
+"""
+토큰 계산 모듈 - 프롬프트 길이를 토큰 단위로 추정
+"""
+import math
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken이 없으면 문자 수 기반 근사치 사용
+    tiktoken = None
+
+
+@lru_cache(maxsize=None)
+def _get_encoding():
+    if tiktoken is None:
+        return None
+    try:
+        # gpt-4.1 계열 모델의 토크나이저
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text):
+    """
+    텍스트의 토큰 수 계산
+
+    tiktoken이 설치되어 있으면 정확한 값을, 없으면 근사치를 반환한다.
+    근사치는 영문/숫자 4자당 1토큰, 한글 등 비ASCII 문자 1자당 1토큰으로 보수적으로 계산한다.
+
+    Args:
+        text: 토큰 수를 셀 텍스트
+
+    Returns:
+        int: 토큰 수
+    """
+    if not text:
+        return 0
+
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+
+    ascii_chars = sum(1 for char in text if ord(char) < 128)
+    return math.ceil(ascii_chars / 4) + (len(text) - ascii_chars)